@@ -0,0 +1,657 @@
+"""
+Set-based per-vehicle aggregation shared by the analytics endpoints.
+
+Two layers live here:
+
+* `live_*` selects compute lifetime totals straight from `trips`, `expenses`
+  and `maintenance_logs` with GROUP BY subqueries. They are only used by
+  rollups.py to (re)build the rollup tables.
+* Read queries (`vehicle_totals_query`, `fleet_summary`) join `vehicles`
+  onto `vehicle_rollups`, so their cost follows fleet size, not history.
+  Date-windowed variants sum `vehicle_daily_rollups` instead, so their cost
+  follows fleet size times window length. The default dashboard summary is
+  one read of the `fleet_rollup` row, whatever the fleet size.
+
+Idle vehicles (`dead_stock_query`) need no rollups at all: backend-core
+keeps `vehicles.lastCompletedTripAt` current, and the (status,
+lastCompletedTripAt) index turns the lookup into one range scan.
+"""
+import datetime
+import os
+
+from sqlalchemy import select, func, case, or_, literal, union_all, DateTime
+from sqlalchemy.orm import Session
+
+from models import (
+    Vehicle, Driver, Trip, MaintenanceLog, Expense, TripStatus, VehicleStatus,
+    VehicleRollup, DriverRollup, VehicleDailyRollup, TripEfficiency, VehicleEfficiency, FleetRollup,
+)
+
+DEAD_STOCK_DAYS = int(os.getenv("DEAD_STOCK_DAYS", "14"))  # default idleDays
+
+
+# ── Live (raw-table) aggregates ───────────────────────────────────────────────
+
+def completed_at():
+    """
+    When a COMPLETED trip counts as completed: its endDate, or its updatedAt
+    (the completing write) for rows completed without one. Lifetime, daily
+    and windowed totals all bucket completions on this.
+    """
+    return func.coalesce(Trip.endDate, Trip.updatedAt)
+
+
+def trip_totals_subquery(vehicle_ids=None):
+    """Completed-trip revenue/count, last completion and average driver score per vehicle."""
+    completed = Trip.status == TripStatus.COMPLETED
+    stmt = (
+        select(
+            Trip.vehicleId.label("vehicleId"),
+            func.sum(case((completed, Trip.revenue), else_=0)).label("totalRevenue"),
+            func.count(case((completed, 1))).label("completedTrips"),
+            func.max(case((completed, completed_at()))).label("lastTripEnd"),
+            func.avg(Driver.safetyScore).label("avgDriverScore"),
+        )
+        .select_from(Trip)
+        .outerjoin(Driver, Driver.id == Trip.driverId)
+        .group_by(Trip.vehicleId)
+    )
+    if vehicle_ids is not None:
+        stmt = stmt.where(Trip.vehicleId.in_(vehicle_ids))
+    return stmt.subquery("trip_totals")
+
+
+def expense_totals_subquery(vehicle_ids=None):
+    """Fuel cost and litres per vehicle."""
+    stmt = (
+        select(
+            Expense.vehicleId.label("vehicleId"),
+            func.sum(Expense.fuelCost).label("totalFuelCost"),
+            func.sum(Expense.fuelLiters).label("totalFuelLiters"),
+        )
+        .group_by(Expense.vehicleId)
+    )
+    if vehicle_ids is not None:
+        stmt = stmt.where(Expense.vehicleId.in_(vehicle_ids))
+    return stmt.subquery("expense_totals")
+
+
+def maintenance_totals_subquery(vehicle_ids=None):
+    """Maintenance spend per vehicle."""
+    stmt = (
+        select(
+            MaintenanceLog.vehicleId.label("vehicleId"),
+            func.sum(MaintenanceLog.cost).label("totalMaintenanceCost"),
+        )
+        .group_by(MaintenanceLog.vehicleId)
+    )
+    if vehicle_ids is not None:
+        stmt = stmt.where(MaintenanceLog.vehicleId.in_(vehicle_ids))
+    return stmt.subquery("maintenance_totals")
+
+
+def live_vehicle_totals_select(vehicle_ids=None):
+    """One `vehicle_rollups`-shaped row per vehicle, computed from raw tables."""
+    trips = trip_totals_subquery(vehicle_ids)
+    expenses = expense_totals_subquery(vehicle_ids)
+    maintenance = maintenance_totals_subquery(vehicle_ids)
+    stmt = (
+        select(
+            Vehicle.id.label("vehicleId"),
+            func.coalesce(trips.c.totalRevenue, 0).label("totalRevenue"),
+            func.coalesce(trips.c.completedTrips, 0).label("completedTrips"),
+            trips.c.avgDriverScore,
+            func.coalesce(expenses.c.totalFuelCost, 0).label("totalFuelCost"),
+            func.coalesce(expenses.c.totalFuelLiters, 0).label("totalFuelLiters"),
+            func.coalesce(maintenance.c.totalMaintenanceCost, 0).label("totalMaintenanceCost"),
+            trips.c.lastTripEnd,
+        )
+        .select_from(Vehicle)
+        .outerjoin(trips, trips.c.vehicleId == Vehicle.id)
+        .outerjoin(expenses, expenses.c.vehicleId == Vehicle.id)
+        .outerjoin(maintenance, maintenance.c.vehicleId == Vehicle.id)
+    )
+    if vehicle_ids is not None:
+        stmt = stmt.where(Vehicle.id.in_(vehicle_ids))
+    return stmt
+
+
+def live_driver_totals_select(driver_ids=None):
+    """One `driver_rollups`-shaped row per driver, computed from raw tables."""
+    completed = Trip.status == TripStatus.COMPLETED
+    stmt = (
+        select(
+            Driver.id.label("driverId"),
+            func.count(Trip.id).label("totalTrips"),
+            func.count(case((completed, 1))).label("completedTrips"),
+            func.coalesce(func.sum(case((completed, Trip.revenue), else_=0)), 0).label("totalRevenue"),
+        )
+        .select_from(Driver)
+        .outerjoin(Trip, Trip.driverId == Driver.id)
+        .group_by(Driver.id)
+    )
+    if driver_ids is not None:
+        stmt = stmt.where(Driver.id.in_(driver_ids))
+    return stmt
+
+
+def live_daily_totals_select(vehicle_ids=None):
+    """One `vehicle_daily_rollups`-shaped row per (vehicle, calendar day) with activity."""
+    completed_day = func.date(completed_at())
+    trips = (
+        select(
+            Trip.vehicleId.label("vehicleId"), completed_day.label("day"),
+            Trip.revenue.label("revenue"), literal(1).label("completedTrips"),
+            literal(0.0).label("fuelCost"), literal(0.0).label("fuelLiters"),
+            literal(0.0).label("maintenanceCost"),
+        )
+        .where(Trip.status == TripStatus.COMPLETED)
+    )
+    expenses = select(
+        Expense.vehicleId, func.date(Expense.date),
+        literal(0.0), literal(0), Expense.fuelCost, Expense.fuelLiters, literal(0.0),
+    )
+    maintenance = select(
+        MaintenanceLog.vehicleId, func.date(MaintenanceLog.date),
+        literal(0.0), literal(0), literal(0.0), literal(0.0), MaintenanceLog.cost,
+    )
+    if vehicle_ids is not None:
+        trips = trips.where(Trip.vehicleId.in_(vehicle_ids))
+        expenses = expenses.where(Expense.vehicleId.in_(vehicle_ids))
+        maintenance = maintenance.where(MaintenanceLog.vehicleId.in_(vehicle_ids))
+
+    events = union_all(trips, expenses, maintenance).subquery("daily_events")
+    return (
+        select(
+            events.c.vehicleId, events.c.day,
+            func.sum(events.c.revenue).label("revenue"),
+            func.sum(events.c.completedTrips).label("completedTrips"),
+            func.sum(events.c.fuelCost).label("fuelCost"),
+            func.sum(events.c.fuelLiters).label("fuelLiters"),
+            func.sum(events.c.maintenanceCost).label("maintenanceCost"),
+        )
+        .group_by(events.c.vehicleId, events.c.day)
+    )
+
+
+# ── Rollup-backed reads ───────────────────────────────────────────────────────
+
+def day_range(column, start: datetime.date = None, end: datetime.date = None) -> list:
+    """
+    Criteria for the date or datetime `column` falling on a day within
+    [start, end]; either end may be open.
+    """
+    upper = end + datetime.timedelta(days=1) if end is not None else None
+    if isinstance(column.type, DateTime):
+        start = datetime.datetime.combine(start, datetime.time.min) if start is not None else None
+        upper = datetime.datetime.combine(upper, datetime.time.min) if upper is not None else None
+    criteria = []
+    if start is not None:
+        criteria.append(column >= start)
+    if upper is not None:
+        criteria.append(column < upper)
+    return criteria
+
+
+def window_totals_subquery(start: datetime.date = None, end: datetime.date = None):
+    """`vehicle_rollups`-shaped totals summed over the daily rollups of days in [start, end]."""
+    d = VehicleDailyRollup
+    stmt = (
+        select(
+            d.vehicleId,
+            func.sum(d.revenue).label("totalRevenue"),
+            func.sum(d.completedTrips).label("completedTrips"),
+            func.sum(d.fuelCost).label("totalFuelCost"),
+            func.sum(d.fuelLiters).label("totalFuelLiters"),
+            func.sum(d.maintenanceCost).label("totalMaintenanceCost"),
+        )
+        .group_by(d.vehicleId)
+    )
+    return stmt.where(*day_range(d.day, start, end)).subquery("window_totals")
+
+
+def window_efficiency_subquery(start: datetime.date = None, end: datetime.date = None):
+    """Measured distance and fuel per vehicle over trips that ended on days in [start, end]."""
+    te = TripEfficiency
+    return (
+        select(
+            te.vehicleId.label("vehicleId"),
+            func.sum(te.distanceKm).label("distanceKm"),
+            func.sum(te.fuelLiters).label("fuelLiters"),
+        )
+        .where(*day_range(te.endDate, start, end))
+        .group_by(te.vehicleId)
+        .subquery("window_efficiency")
+    )
+
+
+def vehicle_totals_query(start: datetime.date = None, end: datetime.date = None):
+    """
+    One row per vehicle with its columns plus every lifetime aggregate.
+    With `start` / `end` the revenue, cost, fuel and trip totals and the
+    measured distance and fuel (trips with a recorded distance, see
+    efficiency.py) cover only those days; lastTripEnd (the maintained
+    `vehicles.lastCompletedTripAt`), avgDriverScore, lifetimeFuelLiters and
+    the recent (last trips) window stay lifetime figures.
+    Callers may add `.where()` / `.order_by()` before executing.
+    """
+    r = VehicleRollup
+    e = VehicleEfficiency
+    windowed = start is not None or end is not None
+    t = window_totals_subquery(start, end) if windowed else r.__table__
+    m = window_efficiency_subquery(start, end) if windowed else e.__table__
+    stmt = (
+        select(
+            Vehicle.id.label("vehicleId"),
+            Vehicle.nameModel,
+            Vehicle.licensePlate,
+            Vehicle.status,
+            Vehicle.odometer,
+            Vehicle.acquisitionCost,
+            func.coalesce(t.c.totalRevenue, 0).label("totalRevenue"),
+            func.coalesce(t.c.completedTrips, 0).label("completedTrips"),
+            r.avgDriverScore,
+            func.coalesce(t.c.totalFuelCost, 0).label("totalFuelCost"),
+            func.coalesce(t.c.totalFuelLiters, 0).label("totalFuelLiters"),
+            func.coalesce(r.totalFuelLiters, 0).label("lifetimeFuelLiters"),
+            func.coalesce(t.c.totalMaintenanceCost, 0).label("totalMaintenanceCost"),
+            Vehicle.lastCompletedTripAt.label("lastTripEnd"),
+            func.coalesce(m.c.distanceKm, 0).label("measuredDistanceKm"),
+            func.coalesce(m.c.fuelLiters, 0).label("measuredFuelLiters"),
+            func.coalesce(e.recentDistanceKm, 0).label("recentDistanceKm"),
+            func.coalesce(e.recentFuelLiters, 0).label("recentFuelLiters"),
+        )
+        .select_from(Vehicle)
+        .outerjoin(r, r.vehicleId == Vehicle.id)
+        .outerjoin(e, e.vehicleId == Vehicle.id)
+    )
+    if windowed:
+        stmt = stmt.outerjoin(t, t.c.vehicleId == Vehicle.id).outerjoin(m, m.c.vehicleId == Vehicle.id)
+    return stmt.order_by(Vehicle.id)
+
+
+def fetch_vehicle_totals(db: Session, *criteria) -> list:
+    """Execute `vehicle_totals_query()` (optionally filtered) and return row mappings."""
+    stmt = vehicle_totals_query()
+    if criteria:
+        stmt = stmt.where(*criteria)
+    return db.execute(stmt).mappings().all()
+
+
+# ── Sort keys (computed in SQL so ORDER BY ... LIMIT happens in the database) ─
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def roi_percent_expr(c):
+    """`roi_row()["roiPercent"]` (unrounded) over the columns `c` of `vehicle_totals_query()`."""
+    net = c.totalRevenue - c.totalMaintenanceCost - c.totalFuelCost
+    return case((func.coalesce(c.acquisitionCost, 0) != 0, net * 100 / c.acquisitionCost), else_=0)
+
+
+def km_per_liter_expr(c):
+    """`fuel_row()["kmPerLiter"]` (unrounded, 0 when no fuel was logged) over the columns `c`."""
+    return case(
+        (c.measuredFuelLiters > 0, c.measuredDistanceKm / c.measuredFuelLiters),
+        (c.lifetimeFuelLiters > 0, c.odometer / c.lifetimeFuelLiters),
+        else_=0,
+    )
+
+
+# name -> (expression over a statement's selected columns, inverted). Inverted
+# keys rank higher as the expression gets smaller: the most idle vehicle has
+# the oldest lastTripEnd.
+VEHICLE_SORT_KEYS = {
+    "id":         (lambda c: c.vehicleId, False),
+    "roi":        (roi_percent_expr, False),
+    "kmPerLiter": (km_per_liter_expr, False),
+    "idleDays":   (lambda c: func.coalesce(c.lastTripEnd, EPOCH), True),
+}
+
+
+def window_trip_totals_subquery(start: datetime.date = None, end: datetime.date = None):
+    """
+    `driver_rollups`-shaped trip totals for trips that ended (see
+    `completed_at`; or, if still open, started) on days in [start, end],
+    grouped from raw `trips`.
+    """
+    completed = Trip.status == TripStatus.COMPLETED
+    criteria = day_range(func.coalesce(Trip.endDate, case((completed, Trip.updatedAt), else_=Trip.startDate)),
+                         start, end)
+    return (
+        select(
+            Trip.driverId.label("driverId"),
+            func.count(Trip.id).label("totalTrips"),
+            func.count(case((completed, 1))).label("completedTrips"),
+            func.sum(case((completed, Trip.revenue), else_=0)).label("totalRevenue"),
+        )
+        .where(*criteria)
+        .group_by(Trip.driverId)
+        .subquery("window_trips")
+    )
+
+
+def driver_totals_query(start: datetime.date = None, end: datetime.date = None):
+    """
+    One row per driver with its columns plus lifetime trip totals, or the
+    totals of trips within [start, end] when either is given.
+    """
+    r = DriverRollup.__table__ if start is None and end is None else window_trip_totals_subquery(start, end)
+    return (
+        select(
+            Driver.id.label("driverId"),
+            Driver.name,
+            Driver.status,
+            Driver.safetyScore,
+            Driver.licenseExpiryDate,
+            func.coalesce(r.c.totalTrips, 0).label("totalTrips"),
+            func.coalesce(r.c.completedTrips, 0).label("completedTrips"),
+            func.coalesce(r.c.totalRevenue, 0).label("totalRevenue"),
+        )
+        .select_from(Driver)
+        .outerjoin(r, r.c.driverId == Driver.id)
+        .order_by(Driver.id)
+    )
+
+
+# Payload keys of `roi_row`, `fuel_row` and `dead_stock_row`, for `fields=`
+ROI_FIELDS = (
+    "vehicleId", "nameModel", "licensePlate", "acquisitionCost", "totalRevenue",
+    "totalMaintenanceCost", "totalFuelCost", "totalCosts", "netProfit", "roiPercent",
+)
+FUEL_FIELDS = (
+    "vehicleId", "nameModel", "licensePlate", "status", "odometer", "totalFuelLiters",
+    "totalFuelCost", "kmPerLiter", "distanceKm", "recentKmPerLiter", "completedTrips",
+)
+DEAD_STOCK_FIELDS = ("vehicleId", "nameModel", "licensePlate", "daysIdle", "lastTripEnd")
+
+
+def roi_row(t) -> dict:
+    """Build the public ROI payload from one `vehicle_totals_query()` row."""
+    total_revenue = float(t["totalRevenue"])
+    total_maint   = float(t["totalMaintenanceCost"])
+    total_fuel    = float(t["totalFuelCost"])
+    total_costs   = total_maint + total_fuel
+    net_profit    = total_revenue - total_costs
+    acquisition   = t["acquisitionCost"]
+    roi           = round(net_profit / float(acquisition) * 100, 2) if acquisition else 0
+    return {
+        "vehicleId": t["vehicleId"], "nameModel": t["nameModel"],
+        "licensePlate": t["licensePlate"], "acquisitionCost": acquisition,
+        "totalRevenue": round(total_revenue, 2),
+        "totalMaintenanceCost": round(total_maint, 2),
+        "totalFuelCost": round(total_fuel, 2),
+        "totalCosts": round(total_costs, 2),
+        "netProfit": round(net_profit, 2), "roiPercent": roi,
+    }
+
+
+def km_per_liter(t):
+    """
+    Unrounded km/L of one `vehicle_totals_query()` row: measured distance over
+    the fuel logged on those trips when there are any, else the estimate of
+    the full odometer over lifetime fuel (vehicles whose trips predate
+    odometer readings); None without fuel.
+    """
+    measured = float(t["measuredFuelLiters"])
+    if measured > 0:
+        return float(t["measuredDistanceKm"]) / measured
+    lifetime = float(t["lifetimeFuelLiters"])
+    return t["odometer"] / lifetime if lifetime > 0 else None
+
+
+def fuel_row(t) -> dict:
+    """Build the public fuel-efficiency payload from one `vehicle_totals_query()` row."""
+    total_fuel = float(t["totalFuelLiters"])
+    efficiency = km_per_liter(t)
+    recent     = float(t["recentFuelLiters"])
+    return {
+        "vehicleId":    t["vehicleId"],
+        "nameModel":    t["nameModel"],
+        "licensePlate": t["licensePlate"],
+        "status":       t["status"],
+        "odometer":     t["odometer"],
+        "totalFuelLiters": round(total_fuel, 2),
+        "totalFuelCost":   round(float(t["totalFuelCost"]), 2),
+        "kmPerLiter":      round(efficiency, 2) if efficiency is not None else None,
+        "distanceKm":      round(float(t["measuredDistanceKm"]), 2),
+        "recentKmPerLiter": round(float(t["recentDistanceKm"]) / recent, 2) if recent > 0 else None,
+        "completedTrips":  t["completedTrips"],
+    }
+
+
+def fleet_totals_query():
+    """Fleet-wide revenue and cost sums over the rollups of existing vehicles."""
+    r = VehicleRollup
+    return (
+        select(
+            func.coalesce(func.sum(r.totalRevenue), 0).label("totalRevenue"),
+            func.coalesce(func.sum(r.totalMaintenanceCost), 0).label("totalMaintenanceCost"),
+            func.coalesce(func.sum(r.totalFuelCost), 0).label("totalFuelCost"),
+        )
+        .select_from(Vehicle)
+        .join(r, r.vehicleId == Vehicle.id)
+    )
+
+
+def idle_cutoff(now: datetime.datetime, idle_days: int = DEAD_STOCK_DAYS) -> datetime.datetime:
+    """Vehicles whose last completed trip ended before this are idle as of `now`."""
+    return now - datetime.timedelta(days=idle_days)
+
+
+def dead_stock_criteria(cutoff: datetime.datetime):
+    """
+    AVAILABLE vehicles never dispatched or whose last completed trip ended
+    before `cutoff`: a range scan of the (status, lastCompletedTripAt) index.
+    """
+    return (
+        Vehicle.status == VehicleStatus.AVAILABLE,
+        or_(
+            Vehicle.lastCompletedTripAt.is_(None),
+            Vehicle.lastCompletedTripAt < cutoff,
+        ),
+    )
+
+
+def dead_stock_query(cutoff: datetime.datetime):
+    """Idle vehicles (see `dead_stock_criteria`) with their last completion time."""
+    return (
+        select(
+            Vehicle.id.label("vehicleId"),
+            Vehicle.nameModel,
+            Vehicle.licensePlate,
+            Vehicle.lastCompletedTripAt.label("lastTripEnd"),
+        )
+        .where(*dead_stock_criteria(cutoff))
+        .order_by(Vehicle.id)
+    )
+
+
+def dead_stock_row(r, now: datetime.datetime) -> dict:
+    """Build the public dead-stock payload from one row with a lastTripEnd, as of `now`."""
+    return {
+        "vehicleId":    r["vehicleId"],
+        "nameModel":    r["nameModel"],
+        "licensePlate": r["licensePlate"],
+        "daysIdle":     (now - r["lastTripEnd"]).days if r["lastTripEnd"] else 999,  # 999 = never used
+        "lastTripEnd":  r["lastTripEnd"],
+    }
+
+
+def fleet_totals_statement(start: datetime.date = None, end: datetime.date = None):
+    """Fleet revenue, completed trips and costs: lifetime, or over the days in [start, end]."""
+    if start is None and end is None:
+        r = VehicleRollup
+        return select(
+            func.sum(r.totalRevenue).label("totalRevenue"),
+            func.sum(r.completedTrips).label("completedTrips"),
+            func.sum(r.totalFuelCost).label("totalFuelCost"),
+            func.sum(r.totalMaintenanceCost).label("totalMaintenanceCost"),
+        )
+    d = VehicleDailyRollup
+    return select(
+        func.sum(d.revenue).label("totalRevenue"),
+        func.sum(d.completedTrips).label("completedTrips"),
+        func.sum(d.fuelCost).label("totalFuelCost"),
+        func.sum(d.maintenanceCost).label("totalMaintenanceCost"),
+    ).where(*day_range(d.day, start, end))
+
+
+def open_trip_counts_query():
+    """Dispatched and draft trip counts, one row per status."""
+    return (
+        select(Trip.status.label("status"), func.count().label("n"))
+        .where(Trip.status.in_([TripStatus.DISPATCHED, TripStatus.DRAFT]))
+        .group_by(Trip.status)
+    )
+
+
+def driver_scalars_query():
+    """Driver headcount, on-duty count and average safety score."""
+    return select(
+        func.count().label("totalDrivers"),
+        func.count(case((Driver.status == "ON_DUTY", 1))).label("onDutyDrivers"),
+        func.avg(Driver.safetyScore).label("avgSafety"),
+    )
+
+
+def summary_aggregate_statements(
+    start: datetime.date = None, end: datetime.date = None, idle_days: int = DEAD_STOCK_DAYS,
+) -> list:
+    """
+    The independent statements behind the dashboard KPIs: vehicle and
+    open-trip status histograms, driver scalars, rollup totals and the
+    dead-stock count (idle for `idle_days`). They can run concurrently (see
+    `database.fetch_all`). `start` / `end` narrow the financial and
+    completed-trip totals; the rest describes the fleet as it is now.
+    """
+    cutoff = idle_cutoff(datetime.datetime.now(), idle_days)
+    return [
+        select(Vehicle.status.label("status"), func.count().label("n")).group_by(Vehicle.status),
+        open_trip_counts_query(),
+        driver_scalars_query(),
+        fleet_totals_statement(start, end),
+        select(func.count().label("deadStockCount"))
+            .select_from(Vehicle)
+            .where(*dead_stock_criteria(cutoff)),
+    ]
+
+
+def fleet_rollup_values(results: list) -> dict:
+    """The `fleet_rollup` columns from the results of `summary_aggregate_statements()`."""
+    vehicle_rows, trip_rows, (drivers,), (totals,), (dead_stock,) = results
+    vehicles = {row["status"]: row["n"] for row in vehicle_rows}
+    trips = {row["status"]: row["n"] for row in trip_rows}
+    return {
+        "availableVehicles":    vehicles.get(VehicleStatus.AVAILABLE, 0),
+        "onTripVehicles":       vehicles.get(VehicleStatus.ON_TRIP, 0),
+        "inShopVehicles":       vehicles.get(VehicleStatus.IN_SHOP, 0),
+        "retiredVehicles":      vehicles.get(VehicleStatus.RETIRED, 0),
+        "dispatchedTrips":      trips.get(TripStatus.DISPATCHED, 0),
+        "draftTrips":           trips.get(TripStatus.DRAFT, 0),
+        "totalDrivers":         drivers["totalDrivers"],
+        "onDutyDrivers":        drivers["onDutyDrivers"],
+        "avgSafety":            drivers["avgSafety"],
+        "totalRevenue":         totals["totalRevenue"] or 0,
+        "completedTrips":       totals["completedTrips"] or 0,
+        "totalFuelCost":        totals["totalFuelCost"] or 0,
+        "totalMaintenanceCost": totals["totalMaintenanceCost"] or 0,
+        "deadStockCount":       dead_stock["deadStockCount"],
+    }
+
+
+def fleet_rollup_statement():
+    """The `fleet_rollup` row the last refresh wrote."""
+    return select(*(c for c in FleetRollup.__table__.columns if c.name != "name"))
+
+
+def fleet_summary_statements(
+    start: datetime.date = None, end: datetime.date = None, idle_days: int = DEAD_STOCK_DAYS,
+) -> list:
+    """
+    The statements behind the dashboard KPIs. The default summary (no
+    window, default `idle_days`) reads the `fleet_rollup` row, so its counts
+    are as of the last rollup refresh; any other summary runs
+    `summary_aggregate_statements()`.
+    """
+    if start is None and end is None and idle_days == DEAD_STOCK_DAYS:
+        return [fleet_rollup_statement()]
+    return summary_aggregate_statements(start, end, idle_days)
+
+
+def fleet_summary(
+    db: Session, start: datetime.date = None, end: datetime.date = None, idle_days: int = DEAD_STOCK_DAYS,
+) -> dict:
+    """Dashboard KPIs, running `fleet_summary_statements()` on `db`."""
+    return build_fleet_summary(
+        [db.execute(s).mappings().all() for s in fleet_summary_statements(start, end, idle_days)])
+
+
+def build_fleet_summary(results: list) -> dict:
+    """Shape the results of `fleet_summary_statements()` into the summary payload."""
+    if len(results) == 1:
+        (rows,) = results
+        return fleet_rollup_summary(rows[0] if rows else {})
+    return fleet_rollup_summary(fleet_rollup_values(results))
+
+
+def fleet_rollup_summary(row) -> dict:
+    """The summary payload from `fleet_rollup` values; zeros before the first refresh."""
+    row = {c.name: row.get(c.name) for c in FleetRollup.__table__.columns}
+    return summary_payload(
+        vehicle_counts={
+            VehicleStatus.AVAILABLE: row["availableVehicles"] or 0,
+            VehicleStatus.ON_TRIP:   row["onTripVehicles"] or 0,
+            VehicleStatus.IN_SHOP:   row["inShopVehicles"] or 0,
+            VehicleStatus.RETIRED:   row["retiredVehicles"] or 0,
+        },
+        open_trips={TripStatus.DISPATCHED: row["dispatchedTrips"] or 0, TripStatus.DRAFT: row["draftTrips"] or 0},
+        drivers={
+            "totalDrivers":  row["totalDrivers"] or 0,
+            "onDutyDrivers": row["onDutyDrivers"] or 0,
+            "avgSafety":     row["avgSafety"],
+        },
+        totals=row,
+        dead_stock_count=row["deadStockCount"] or 0,
+    )
+
+
+def summary_payload(vehicle_counts: dict, open_trips: dict, drivers, totals, dead_stock_count: int) -> dict:
+    """
+    The summary payload from vehicle counts by status, open trip counts by
+    status, the driver scalars row, the fleet totals row (see
+    `fleet_totals_statement`) and the dead-stock count.
+    """
+    total_vehicles   = sum(vehicle_counts.values())
+    active_vehicles  = vehicle_counts.get(VehicleStatus.ON_TRIP, 0)
+    total_revenue    = float(totals["totalRevenue"] or 0)
+    total_fuel_cost  = float(totals["totalFuelCost"] or 0)
+    total_maint_cost = float(totals["totalMaintenanceCost"] or 0)
+    utilization_rate = round((active_vehicles / total_vehicles * 100) if total_vehicles else 0, 1)
+
+    return {
+        "fleet": {
+            "total": total_vehicles,
+            "active": active_vehicles,
+            "inShop": vehicle_counts.get(VehicleStatus.IN_SHOP, 0),
+            "available": vehicle_counts.get(VehicleStatus.AVAILABLE, 0),
+            "utilizationRate": utilization_rate,
+            "deadStockCount": dead_stock_count,
+        },
+        "drivers": {
+            "total": drivers["totalDrivers"],
+            "onDuty": drivers["onDutyDrivers"],
+            "avgSafetyScore": round(float(drivers["avgSafety"] or 0), 1),
+        },
+        "financials": {
+            "totalRevenue": round(total_revenue, 2),
+            "totalFuelCost": round(total_fuel_cost, 2),
+            "totalMaintenanceCost": round(total_maint_cost, 2),
+            "netProfit": round(total_revenue - total_fuel_cost - total_maint_cost, 2),
+        },
+        "trips": {
+            "completed": int(totals["completedTrips"] or 0),
+            "active": open_trips.get(TripStatus.DISPATCHED, 0),
+            "pendingCargo": open_trips.get(TripStatus.DRAFT, 0),
+        },
+    }
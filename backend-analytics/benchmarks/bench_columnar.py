@@ -0,0 +1,89 @@
+"""
+Row path vs. columnar (NumPy) path of the per-vehicle list endpoints.
+
+Seeds a temporary SQLite fleet (100k vehicles by default), then serves
+all-roi, fuel-efficiency and dead-stock in-process through httpx's ASGI
+transport with the response cache off, flipping `columnar.ENABLED` between
+runs. Per endpoint and path it reports CPU time (process-wide, so the
+threadpool is included) and the peak Python heap allocated while serving
+one request, and checks both paths return the same bytes.
+
+Run from backend-analytics/ (needs numpy):
+    python -m benchmarks.bench_columnar [--vehicles 100000] [--repeats 5]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+path = os.path.join(tempfile.mkdtemp(prefix="fleetflow-bench-"), "fleet.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+os.environ["ANALYTICS_CACHE_URL"] = "none"
+os.environ["ROLLUP_MAX_STALENESS_SECONDS"] = "36000"
+
+from sqlalchemy.orm import Session
+
+from database import Base, engine
+from benchmarks.datagen import generate
+import columnar
+import rollups
+
+ENDPOINTS = ["/analytics/all-roi", "/analytics/fuel-efficiency", "/analytics/dead-stock"]
+
+
+async def _measure(repeats: int) -> dict:
+    import httpx
+    from main import app
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get("/analytics/summary")
+        for endpoint in ENDPOINTS:
+            bodies = {}
+            for mode, enabled in (("row", False), ("columnar", True)):
+                columnar.ENABLED = enabled
+                cpu = []
+                for _ in range(repeats):
+                    started = time.process_time()
+                    response = await client.get(endpoint)
+                    cpu.append((time.process_time() - started) * 1000)
+                    response.raise_for_status()
+                tracemalloc.start()
+                bodies[mode] = (await client.get(endpoint)).content
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                results[(endpoint, mode)] = (statistics.median(cpu), peak / 2**20, len(bodies[mode]))
+            results[(endpoint, "same")] = bodies["row"] == bodies["columnar"]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the row and columnar compute paths.")
+    parser.add_argument("--vehicles", type=int, default=100_000)
+    parser.add_argument("--trips-per-vehicle", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    if columnar.np is None:
+        parser.error("numpy is not installed")
+
+    Base.metadata.create_all(engine)
+    generate(engine, args.vehicles, args.vehicles * args.trips_per_vehicle)
+    with Session(engine) as db:
+        rollups.rebuild(db)
+
+    results = asyncio.run(_measure(args.repeats))
+    print(f"{args.vehicles} vehicles (SQLite), median of {args.repeats}\n")
+    print(f"{'endpoint':<28} {'path':<9} {'CPU ms':>8} {'peak MiB':>9} {'MiB out':>8}  same body")
+    for endpoint in ENDPOINTS:
+        for mode in ("row", "columnar"):
+            cpu, peak, size = results[(endpoint, mode)]
+            same = results[(endpoint, "same")] if mode == "columnar" else ""
+            print(f"{endpoint:<28} {mode:<9} {cpu:>8.0f} {peak:>9.1f} {size / 2**20:>8.1f}  {same}")
+
+
+if __name__ == "__main__":
+    main()
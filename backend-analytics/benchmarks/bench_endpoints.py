@@ -0,0 +1,201 @@
+"""
+Latency, query count and memory of every /analytics endpoint across fleet sizes.
+
+For each size a temporary SQLite database is filled by benchmarks.datagen
+(or --database-url names an already seeded one) and a fresh subprocess drives
+the app in-process through httpx's ASGI transport with the response cache
+disabled. Per endpoint it records:
+
+* median / p95 latency over --repeats requests
+* SQL statements issued by one request (sync and async engines)
+* peak Python heap allocated while serving one request (tracemalloc, in a
+  separate pass so tracing does not skew latency)
+
+The report is written as JSON (--out) together with the git commit, so runs
+can be compared later:
+
+    python -m benchmarks.bench_endpoints --sizes 1000,10000 --out before.json
+    python -m benchmarks.bench_endpoints --sizes 1000,10000 --out after.json --compare before.json
+
+/analytics/export-pdf is left out: it waits on a report job whose work
+happens in other processes (see benchmarks.bench_pdf).
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ENDPOINTS = [
+    "/analytics/summary",
+    "/analytics/all-roi",
+    "/analytics/fuel-efficiency",
+    "/analytics/dead-stock",
+    "/analytics/snapshot",
+    "/analytics/vehicle-roi/1",
+    "/analytics/export",
+    "/analytics/export-payroll",
+]
+
+
+async def _measure(repeats: int) -> dict:
+    import httpx
+    from sqlalchemy import event
+    import database
+    from main import app
+
+    statements = 0
+
+    def count(*_):
+        nonlocal statements
+        statements += 1
+
+    event.listen(database.engine, "before_cursor_execute", count)
+    if database.async_engine is not None:
+        event.listen(database.async_engine.sync_engine, "before_cursor_execute", count)
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get(ENDPOINTS[0])  # initial rollup refresh, pools, imports
+        for path in ENDPOINTS:
+            timings = []
+            for _ in range(repeats):
+                statements = 0
+                started = time.perf_counter()
+                response = await client.get(path)
+                timings.append((time.perf_counter() - started) * 1000)
+                response.raise_for_status()
+            per_request = statements
+
+            tracemalloc.start()
+            response = await client.get(path)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            timings.sort()
+            results[path] = {
+                "median_ms": statistics.median(timings),
+                "p95_ms": timings[max(0, int(len(timings) * 0.95) - 1)],
+                "statements": per_request,
+                "peak_kib": peak / 1024,
+                "bytes": len(response.content),
+            }
+    return results
+
+
+def _seed(vehicles: int, trips_per_vehicle: int) -> str:
+    path = os.path.join(tempfile.mkdtemp(prefix="fleetflow-bench-"), "fleet.db")
+    url = f"sqlite:///{path}"
+    code = (
+        "from database import Base, engine\n"
+        "from benchmarks.datagen import generate\n"
+        "import models\n"
+        "Base.metadata.create_all(engine)\n"
+        f"generate(engine, {vehicles}, {vehicles * trips_per_vehicle})\n"
+    )
+    subprocess.run([sys.executable, "-c", code], env=dict(os.environ, DATABASE_URL=url), check=True)
+    return url
+
+
+def _run(database_url: str, args) -> dict:
+    env = dict(
+        os.environ, DATABASE_URL=database_url, DB_MODE=args.db_mode, ANALYTICS_CACHE_URL="none",
+        ROLLUP_MAX_STALENESS_SECONDS="3600",
+    )
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_endpoints", "--worker", "--repeats", str(args.repeats)],
+        env=env, check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _compare(report: dict, baseline: dict, tolerance: float) -> int:
+    """Print per-endpoint changes against `baseline`; return the number of regressions."""
+    regressions = 0
+    print(f"\ncompared with {baseline['commit']} (tolerance {tolerance:.0%})")
+    for size, endpoints in report["sizes"].items():
+        for path, now in endpoints.items():
+            before = baseline["sizes"].get(size, {}).get(path)
+            if before is None:
+                continue
+            notes = []
+            for key in ("median_ms", "peak_kib"):
+                if before[key] and now[key] > before[key] * (1 + tolerance):
+                    notes.append(f"{key} {before[key]:.1f} -> {now[key]:.1f}")
+            if now["statements"] > before["statements"]:
+                notes.append(f"statements {before['statements']} -> {now['statements']}")
+            if notes:
+                regressions += 1
+                print(f"  REGRESSION {size:>7} {path}: " + "; ".join(notes))
+    print(f"  {regressions} regression(s)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every /analytics endpoint across fleet sizes.")
+    parser.add_argument("--sizes", default="1000,10000", help="vehicle counts to seed")
+    parser.add_argument("--trips-per-vehicle", type=int, default=20)
+    parser.add_argument("--database-url", help="benchmark one already seeded database instead")
+    parser.add_argument("--db-mode", choices=["sync", "async"], default="sync")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--out", default="bench_endpoints.json", help="JSON report path")
+    parser.add_argument("--compare", help="earlier JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(asyncio.run(_measure(args.repeats))))
+        return
+
+    if args.database_url:
+        targets = {"existing": args.database_url}
+    else:
+        targets = {size: _seed(int(size), args.trips_per_vehicle) for size in args.sizes.split(",")}
+
+    report = {
+        "commit": _commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "dbMode": args.db_mode,
+        "tripsPerVehicle": args.trips_per_vehicle,
+        "repeats": args.repeats,
+        "sizes": {},
+    }
+    print(f"{'vehicles':>8} {'endpoint':<28} {'median ms':>10} {'p95 ms':>9} {'stmts':>6} {'peak KiB':>9}")
+    for size, url in targets.items():
+        results = _run(url, args)
+        report["sizes"][size] = results
+        for path, r in results.items():
+            print(f"{size:>8} {path:<28} {r['median_ms']:>10.1f} {r['p95_ms']:>9.1f} "
+                  f"{r['statements']:>6} {r['peak_kib']:>9.0f}")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nreport written to {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if _compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Before/after timings for the analytics composite indexes.
+
+Seeds a temporary SQLite file, then runs the index advisor's query catalog
+twice: first with only the single-column foreign-key indexes MySQL creates
+implicitly (the state after the init migration), then with the indexes
+declared in models.py / the analytics_indexes migration.
+
+Run from backend-analytics/:
+    python -m benchmarks.bench_indexes [--vehicles 20000] [--trips-per-vehicle 10]
+"""
+import argparse
+import os
+import tempfile
+
+path = os.path.join(tempfile.mkdtemp(prefix="fleetflow-bench-"), "fleet.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database import Base, engine
+from models import Driver, Trip, Expense, MaintenanceLog, Vehicle
+from benchmarks.datagen import generate
+from benchmarks.index_advisor import advise
+import rollups
+
+ANALYTICS_INDEXES = [
+    index
+    for model in (Vehicle, Driver, Trip, Expense, MaintenanceLog)
+    for index in model.__table__.indexes
+    if not index.name.startswith("ix_")
+]
+
+# What MySQL creates implicitly for the init migration's foreign keys.
+FK_INDEXES = [
+    'CREATE INDEX "trips_vehicleId_fkey" ON trips ("vehicleId")',
+    'CREATE INDEX "trips_driverId_fkey" ON trips ("driverId")',
+    'CREATE INDEX "expenses_tripId_fkey" ON expenses ("tripId")',
+    'CREATE INDEX "expenses_vehicleId_fkey" ON expenses ("vehicleId")',
+    'CREATE INDEX "maintenance_logs_vehicleId_fkey" ON maintenance_logs ("vehicleId")',
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time analytics queries without and with the composite indexes.")
+    parser.add_argument("--vehicles", type=int, default=20000)
+    parser.add_argument("--trips-per-vehicle", type=int, default=10)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    for index in ANALYTICS_INDEXES:
+        index.drop(engine)
+    with engine.begin() as conn:
+        for ddl in FK_INDEXES:
+            conn.execute(text(ddl))
+    generate(engine, args.vehicles, args.vehicles * args.trips_per_vehicle)
+    with Session(engine) as db:
+        rollups.rebuild(db)
+        db.execute(text("ANALYZE"))
+        before = advise(db, timings=True)
+
+    for index in ANALYTICS_INDEXES:
+        index.create(engine)
+    with Session(engine) as db:
+        db.execute(text("ANALYZE"))
+        after = advise(db, timings=True)
+
+    print(f"{args.vehicles} vehicles, {args.vehicles * args.trips_per_vehicle} trips (SQLite)\n")
+    print(f"{'query':<36} {'before ms':>10} {'after ms':>10}  full scans before -> after")
+    for (name, scans_before, ms_before), (_, scans_after, ms_after) in zip(before, after):
+        print(f"{name:<36} {ms_before:>10.1f} {ms_after:>10.1f}  "
+              f"{','.join(scans_before) or '-'} -> {','.join(scans_after) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
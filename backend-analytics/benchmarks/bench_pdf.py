@@ -0,0 +1,89 @@
+"""
+Benchmark the fleet audit PDF: one big table vs. chunked multi-process rendering.
+
+Each fleet size is seeded into a temporary SQLite file (chunk workers are
+separate processes and need a shared database), then every mode renders the
+full audit in a fresh subprocess. Peak memory is the maximum resident set
+size of the rendering process and, separately, of its largest chunk worker;
+tracemalloc is not used because it cannot see the workers and slows
+ReportLab down several-fold.
+
+Run from backend-analytics/:
+    python -m benchmarks.bench_pdf [--sizes 1000,10000,50000] [--modes single,chunked]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def _worker(large: bool) -> dict:
+    import reports
+
+    started = time.perf_counter()
+    with tempfile.TemporaryFile() as out:
+        reports.build_audit_pdf(out, large=large)
+        size = out.tell()
+    return {
+        "seconds": time.perf_counter() - started,
+        "bytes": size,
+        "rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "worker_rss_mib": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+
+def _seed_sqlite(vehicles: int) -> str:
+    path = os.path.join(tempfile.mkdtemp(prefix="fleetflow-bench-"), "fleet.db")
+    url = f"sqlite:///{path}"
+    code = (
+        "from sqlalchemy import create_engine\n"
+        "from sqlalchemy.orm import Session\n"
+        "from database import Base\n"
+        "from benchmarks.datagen import generate\n"
+        "import rollups\n"
+        f"engine = create_engine({url!r})\n"
+        "Base.metadata.create_all(engine)\n"
+        f"generate(engine, {vehicles}, {vehicles * 2})\n"
+        "with Session(engine) as db:\n"
+        "    rollups.rebuild(db)\n"
+    )
+    subprocess.run([sys.executable, "-c", code], env=dict(os.environ, DATABASE_URL=url), check=True)
+    return url
+
+
+def _run(database_url: str, mode: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_pdf", "--worker", mode],
+        env=dict(os.environ, DATABASE_URL=database_url),
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fleet audit PDF rendering.")
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--modes", default="single,chunked")
+    parser.add_argument("--worker", choices=["single", "chunked"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(_worker(args.worker == "chunked")))
+        return
+
+    print(f"{'vehicles':>9} {'mode':>8} {'seconds':>9} {'MiB out':>8} {'RSS MiB':>8} {'worker MiB':>11}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        url = _seed_sqlite(size)
+        for mode in args.modes.split(","):
+            r = _run(url, mode)
+            worker = f"{r['worker_rss_mib']:.0f}" if mode == "chunked" else "-"
+            print(f"{size:>9} {mode:>8} {r['seconds']:>9.2f} {r['bytes'] / 2**20:>8.1f} "
+                  f"{r['rss_mib']:>8.0f} {worker:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Read-replica routing and failover against two local database instances.
+
+Seeds a temporary SQLite fleet as the primary and copies it to a second
+file as the replica (SQLite stands in for two MySQL servers: each file is
+its own database with its own pool). Each scenario then runs the app
+in-process in a fresh subprocess, with the response cache off and its own
+DATABASE_REPLICA_URLS, and serves the list endpoints --repeats times:
+
+* primary          no replicas (the pre-routing setup)
+* primary+ping     the same with DB_POOL_PRE_PING=1
+* replicas         two replica URLs: reads alternate between them
+* one down         a reachable replica and one that refuses connections:
+                   one failover, then reads stay on the reachable one
+* all down         only an unreachable replica: reads fall back to primary
+
+Per scenario it prints the median latency, the pool checkouts per pool from
+GET /metrics, the failover count, and whether every body matches the
+primary scenario's. tests/test_replicas.py asserts the bodies, checkouts
+and failovers of the routing scenarios; this script adds the latencies.
+
+Run from backend-analytics/:
+    python -m benchmarks.bench_replicas [--vehicles 2000] [--repeats 20]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ENDPOINTS = ["/analytics/summary", "/analytics/all-roi", "/analytics/fuel-efficiency", "/analytics/dead-stock"]
+
+
+def _worker(repeats: int):
+    import asyncio
+    import httpx
+    from main import app
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            digests, times = {}, []
+            for endpoint in ENDPOINTS:
+                response = await client.get(endpoint)
+                response.raise_for_status()
+                digests[endpoint] = hashlib.sha1(response.content).hexdigest()
+            for _ in range(repeats):
+                for endpoint in ENDPOINTS:
+                    started = time.perf_counter()
+                    (await client.get(endpoint)).raise_for_status()
+                    times.append((time.perf_counter() - started) * 1000)
+            exposition = (await client.get("/metrics")).text
+        checkouts = {
+            m.group(1): int(m.group(2))
+            for m in re.finditer(r'fleetflow_analytics_db_pool_checkouts_total\{pool="([^"]+)"\} (\d+)', exposition)
+        }
+        failovers = int(re.search(r"fleetflow_analytics_db_read_failovers_total (\d+)", exposition).group(1))
+        return {"digests": digests, "median_ms": statistics.median(times),
+                "checkouts": checkouts, "failovers": failovers}
+
+    print(json.dumps(asyncio.run(run())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exercise read-replica routing on two local databases.")
+    parser.add_argument("--vehicles", type=int, default=2000)
+    parser.add_argument("--trips-per-vehicle", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="fleetflow-bench-")
+    primary = os.path.join(workdir, "primary.db")
+    replica = os.path.join(workdir, "replica.db")
+    unreachable = os.path.join(workdir, "missing", "replica.db")  # parent dir does not exist
+
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{primary}", ANALYTICS_CACHE_URL="none",
+               ROLLUP_MAX_STALENESS_SECONDS="36000", ANALYTICS_SLOW_REQUEST_MS="0")
+    env.pop("DATABASE_REPLICA_URLS", None)
+    seed = (
+        "from sqlalchemy.orm import Session\n"
+        "from database import Base, engine\n"
+        "from benchmarks.datagen import generate\n"
+        "import rollups\n"
+        "Base.metadata.create_all(engine)\n"
+        f"generate(engine, {args.vehicles}, {args.vehicles * args.trips_per_vehicle})\n"
+        "rollups.create_tables()\n"
+        "with Session(engine) as db:\n"
+        "    rollups.rebuild(db)\n"
+    )
+    subprocess.run([sys.executable, "-c", seed], env=env, check=True)
+    shutil.copyfile(primary, replica)
+
+    scenarios = {
+        "primary":      {},
+        "primary+ping": {"DB_POOL_PRE_PING": "1"},
+        "replicas":     {"DATABASE_REPLICA_URLS": f"sqlite:///{replica},sqlite:///{replica}"},
+        "one down":     {"DATABASE_REPLICA_URLS": f"sqlite:///{replica},sqlite:///{unreachable}"},
+        "all down":     {"DATABASE_REPLICA_URLS": f"sqlite:///{unreachable}"},
+    }
+    results = {}
+    for name, overrides in scenarios.items():
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_replicas", "--worker", str(args.repeats)],
+            env=dict(env, **overrides), capture_output=True, text=True, check=True,
+        ).stdout
+        results[name] = json.loads(out)
+
+    print(f"{args.vehicles} vehicles (SQLite), {len(ENDPOINTS)} endpoints x {args.repeats}\n")
+    print(f"{'scenario':<13} {'median ms':>9} {'failovers':>9}  {'same bodies':<11}  checkouts by pool")
+    baseline = results["primary"]["digests"]
+    for name, r in results.items():
+        pools = ", ".join(f"{pool}={n}" for pool, n in sorted(r["checkouts"].items()))
+        same = r["digests"] == baseline
+        print(f"{name:<13} {r['median_ms']:>9.1f} {r['failovers']:>9}  {str(same):<11}  {pools}")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    if "--worker" in sys.argv:
+        _worker(int(sys.argv[-1]))
+    else:
+        main()
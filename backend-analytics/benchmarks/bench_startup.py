@@ -0,0 +1,147 @@
+"""
+Cold-start time of the analytics service, with and without the startup warm-up.
+
+Each run is a fresh subprocess that imports `main`, runs the app's lifespan
+and then requests /health and /analytics/summary in-process through httpx's
+ASGI transport, as the first client of a new pod would. Per run it records:
+
+* import_ms    time to `import main`
+* startup_ms   lifespan startup (rollup tables, and the warm-up when enabled)
+* health_ms    from the start of the import to the first successful /health
+* summary_ms   from the start of the import to the first successful /analytics/summary
+* first_summary_ms   the first /analytics/summary request on its own
+
+It also checks what importing `main` must not do: load ReportLab or pypdf
+(PDFs render in the report-job workers) or create database engines. The
+script exits non-zero when a check fails or a median exceeds its budget;
+tests/test_startup.py runs the same checks under pytest.
+
+Run from backend-analytics/:
+    python -m benchmarks.bench_startup [--runs 5] [--max-import-ms 1500] [--max-health-ms 2500]
+                                       [--max-summary-ms 3000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+EAGER_FORBIDDEN = ("reportlab", "pypdf")
+
+# Budgets for the medians with the warm-up on (ms)
+MAX_IMPORT_MS = 1500
+MAX_HEALTH_MS = 2500
+MAX_SUMMARY_MS = 3000
+
+
+async def _measure() -> dict:
+    import httpx  # the benchmark's own client, not part of the service's import
+
+    started = time.perf_counter()
+    import database
+    from main import app
+    imported = time.perf_counter()
+    loaded = sorted({m.split(".")[0] for m in sys.modules} & set(EAGER_FORBIDDEN))
+    engines_at_import = bool(database._engines)
+
+    async def first_ok(client, path):
+        response = await client.get(path)
+        response.raise_for_status()
+        return time.perf_counter()
+
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            health = await first_ok(client, "/health")
+            before_summary = time.perf_counter()
+            summary = await first_ok(client, "/analytics/summary")
+
+    return {
+        "import_ms": (imported - started) * 1000,
+        "startup_ms": (ready - imported) * 1000,
+        "health_ms": (health - started) * 1000,
+        "summary_ms": (summary - started) * 1000,
+        "first_summary_ms": (summary - before_summary) * 1000,
+        "eager_imports": loaded,
+        "engines_at_import": engines_at_import,
+    }
+
+
+def _seed(vehicles: int) -> str:
+    path = os.path.join(tempfile.mkdtemp(prefix="fleetflow-bench-"), "fleet.db")
+    url = f"sqlite:///{path}"
+    code = (
+        "from database import Base, engine\n"
+        "from benchmarks.datagen import generate\n"
+        "import models\n"
+        "Base.metadata.create_all(engine)\n"
+        f"generate(engine, {vehicles}, {vehicles * 20})\n"
+    )
+    subprocess.run([sys.executable, "-c", code], env=dict(os.environ, DATABASE_URL=url), check=True)
+    return url
+
+
+def _run(database_url: str, warmup: bool) -> dict:
+    env = dict(os.environ, DATABASE_URL=database_url, ANALYTICS_WARMUP="1" if warmup else "0")
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--worker"],
+        env=env, check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure analytics service cold starts.")
+    parser.add_argument("--vehicles", type=int, default=1000, help="fleet size to seed")
+    parser.add_argument("--database-url", help="start against an already seeded database instead")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per mode")
+    parser.add_argument("--max-import-ms", type=float, default=MAX_IMPORT_MS, help="budget for the median import_ms")
+    parser.add_argument("--max-health-ms", type=float, default=MAX_HEALTH_MS,
+                        help="budget for the median health_ms with the warm-up on")
+    parser.add_argument("--max-summary-ms", type=float, default=MAX_SUMMARY_MS,
+                        help="budget for the median summary_ms with the warm-up on")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(asyncio.run(_measure())))
+        return
+
+    url = args.database_url or _seed(args.vehicles)
+    _run(url, warmup=True)  # first start creates the rollup tables and builds the rollups
+
+    keys = ("import_ms", "startup_ms", "health_ms", "summary_ms", "first_summary_ms")
+    print(f"{'warm-up':<8} " + " ".join(f"{k:>16}" for k in keys))
+    medians, failures = {}, []
+    for warmup in (True, False):
+        runs = [_run(url, warmup) for _ in range(args.runs)]
+        medians[warmup] = {k: statistics.median(r[k] for r in runs) for k in keys}
+        print(f"{'on' if warmup else 'off':<8} " + " ".join(f"{medians[warmup][k]:>16.1f}" for k in keys))
+        for r in runs:
+            if r["eager_imports"]:
+                failures.append(f"importing main loaded {', '.join(r['eager_imports'])}")
+            if r["engines_at_import"]:
+                failures.append("importing main created database engines")
+
+    if medians[True]["import_ms"] > args.max_import_ms:
+        failures.append(f"median import {medians[True]['import_ms']:.0f} ms > {args.max_import_ms:.0f} ms")
+    if medians[True]["health_ms"] > args.max_health_ms:
+        failures.append(f"median time to first health check {medians[True]['health_ms']:.0f} ms "
+                        f"> {args.max_health_ms:.0f} ms")
+    if medians[True]["summary_ms"] > args.max_summary_ms:
+        failures.append(f"median time to first summary {medians[True]['summary_ms']:.0f} ms "
+                        f"> {args.max_summary_ms:.0f} ms")
+    for failure in sorted(set(failures)):
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark /analytics/summary from 100 to 50k vehicles.
+
+Seeds an in-memory SQLite stand-in at each fleet size, builds the rollups,
+then reports the median latency and the number of SQL statements one
+summary call issues. The default summary reads the pre-aggregated
+fleet_rollup row, so the script fails if the statement count changes with
+fleet size or the median latency at the largest size exceeds
+MAX_LATENCY_RATIO times the smallest.
+
+Run from backend-analytics/:
+    python -m benchmarks.bench_summary [--sizes 100,1000,10000,50000] [--max-latency-ratio 3]
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from aggregates import fleet_summary
+from benchmarks.datagen import generate
+import rollups
+
+TRIPS_PER_VEHICLE = 5
+MAX_LATENCY_RATIO = 3
+
+
+def run(size: int, repeats: int) -> dict:
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    generate(engine, size, size * TRIPS_PER_VEHICLE)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        rollups.rebuild(db)
+
+    statements = 0
+
+    def count(*_):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    timings = []
+    for _ in range(repeats):
+        statements = 0
+        with Session() as db:
+            t0 = time.perf_counter()
+            fleet_summary(db)
+            timings.append((time.perf_counter() - t0) * 1000)
+    engine.dispose()
+    return {"vehicles": size, "statements": statements, "median_ms": statistics.median(timings)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="100,1000,10000,50000")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--max-latency-ratio", type=float, default=MAX_LATENCY_RATIO,
+                        help="largest-to-smallest fleet median latency limit")
+    args = parser.parse_args()
+
+    print(f"{'vehicles':>10} {'statements':>11} {'median ms':>10}")
+    results = [run(int(s), args.repeats) for s in args.sizes.split(",")]
+    for r in results:
+        print(f"{r['vehicles']:>10} {r['statements']:>11} {r['median_ms']:>10.1f}")
+
+    if len({r["statements"] for r in results}) != 1:
+        raise SystemExit("statement count grew with fleet size")
+    smallest, largest = min(results, key=lambda r: r["vehicles"]), max(results, key=lambda r: r["vehicles"])
+    ratio = largest["median_ms"] / smallest["median_ms"]
+    if ratio > args.max_latency_ratio:
+        raise SystemExit(f"median latency grew {ratio:.1f}x from {smallest['vehicles']} to "
+                         f"{largest['vehicles']} vehicles (limit {args.max_latency_ratio}x)")
+    print(f"latency ratio {ratio:.1f}x: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Synthetic fleet generator for benchmarks and load tests.
+
+Bulk-loads vehicles, drivers, trips, expenses and maintenance logs into the
+database at DATABASE_URL (or --database-url). Rows are produced lazily and
+written in batches of --batch rows per executemany call; PyMySQL turns each
+batch into multi-row `INSERT ... VALUES (...), (...)` statements, and SQLite
+runs it as one prepared statement. Memory stays flat whatever the volume.
+
+Tables are reflected from the live database, so the Prisma-managed MySQL
+schema (NOT NULL createdAt/updatedAt without defaults) and the SQLite
+stand-in created from models.py both work. New rows get ids after the
+current maximum, so generating into a non-empty database appends.
+`vehicles.lastCompletedTripAt` is filled in afterwards the way backend-core's
+backfill job does it.
+
+Run from backend-analytics/:
+    python -m benchmarks.datagen --vehicles 10000 --trips 5000000
+    python -m benchmarks.datagen --vehicles 1000 --trips 50000 --reset --database-url sqlite:////tmp/fleet.db
+"""
+import argparse
+import datetime
+import itertools
+import random
+import time
+
+from sqlalchemy import MetaData, create_engine, delete, func, insert, select, update
+
+TABLES = ["vehicles", "drivers", "trips", "expenses", "maintenance_logs"]
+
+VEHICLE_STATUSES = (["AVAILABLE", "ON_TRIP", "IN_SHOP", "RETIRED"], [55, 30, 10, 5])
+DRIVER_STATUSES  = (["AVAILABLE", "ON_DUTY", "SUSPENDED"], [50, 40, 10])
+TRIP_STATUSES    = (["COMPLETED", "CANCELLED", "DISPATCHED", "DRAFT"], [75, 10, 10, 5])
+MODELS = ["Tata Ace Gold", "Ashok Leyland Dost+", "Mahindra Bolero Pickup", "Eicher Pro 1049", "Toyota HiAce"]
+
+
+def _batches(rows, size: int):
+    it = iter(rows)
+    while batch := list(itertools.islice(it, size)):
+        yield batch
+
+
+class _Writer:
+    """Batched inserts into one reflected table, filling Prisma's timestamp columns."""
+
+    def __init__(self, conn, table, batch: int, now: datetime.datetime):
+        self.conn, self.table, self.batch = conn, table, batch
+        self.stamps = {c: now for c in ("createdAt", "updatedAt") if c in table.c}
+        self.count = 0
+
+    def next_id(self) -> int:
+        return (self.conn.execute(select(func.max(self.table.c.id))).scalar() or 0) + 1
+
+    def write(self, rows):
+        for batch in _batches(rows, self.batch):
+            if self.stamps:
+                batch = [{**self.stamps, **row} for row in batch]
+            self.conn.execute(insert(self.table), batch)
+            self.count += len(batch)
+
+
+def generate(engine, vehicles: int, trips: int, drivers: int = None, expenses_per_trip: float = 1.0,
+             maintenance_per_vehicle: float = 5.0, days: int = 365, batch: int = 5000,
+             seed: int = None, reset: bool = False) -> dict:
+    """
+    Insert a synthetic fleet and return the number of rows written per table.
+    Trips, expenses and maintenance dates spread over the last `days` days.
+    """
+    rnd = random.Random(vehicles if seed is None else seed)
+    # Trip distances have their own stream so a seed still yields the same other columns.
+    odo = random.Random(f"{vehicles if seed is None else seed}:odometer")
+    now = datetime.datetime.now().replace(microsecond=0)
+    drivers = drivers or max(1, vehicles // 2)
+    meta = MetaData()
+    meta.reflect(engine, only=TABLES)
+    t = meta.tables
+
+    with engine.begin() as conn:
+        if reset:
+            for name in reversed(TABLES):
+                conn.execute(delete(t[name]))
+        w = {name: _Writer(conn, t[name], batch, now) for name in TABLES}
+
+        v0 = w["vehicles"].next_id()
+        w["vehicles"].write(
+            {"id": v0 + i, "nameModel": f"{rnd.choice(MODELS)} #{v0 + i}",
+             "licensePlate": f"BM{v0 + i:08d}", "maxCapacityKg": rnd.choice([800, 1200, 1500, 3000]),
+             "odometer": round(rnd.uniform(0, 250_000), 1),
+             "status": rnd.choices(*VEHICLE_STATUSES)[0],
+             "acquisitionCost": round(rnd.uniform(4e5, 2.5e6), -3)}
+            for i in range(vehicles)
+        )
+        d0 = w["drivers"].next_id()
+        w["drivers"].write(
+            {"id": d0 + i, "name": f"Driver {d0 + i}",
+             "licenseExpiryDate": now + datetime.timedelta(days=rnd.randint(-90, 1500)),
+             "status": rnd.choices(*DRIVER_STATUSES)[0], "safetyScore": rnd.randint(55, 100)}
+            for i in range(drivers)
+        )
+
+        t0 = w["trips"].next_id()
+        e0 = w["expenses"].next_id()
+        expense_ids = itertools.count(e0)
+
+        def trip_rows():
+            for n in range(trips):
+                status = rnd.choices(*TRIP_STATUSES)[0]
+                start = now - datetime.timedelta(minutes=rnd.randint(0, days * 1440))
+                end = start + datetime.timedelta(hours=rnd.randint(1, 48)) if status == "COMPLETED" else None
+                begin = km = None
+                if status == "COMPLETED":
+                    begin, km = round(odo.uniform(0, 250_000), 1), round(odo.uniform(20, 900), 1)
+                yield {"id": t0 + n, "vehicleId": v0 + rnd.randrange(vehicles),
+                       "driverId": d0 + rnd.randrange(drivers), "cargoWeight": rnd.randint(50, 3000),
+                       "status": status, "revenue": round(rnd.uniform(2_000, 60_000), 2) if status == "COMPLETED" else 0,
+                       "startDate": start, "endDate": end, "updatedAt": end or start,
+                       "startOdometer": begin, "endOdometer": km and round(begin + km, 1), "distanceKm": km}
+
+        expense_rows = []
+
+        def trips_with_expenses():
+            # Expenses reference trips, so they are queued while trips stream out
+            # and flushed once the trips batch holding their tripId is written.
+            for trip in trip_rows():
+                k = int(expenses_per_trip) + (rnd.random() < expenses_per_trip % 1)
+                for _ in range(k):
+                    liters = round(rnd.uniform(10, 250), 2)
+                    expense_rows.append({
+                        "id": next(expense_ids), "tripId": trip["id"], "vehicleId": trip["vehicleId"],
+                        "fuelLiters": liters, "fuelCost": round(liters * rnd.uniform(90, 110), 2),
+                        "date": trip["endDate"] or trip["startDate"],
+                    })
+                yield trip
+
+        for trip_batch in _batches(trips_with_expenses(), batch):
+            w["trips"].write(trip_batch)
+            w["expenses"].write(expense_rows)
+            expense_rows.clear()
+
+        m0 = w["maintenance_logs"].next_id()
+        w["maintenance_logs"].write(
+            {"id": m0 + n, "vehicleId": v0 + rnd.randrange(vehicles),
+             "description": rnd.choice(["Oil change", "Tyre replacement", "Brake service", "Engine repair"]),
+             "cost": round(rnd.uniform(1_500, 80_000), 2),
+             "date": now - datetime.timedelta(minutes=rnd.randint(0, days * 1440))}
+            for n in range(int(vehicles * maintenance_per_vehicle))
+        )
+
+        v, tr = t["vehicles"], t["trips"]
+        conn.execute(
+            update(v).where(v.c.id >= v0).values(lastCompletedTripAt=(
+                select(func.max(tr.c.endDate))
+                .where(tr.c.vehicleId == v.c.id, tr.c.status == "COMPLETED")
+                .scalar_subquery()
+            ))
+        )
+    return {name: writer.count for name, writer in w.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load a synthetic FleetFlow dataset.")
+    parser.add_argument("--database-url", help="target database (default: DATABASE_URL)")
+    parser.add_argument("--vehicles", type=int, default=1000)
+    parser.add_argument("--drivers", type=int, help="default: vehicles / 2")
+    parser.add_argument("--trips", type=int, default=50_000)
+    parser.add_argument("--expenses-per-trip", type=float, default=1.0)
+    parser.add_argument("--maintenance-per-vehicle", type=float, default=5.0)
+    parser.add_argument("--days", type=int, default=365, help="history spread, in days")
+    parser.add_argument("--batch", type=int, default=5000, help="rows per INSERT batch")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--reset", action="store_true", help="delete existing fleet rows first")
+    args = parser.parse_args()
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        from database import engine
+
+    started = time.perf_counter()
+    counts = generate(
+        engine, args.vehicles, args.trips, drivers=args.drivers,
+        expenses_per_trip=args.expenses_per_trip, maintenance_per_vehicle=args.maintenance_per_vehicle,
+        days=args.days, batch=args.batch, seed=args.seed, reset=args.reset,
+    )
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    print(", ".join(f"{n} {name}" for name, n in counts.items()))
+    print(f"{total} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
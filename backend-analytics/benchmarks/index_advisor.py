@@ -0,0 +1,167 @@
+"""
+EXPLAIN every analytics query shape and flag full table scans.
+
+Each entry in `query_catalog` is one statement the service issues (rollup
+rebuild/refresh scans, rollup-backed reads, summary statements) together
+with the tables it is expected to read in full. Any other table the planner
+scans end to end is reported as a missing index.
+
+Understands MySQL (`EXPLAIN`, type=ALL) and SQLite (`EXPLAIN QUERY PLAN`,
+plain `SCAN`). Run from backend-analytics/:
+    python -m benchmarks.index_advisor [--time] [--strict]
+"""
+import argparse
+import datetime
+import re
+import statistics
+import sys
+import time
+
+from sqlalchemy import select, union
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from database import Base, engine
+from models import Driver, Trip, Expense, MaintenanceLog, Vehicle
+from aggregates import (
+    idle_cutoff, live_vehicle_totals_select, live_driver_totals_select, live_daily_totals_select,
+    vehicle_totals_query, driver_totals_query, dead_stock_query, fleet_totals_query,
+    summary_aggregate_statements, fleet_rollup_statement,
+)
+from rollups import ID_CHUNK
+from efficiency import anomalies_query, measured_trips_query
+from timeseries import series_query
+
+SUMMARY_NAMES = ["vehicle status", "open trips", "drivers", "rollup totals", "dead-stock count"]
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    prefix = "EXPLAIN QUERY PLAN " if compiler.dialect.name == "sqlite" else "EXPLAIN "
+    return prefix + compiler.process(element.statement, **kw)
+
+
+def query_catalog(db: Session) -> list:
+    """`(name, statement, tables it may scan in full)` for every analytics query shape."""
+    vehicle_ids = db.execute(select(Vehicle.id).order_by(Vehicle.id).limit(ID_CHUNK)).scalars().all() or [0]
+    driver_ids = db.execute(select(Driver.id).order_by(Driver.id).limit(ID_CHUNK)).scalars().all() or [0]
+    recent = datetime.datetime.now() - datetime.timedelta(minutes=5)
+    cutoff = idle_cutoff(datetime.datetime.now())
+    month_ago = datetime.date.today() - datetime.timedelta(days=30)
+    everything = {"vehicles", "drivers", "trips", "expenses", "maintenance_logs"}
+
+    catalog = [
+        ("rebuild: vehicle totals", live_vehicle_totals_select(), everything),
+        ("rebuild: daily totals", live_daily_totals_select(), everything),
+        ("rebuild: driver totals", live_driver_totals_select(), everything),
+        ("refresh: vehicle totals", live_vehicle_totals_select(vehicle_ids), set()),
+        ("refresh: daily totals", live_daily_totals_select(vehicle_ids), set()),
+        ("refresh: driver totals", live_driver_totals_select(driver_ids), set()),
+        ("refresh: changed trips",
+         select(Trip.vehicleId, Trip.driverId).where(Trip.updatedAt >= recent), set()),
+        ("refresh: changed drivers", select(Driver.id).where(Driver.updatedAt >= recent), set()),
+        ("refresh: new expenses/maintenance", union(
+            select(Expense.vehicleId).where(Expense.id > 0),
+            select(MaintenanceLog.vehicleId).where(MaintenanceLog.id > 0),
+        ), {"expenses", "maintenance_logs"}),
+        ("refresh: trips with new fuel",
+         select(Expense.tripId).where(Expense.id > 0, Expense.tripId.is_not(None)), {"expenses"}),
+        ("efficiency: one vehicle's measured trips",
+         measured_trips_query(Trip.vehicleId == vehicle_ids[0], Trip.endDate >= month_ago), set()),
+        ("refresh: drivers' vehicles",
+         select(Trip.vehicleId).where(Trip.driverId.in_(driver_ids)).distinct(), set()),
+        ("vehicle totals", vehicle_totals_query(), {"vehicles"}),
+        ("driver totals", driver_totals_query(), {"drivers"}),
+        ("dead stock", dead_stock_query(cutoff), set()),
+        ("fleet totals", fleet_totals_query(), {"vehicles", "vehicle_rollups"}),
+        ("vehicle totals, 30-day window", vehicle_totals_query(month_ago), {"vehicles"}),
+        ("efficiency anomalies, 30-day window", anomalies_query(start=month_ago), set()),
+        ("efficiency anomalies, one vehicle", anomalies_query(vehicle_ids[0]), set()),
+        ("timeseries: fleet by week", series_query("week", month_ago, None), set()),
+        ("timeseries: one vehicle by day", series_query("day", month_ago, None, vehicle_ids[0]), set()),
+    ]
+    allowed = [set(), set(), {"drivers"}, {"vehicles", "vehicle_rollups"}, set()]
+    for name, stmt, ok in zip(SUMMARY_NAMES, summary_aggregate_statements(), allowed):
+        catalog.append((f"summary: {name}", stmt, ok))
+    catalog.append(("summary: fleet rollup", fleet_rollup_statement(), {"fleet_rollup"}))  # one row
+    return catalog
+
+
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+
+def full_scans(db: Session, stmt) -> tuple:
+    """`(plan lines, real tables scanned in full)` for `stmt` on the current dialect."""
+    # The compiled EXPLAIN still carries the inner SELECT's result columns,
+    # so read the plan rows straight off the DBAPI cursor.
+    cursor = db.execute(Explain(stmt)).cursor
+    names = [d[0] for d in cursor.description]
+    rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+    tables = set(Base.metadata.tables)
+    if db.bind.dialect.name == "sqlite":
+        plan = [r["detail"] for r in rows]
+        scanned = {m.group(1) for m in map(_SQLITE_SCAN.match, plan) if m}
+    else:
+        plan = [f"{r['table']}: type={r['type']} key={r['key']} rows={r['rows']} {r['Extra'] or ''}".strip()
+                for r in rows]
+        scanned = {r["table"] for r in rows if r["type"] == "ALL"}
+    return plan, scanned & tables
+
+
+def time_query(db: Session, stmt, repeats: int = 3) -> float:
+    """Median wall time in milliseconds of fetching every row of `stmt`."""
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        db.execute(stmt).all()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def advise(db: Session, timings: bool = False, verbose: bool = False) -> list:
+    """Run the catalog; returns `(name, unexpected full scans, ms or None)` per query."""
+    report = []
+    for name, stmt, allowed in query_catalog(db):
+        plan, scanned = full_scans(db, stmt)
+        unexpected = sorted(scanned - allowed)
+        ms = time_query(db, stmt) if timings else None
+        report.append((name, unexpected, ms))
+        if verbose:
+            print(f"\n{name}")
+            for line in plan:
+                print(f"    {line}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flag full table scans in analytics queries.")
+    parser.add_argument("--time", action="store_true", help="also report median query time")
+    parser.add_argument("--plans", action="store_true", help="print every query plan")
+    parser.add_argument("--strict", action="store_true", help="exit 1 if any unexpected full scan")
+    args = parser.parse_args()
+
+    with Session(engine) as db:
+        report = advise(db, timings=args.time, verbose=args.plans)
+
+    print()
+    flagged = 0
+    for name, unexpected, ms in report:
+        status = "FULL SCAN " + ", ".join(unexpected) if unexpected else "ok"
+        flagged += bool(unexpected)
+        timing = f"{ms:>9.1f} ms" if ms is not None else ""
+        print(f"{name:<36} {timing} {status}")
+    print(f"\n{flagged} of {len(report)} queries scan a table they should reach through an index")
+    if args.strict and flagged:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
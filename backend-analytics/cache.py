@@ -0,0 +1,257 @@
+"""
+Response cache for the analytics endpoints.
+
+Serialized JSON bodies are cached per request path + query string with a
+per-endpoint TTL. Two backends are available:
+
+* `LRUCache`   – in-process, bounded by entry count (default)
+* `RedisCache` – any Redis-compatible server, selected by setting
+                 ANALYTICS_CACHE_URL=redis://host:6379/0 (needs `redis`)
+
+Concurrent misses for the same key are coalesced: one caller computes, the
+rest wait for its result. Every cached body carries an ETag, so clients that
+send `If-None-Match` get a 304 without the body being re-sent.
+
+backend-core calls POST /analytics/cache/invalidate after trip, expense and
+maintenance writes; that drops every entry and marks the rollups stale. It
+also bumps the backend's generation, and a result computed under an older
+generation is not stored, so a computation that started before the
+invalidation cannot put stale data back. With Redis the generation is a
+shared key checked atomically on every write, so this holds across workers.
+
+All of this is asyncio-based and meant to be awaited from `async def` routes.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Request, Response
+from starlette.concurrency import run_in_threadpool
+
+from metrics import serialization_timer
+from responses import dumps
+
+KEY_PREFIX = "fleetflow:analytics:"
+GENERATION_KEY = "fleetflow:analytics-generation"  # outside KEY_PREFIX, so `clear` keeps it
+
+# Seconds each endpoint's response may be served from cache.
+# Override per endpoint with CACHE_TTL_<NAME>, e.g. CACHE_TTL_ALL_ROI=120.
+DEFAULT_TTLS = {
+    "summary":         15,
+    "all-roi":         30,
+    "fuel-efficiency": 30,
+    "dead-stock":      60,
+    "vehicle-roi":     30,
+    "timeseries":      30,
+    "snapshot":        15,
+    "efficiency-anomalies": 30,
+}
+
+
+def ttl_for(name: str) -> float:
+    env_key = "CACHE_TTL_" + name.upper().replace("-", "_")
+    return float(os.getenv(env_key, DEFAULT_TTLS.get(name, 30)))
+
+
+class LRUCache:
+    """Thread-safe in-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def generation(self) -> int:
+        return self._generation
+
+    def set(self, key: str, value: tuple, ttl: float, generation: int):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+class RedisCache:
+    """Redis-compatible backend; values are stored as `etag\\nbody`."""
+
+    blocking = True  # network I/O: called from the threadpool, not the event loop
+
+    # SET the entry only if the generation is still the one it was computed under.
+    SET_IF_CURRENT = """
+        if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] then return 0 end
+        redis.call('SET', KEYS[2], ARGV[2], 'PX', ARGV[3])
+        return 1
+    """
+
+    def __init__(self, url: str):
+        import redis  # optional dependency, only needed for this backend
+        self._client = redis.Redis.from_url(url)
+        self._set_if_current = self._client.register_script(self.SET_IF_CURRENT)
+
+    def get(self, key: str):
+        raw = self._client.get(KEY_PREFIX + key)
+        if raw is None:
+            return None
+        etag, _, body = raw.partition(b"\n")
+        return etag.decode(), body
+
+    def generation(self) -> bytes:
+        return self._client.get(GENERATION_KEY) or b"0"
+
+    def set(self, key: str, value: tuple, ttl: float, generation: bytes):
+        etag, body = value
+        self._set_if_current(keys=[GENERATION_KEY, KEY_PREFIX + key],
+                             args=[generation, etag.encode() + b"\n" + body, int(ttl * 1000)])
+
+    def clear(self):
+        self._client.incr(GENERATION_KEY)  # first, so fills already running are dropped
+        keys = list(self._client.scan_iter(match=KEY_PREFIX + "*", count=500))
+        if keys:
+            self._client.unlink(*keys)
+
+
+class NullCache:
+    """Caches nothing; selected with ANALYTICS_CACHE_URL=none (benchmarks, debugging)."""
+
+    def get(self, key: str):
+        return None
+
+    def generation(self) -> int:
+        return 0
+
+    def set(self, key: str, value: tuple, ttl: float, generation: int):
+        pass
+
+    def clear(self):
+        pass
+
+
+class JSONBody(bytes):
+    """A payload `compute` has already serialized; cached and sent as-is."""
+
+
+class ResponseCache:
+    """Backend-agnostic get-or-compute with single-flight coalescing."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._inflight = {}
+
+    async def _call(self, method, *args):
+        if getattr(self.backend, "blocking", False):
+            return await run_in_threadpool(method, *args)
+        return method(*args)
+
+    async def get_or_compute(self, key: str, ttl: float, compute) -> tuple:
+        """
+        Return `(etag, body)` for `key`. On a miss the coroutine function
+        `compute` runs once; concurrent callers for the same key await that
+        run instead of starting their own.
+        """
+        hit = await self._call(self.backend.get, key)
+        if hit is not None:
+            return hit
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            generation = await self._call(self.backend.generation)
+            value = self._serialize(await compute())
+            # The backend skips the write if an invalidation landed meanwhile.
+            await self._call(self.backend.set, key, value, ttl, generation)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()  # waiters re-raise it; silence "never retrieved"
+            raise
+        finally:
+            del self._inflight[key]
+
+    def invalidate(self):
+        self.backend.clear()
+
+    @staticmethod
+    def _serialize(payload) -> tuple:
+        with serialization_timer():
+            if isinstance(payload, JSONBody):
+                body = payload
+            else:
+                body = dumps(payload)
+        return '"' + hashlib.sha1(body).hexdigest() + '"', body
+
+
+def _build_cache() -> ResponseCache:
+    url = os.getenv("ANALYTICS_CACHE_URL")
+    if url == "none":
+        return ResponseCache(NullCache())
+    if url:
+        return ResponseCache(RedisCache(url))
+    return ResponseCache(LRUCache(int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", "512"))))
+
+
+response_cache = _build_cache()
+
+
+async def prime(path: str, name: str, compute):
+    """Fill the entry `cached_json` serves for a GET of `path` without a query string."""
+    await response_cache.get_or_compute(path, ttl_for(name), compute)
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """
+    Whether an `If-None-Match` header value names `etag`: `*`, or one of its
+    comma-separated entity tags under weak comparison (a `W/` prefix on
+    either side is ignored, as the compressed variants carry one).
+    """
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    opaque = etag.removeprefix("W/")
+    return "*" in tags or any(tag.removeprefix("W/") == opaque for tag in tags)
+
+
+async def cached_json(request: Request, name: str, compute) -> Response:
+    """
+    Serve the result of the coroutine function `compute` as JSON through the
+    response cache, honouring `If-None-Match`. `name` selects the TTL (see
+    DEFAULT_TTLS).
+    """
+    key = request.url.path
+    if request.url.query:
+        key += "?" + "&".join(sorted(request.url.query.split("&")))
+
+    etag, body = await response_cache.get_or_compute(key, ttl_for(name), compute)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(etag, request.headers.get("if-none-match", "")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,135 @@
+"""
+Columnar (NumPy) compute path for the per-vehicle list endpoints.
+
+The row path fetches one mapping per vehicle and builds one payload dict per
+row (`roi_row`, `fuel_row`) before the response cache encodes them. At fleet
+scale those per-row Python objects are most of the request.
+
+Here the same Core select is fetched as columns (`database.fetch_columns`).
+ROI, km/L and idle days are computed as array expressions, and the JSON body
+is written by orjson from the arrays' native values. The bodies are
+byte-for-byte those of the row path.
+
+NumPy is in requirements.txt. An install without it, or
+ANALYTICS_COLUMNAR=off, falls back to the row path.
+"""
+import datetime
+import itertools
+import os
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+from responses import dumps as dumps_json
+
+ENABLED = np is not None and os.getenv("ANALYTICS_COLUMNAR", "auto") != "off"
+
+
+def _floats(values):
+    return np.asarray(values, dtype=float)
+
+
+def _round(values) -> list:
+    """Python `round(x, 2)` of every element; np.round scales by 100 and can land a cent off."""
+    rounded = np.round(values, 2)
+    # np.round is exact unless x*100 sits within float error of .5, so only
+    # those elements need Python's correctly rounded result.
+    scaled = np.abs(values * 100)
+    near_half = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-9 + scaled * 1e-15)
+    result = rounded.tolist()
+    for i in near_half.tolist():
+        result[i] = round(float(values[i]), 2)
+    return result
+
+
+def _with_default(values: list, present, default) -> list:
+    """`values` with `default` (kept as the exact Python object) where `present` is False."""
+    if present.all():
+        return values
+    out = np.asarray(values, dtype=object)
+    out[~present] = default
+    return out.tolist()
+
+
+def roi_columns(c: dict) -> dict:
+    """`roi_row()` for every row of `vehicle_totals_query()` columns `c`, as payload columns."""
+    revenue = _floats(c["totalRevenue"])
+    maint   = _floats(c["totalMaintenanceCost"])
+    fuel    = _floats(c["totalFuelCost"])
+    costs   = maint + fuel
+    net     = revenue - costs
+    acquisition = _floats([a or 0 for a in c["acquisitionCost"]])
+    has_cost = acquisition != 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        roi = np.where(has_cost, net / np.where(has_cost, acquisition, 1) * 100, 0)
+    return {
+        "vehicleId": c["vehicleId"], "nameModel": c["nameModel"],
+        "licensePlate": c["licensePlate"], "acquisitionCost": c["acquisitionCost"],
+        "totalRevenue": _round(revenue),
+        "totalMaintenanceCost": _round(maint),
+        "totalFuelCost": _round(fuel),
+        "totalCosts": _round(costs),
+        "netProfit": _round(net),
+        "roiPercent": _with_default(_round(roi), has_cost, 0),
+    }
+
+
+def fuel_columns(c: dict) -> dict:
+    """`fuel_row()` for every row of `vehicle_totals_query()` columns `c`, as payload columns."""
+    lifetime = _floats(c["lifetimeFuelLiters"])
+    burned   = lifetime > 0
+    odometer = _floats([o or 0 for o in c["odometer"]])
+    distance = _floats(c["measuredDistanceKm"])
+    measured_fuel = _floats(c["measuredFuelLiters"])
+    measured = measured_fuel > 0
+    recent_fuel = _floats(c["recentFuelLiters"])
+    recent_burned = recent_fuel > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        estimate = np.where(burned, odometer / np.where(burned, lifetime, 1), 0)
+        efficiency = np.where(measured, distance / np.where(measured, measured_fuel, 1), estimate)
+        recent = _floats(c["recentDistanceKm"]) / np.where(recent_burned, recent_fuel, 1)
+    return {
+        "vehicleId":    c["vehicleId"],
+        "nameModel":    c["nameModel"],
+        "licensePlate": c["licensePlate"],
+        "status":       c["status"],
+        "odometer":     c["odometer"],
+        "totalFuelLiters": _round(_floats(c["totalFuelLiters"])),
+        "totalFuelCost":   _round(_floats(c["totalFuelCost"])),
+        "kmPerLiter":      _with_default(_round(efficiency), measured | burned, None),
+        "distanceKm":      _round(distance),
+        "recentKmPerLiter": _with_default(_round(recent), recent_burned, None),
+        "completedTrips":  c["completedTrips"],
+    }
+
+
+def dead_stock_columns(c: dict, now: datetime.datetime) -> dict:
+    """The dead-stock payload for `dead_stock_query()` columns `c`, as payload columns."""
+    last = np.array([t or now for t in c["lastTripEnd"]], dtype="datetime64[us]")
+    used = np.array([t is not None for t in c["lastTripEnd"]], dtype=bool)
+    idle = (np.datetime64(now, "us") - last) // np.timedelta64(1, "D")
+    return {
+        "vehicleId":    c["vehicleId"],
+        "nameModel":    c["nameModel"],
+        "licensePlate": c["licensePlate"],
+        "daysIdle":     np.where(used, idle, 999).tolist(),  # 999 = never used
+        "lastTripEnd":  [t.isoformat() if t is not None else None for t in c["lastTripEnd"]],
+    }
+
+
+DUMP_CHUNK_ROWS = 5000
+
+
+def dumps(columns: dict) -> bytes:
+    """
+    JSON array of objects from payload columns, encoded like
+    `responses.dumps`. Row objects only exist DUMP_CHUNK_ROWS at a time.
+    """
+    keys = list(columns)
+    rows = zip(*columns.values())
+    parts = []
+    while chunk := [dict(zip(keys, values)) for values in itertools.islice(rows, DUMP_CHUNK_ROWS)]:
+        parts.append(dumps_json(chunk)[1:-1])
+    return b"[" + b",".join(parts) + b"]"
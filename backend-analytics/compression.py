@@ -0,0 +1,132 @@
+"""
+Response compression for the analytics API.
+
+JSON and text responses of at least ANALYTICS_COMPRESS_MIN_BYTES are sent
+with Content-Encoding br when the client accepts it, otherwise gzip (also
+the fallback on an install without the `brotli` package). Smaller bodies, other
+media types (the PDF reports), Server-Sent Events and responses that
+already carry a Content-Encoding pass through untouched. Streamed bodies (the CSV exports)
+are compressed as they stream.
+
+Compressed responses get a weak ETag: the cache's strong one identifies the
+uncompressed bytes, and `If-None-Match` with the weak form still matches it.
+"""
+import os
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+MIN_BYTES = int(os.getenv("ANALYTICS_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("ANALYTICS_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("ANALYTICS_BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+UNBUFFERED_TYPES = ("text/event-stream",)  # each event must reach the client as it is sent
+
+
+def _accepted(accept_encoding: str) -> set:
+    """Codings in an Accept-Encoding header, minus those refused with q=0."""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        name, _, q = params.strip().partition("=")
+        try:
+            if name.strip() == "q" and float(q) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def negotiate(accept_encoding: str):
+    """The encoding to use for a request's Accept-Encoding, or None."""
+    accepted = _accepted(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class _Encoder:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self.compress, self.finish = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self.compress, self.finish = compressor.compress, compressor.flush
+
+
+class CompressionMiddleware:
+    """Pure ASGI, so streamed responses stay streamed."""
+
+    def __init__(self, app, minimum_size: int = MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        encoder = None  # set once the first body chunk decides; False = pass through
+
+        async def send_compressed(message):
+            nonlocal start, encoder
+            if message["type"] == "http.response.start":
+                start = message  # held until the first chunk shows the body size
+                return
+            if message["type"] != "http.response.body" or encoder is False:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if encoder is None:
+                headers = MutableHeaders(raw=start["headers"])
+                content_type = headers.get("content-type", "")
+                if (
+                    "content-encoding" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or content_type.startswith(UNBUFFERED_TYPES)
+                    or (not more and len(body) < self.minimum_size)
+                ):
+                    encoder = False
+                    await send(start)
+                    await send(message)
+                    return
+                encoder = _Encoder(encoding)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "content-length" in headers:
+                    del headers["content-length"]
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = "W/" + etag
+                if not more:
+                    compressed = encoder.compress(body) + encoder.finish()
+                    headers["Content-Length"] = str(len(compressed))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send(start)
+
+            # Streamed chunks are not flushed: the compressor emits output
+            # as its window fills, and everything left on the last chunk.
+            chunk = encoder.compress(body) + (b"" if more else encoder.finish())
+            if chunk or not more:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more})
+
+        await self.app(scope, receive, send_compressed)
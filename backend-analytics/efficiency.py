@@ -0,0 +1,260 @@
+"""
+Per-trip fuel efficiency and efficiency anomalies.
+
+A trip is *measured* when it is COMPLETED with a recorded distance
+(`trips.distanceKm`, end minus start odometer) and fuel logged against it
+(expenses with its `tripId`). Its km/L is distance / fuel. Each measured trip
+is compared with the vehicle's rolling efficiency over the WINDOW_TRIPS
+measured trips before it (total distance / total fuel, so long trips weigh
+more). A trip at least ANOMALY_PERCENT off that baseline, with at least
+MIN_BASELINE_TRIPS trips behind it, is an anomaly.
+
+Results live in two analytics-owned tables kept current by rollups.py:
+
+    trip_efficiency      one row per measured trip: km/L, the rolling window
+                         ending at it, its baseline and deviation
+    vehicle_efficiency   per-vehicle measured totals, the rolling window of
+                         the latest trip and the anomaly count
+
+Rescoring a changed trip reads the WINDOW_TRIPS - 1 rows before it and
+rewrites it plus the WINDOW_TRIPS trips after it (their windows and
+baselines include it); the vehicle row is adjusted by the difference. The
+work per change is constant however long the vehicle's history is. Only
+`rebuild` walks every trip.
+"""
+import datetime
+import math
+import os
+from collections import deque
+from itertools import groupby
+
+from sqlalchemy import and_, delete, func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from aggregates import day_range
+from models import Expense, Trip, TripEfficiency, TripStatus, VehicleEfficiency
+
+WINDOW_TRIPS = int(os.getenv("EFFICIENCY_WINDOW_TRIPS", "10"))
+MIN_BASELINE_TRIPS = int(os.getenv("EFFICIENCY_MIN_BASELINE_TRIPS", "3"))
+ANOMALY_PERCENT = float(os.getenv("EFFICIENCY_ANOMALY_PERCENT", "25"))
+
+ID_CHUNK = 1000
+
+
+def _trip_fuel():
+    """Fuel logged against the outer `Trip` row (the expenses with its tripId)."""
+    return select(func.sum(Expense.fuelLiters)).where(Expense.tripId == Trip.id).scalar_subquery()
+
+
+def measured_trips_query(*criteria):
+    """Measured trips matching `criteria`, oldest first per vehicle: (tripId, vehicleId, endDate, distanceKm, fuelLiters)."""
+    trips = (
+        select(
+            Trip.id.label("tripId"), Trip.vehicleId, Trip.endDate, Trip.distanceKm,
+            _trip_fuel().label("fuelLiters"),
+        )
+        .where(Trip.status == TripStatus.COMPLETED, Trip.endDate.is_not(None), Trip.distanceKm > 0, *criteria)
+        .subquery("measured_trips")
+    )
+    return (
+        select(trips)
+        .where(trips.c.fuelLiters > 0)
+        .order_by(trips.c.vehicleId, trips.c.endDate, trips.c.tripId)
+    )
+
+
+def _after(end_date, trip_id, end_column, id_column, inclusive=False):
+    """(endDate, id) position past (`end_date`, `trip_id`)."""
+    same = id_column >= trip_id if inclusive else id_column > trip_id
+    return or_(end_column > end_date, and_(end_column == end_date, same))
+
+
+def _score(trips, before: list) -> list:
+    """
+    `trip_efficiency` rows for `trips` (measured, in order), continuing from
+    `before`, the vehicle's rows just before them (oldest first).
+    """
+    seed = before[max(0, len(before) - WINDOW_TRIPS + 1):]
+    window = deque(((r["distanceKm"], r["fuelLiters"]) for r in seed), maxlen=WINDOW_TRIPS)
+    previous = before[-1] if before else None
+    rows = []
+    for t in trips:
+        distance, fuel = float(t["distanceKm"]), float(t["fuelLiters"])
+        km_per_liter = distance / fuel
+        window.append((distance, fuel))
+        baseline = deviation = None
+        if previous is not None and previous["windowFuelLiters"] > 0:
+            baseline = previous["windowDistanceKm"] / previous["windowFuelLiters"]
+            if previous["windowTrips"] >= MIN_BASELINE_TRIPS and baseline > 0:
+                deviation = (km_per_liter - baseline) * 100 / baseline
+        row = {
+            "tripId":             t["tripId"],
+            "vehicleId":          t["vehicleId"],
+            "endDate":            t["endDate"],
+            "distanceKm":         distance,
+            "fuelLiters":         fuel,
+            "kmPerLiter":         km_per_liter,
+            "windowTrips":        len(window),
+            "windowDistanceKm":   math.fsum(d for d, _ in window),
+            "windowFuelLiters":   math.fsum(f for _, f in window),
+            "baselineKmPerLiter": baseline,
+            "deviationPercent":   deviation,
+            "anomaly":            deviation is not None and abs(deviation) >= ANOMALY_PERCENT,
+        }
+        rows.append(row)
+        previous = row
+    return rows
+
+
+def _vehicle_row(vehicle_id: int, rows: list) -> dict:
+    """A `vehicle_efficiency` row from every `trip_efficiency` row of the vehicle (in order)."""
+    last = rows[-1] if rows else None
+    return {
+        "vehicleId":        vehicle_id,
+        "measuredTrips":    len(rows),
+        "distanceKm":       math.fsum(r["distanceKm"] for r in rows),
+        "fuelLiters":       math.fsum(r["fuelLiters"] for r in rows),
+        "recentTrips":      last["windowTrips"] if last else 0,
+        "recentDistanceKm": last["windowDistanceKm"] if last else 0,
+        "recentFuelLiters": last["windowFuelLiters"] if last else 0,
+        "anomalies":        sum(1 for r in rows if r["anomaly"]),
+    }
+
+
+def rebuild(db: Session):
+    """Score every measured trip from scratch (part of `rollups.rebuild`)."""
+    db.execute(delete(TripEfficiency))
+    db.execute(delete(VehicleEfficiency))
+    vehicle_ids = db.execute(select(Trip.vehicleId).where(Trip.distanceKm > 0).distinct()).scalars().all()
+    for i in range(0, len(vehicle_ids), ID_CHUNK):
+        chunk = vehicle_ids[i:i + ID_CHUNK]
+        trips = db.execute(measured_trips_query(Trip.vehicleId.in_(chunk))).mappings()
+        trip_rows, vehicle_rows = [], []
+        for vehicle_id, vehicle_trips in groupby(trips, key=lambda t: t["vehicleId"]):
+            rows = _score(vehicle_trips, [])
+            trip_rows += rows
+            vehicle_rows.append(_vehicle_row(vehicle_id, rows))
+        if trip_rows:
+            db.execute(insert(TripEfficiency), trip_rows)
+            db.execute(insert(VehicleEfficiency), vehicle_rows)
+
+
+def refresh_trips(db: Session, trip_ids) -> int:
+    """
+    Rescore `trip_ids` (trips completed, edited or whose fuel changed) and
+    the trips after them whose window they are in. Returns the number of
+    `trip_efficiency` rows written.
+    """
+    te = TripEfficiency
+    positions = {}  # vehicle id -> [(endDate, tripId)] to rescore from
+    ids = sorted(trip_ids)
+    for i in range(0, len(ids), ID_CHUNK):
+        chunk = ids[i:i + ID_CHUNK]
+        current = db.execute(
+            select(Trip.id, Trip.vehicleId, Trip.endDate).where(Trip.id.in_(chunk), Trip.endDate.is_not(None))
+        ).all()
+        vehicle_of = {trip_id: vehicle_id for trip_id, vehicle_id, _ in current}
+        for trip_id, vehicle_id, end_date in current:
+            positions.setdefault(vehicle_id, []).append((end_date, trip_id))
+        # A trip's old position matters too: the trips after it lose it
+        # from their windows. Rows of trips now on another vehicle (or no
+        # longer completed) go first, so the rescoring cannot collide with them.
+        for old in db.execute(select(te.__table__).where(te.tripId.in_(chunk))).mappings().all():
+            positions.setdefault(old["vehicleId"], []).append((old["endDate"], old["tripId"]))
+            if vehicle_of.get(old["tripId"]) != old["vehicleId"]:
+                db.execute(delete(te).where(te.tripId == old["tripId"]))
+                _adjust_vehicle(db, old["vehicleId"], removed=[dict(old)], added=[])
+    return sum(_rescore_vehicle(db, vehicle_id, keys) for vehicle_id, keys in sorted(positions.items()))
+
+
+def _rescore_vehicle(db: Session, vehicle_id: int, keys: list) -> int:
+    te = TripEfficiency
+    first, last = min(keys), max(keys)
+
+    before = db.execute(
+        select(te.__table__).where(te.vehicleId == vehicle_id, ~_after(*first, te.endDate, te.tripId, inclusive=True))
+        .order_by(te.endDate.desc(), te.tripId.desc()).limit(max(WINDOW_TRIPS - 1, 1))
+    ).mappings().all()[::-1]
+    trips = db.execute(measured_trips_query(
+        Trip.vehicleId == vehicle_id,
+        _after(*first, Trip.endDate, Trip.id, inclusive=True),
+        ~_after(*last, Trip.endDate, Trip.id),
+    )).mappings().all()
+    following = db.execute(
+        measured_trips_query(Trip.vehicleId == vehicle_id, _after(*last, Trip.endDate, Trip.id))
+        .limit(WINDOW_TRIPS)
+    ).mappings().all()
+    to_end = len(following) < WINDOW_TRIPS
+
+    # Replace everything from the first changed position up to the last
+    # trip rescored (or the end).
+    replaced = [te.vehicleId == vehicle_id, _after(*first, te.endDate, te.tripId, inclusive=True)]
+    if not to_end:
+        replaced.append(~_after(following[-1]["endDate"], following[-1]["tripId"], te.endDate, te.tripId))
+    old = db.execute(select(te.__table__).where(*replaced)).mappings().all()
+    rows = _score([*trips, *following], before)
+
+    if old:
+        db.execute(delete(te).where(te.tripId.in_([r["tripId"] for r in old])))
+    if rows:
+        db.execute(insert(te), rows)
+    latest = (rows or before or [None])[-1] if to_end else False
+    _adjust_vehicle(db, vehicle_id, removed=old, added=rows, latest=latest)
+    return len(rows)
+
+
+def _adjust_vehicle(db: Session, vehicle_id: int, removed: list, added: list, latest=False):
+    """
+    Move the vehicle's totals by the rows `added` minus those `removed`,
+    instead of re-summing its history. `latest` is its newest remaining row
+    (None if there is none) when that may have changed, False otherwise.
+    """
+    if not removed and not added and latest is False:
+        return
+    vehicle = db.get(VehicleEfficiency, vehicle_id)
+    if vehicle is None:
+        vehicle = VehicleEfficiency(vehicleId=vehicle_id, measuredTrips=0, distanceKm=0, fuelLiters=0,
+                                    recentTrips=0, recentDistanceKm=0, recentFuelLiters=0, anomalies=0)
+        db.add(vehicle)
+    vehicle.measuredTrips += len(added) - len(removed)
+    vehicle.anomalies += sum(1 for r in added if r["anomaly"]) - sum(1 for r in removed if r["anomaly"])
+    if vehicle.measuredTrips > 0:
+        vehicle.distanceKm += math.fsum(r["distanceKm"] for r in added) - math.fsum(r["distanceKm"] for r in removed)
+        vehicle.fuelLiters += math.fsum(r["fuelLiters"] for r in added) - math.fsum(r["fuelLiters"] for r in removed)
+    else:
+        vehicle.distanceKm = vehicle.fuelLiters = 0
+    if latest is not False:
+        vehicle.recentTrips = latest["windowTrips"] if latest else 0
+        vehicle.recentDistanceKm = latest["windowDistanceKm"] if latest else 0
+        vehicle.recentFuelLiters = latest["windowFuelLiters"] if latest else 0
+    db.flush()
+
+
+# ── Reads ─────────────────────────────────────────────────────────────────────
+
+def anomalies_query(vehicle_id: int = None, start: datetime.date = None, end: datetime.date = None):
+    """Anomalous trips, most recent first, optionally of one vehicle and within [start, end]."""
+    te = TripEfficiency
+    stmt = select(te.__table__).where(te.anomaly == True, *day_range(te.endDate, start, end))  # noqa: E712
+    if vehicle_id is not None:
+        stmt = stmt.where(te.vehicleId == vehicle_id)
+    return stmt.order_by(te.endDate.desc(), te.tripId.desc())
+
+
+def trip_efficiency_row(r) -> dict:
+    """Build the public per-trip efficiency payload from one `trip_efficiency` row."""
+    return {
+        "tripId":             r["tripId"],
+        "vehicleId":          r["vehicleId"],
+        "endDate":            r["endDate"],
+        "distanceKm":         round(r["distanceKm"], 2),
+        "fuelLiters":         round(r["fuelLiters"], 2),
+        "kmPerLiter":         round(r["kmPerLiter"], 2),
+        "baselineKmPerLiter": _round(r["baselineKmPerLiter"]),
+        "deviationPercent":   _round(r["deviationPercent"]),
+        "anomaly":            bool(r["anomaly"]),
+    }
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
@@ -0,0 +1,307 @@
+"""
+Live dashboard updates for GET /analytics/stream (Server-Sent Events).
+
+One `Broadcaster` per process does the work for every connected dashboard.
+While anyone is subscribed it keeps the lifetime `vehicle_totals_query()`
+row of every vehicle in memory. It wakes up when
+
+* backend-core's change notification arrives (POST /analytics/cache/invalidate
+  hands over the touched vehicle ids), or
+* the high-water marks it polls every LIVE_POLL_SECONDS moved: the latest
+  trip, vehicle and driver `updatedAt` and the newest expense, maintenance
+  and `rollup_dirty` ids. This catches new rows whose notification never
+  arrived, and edits and deletes whose notification went to another worker
+  process (which queued their vehicle ids in `rollup_dirty`).
+
+It then refreshes the rollups of the changed vehicles, re-reads only their
+rows, and publishes two events:
+
+* `roi`   `{"rows": [...], "removed": [...]}` – the `roi_row()` payloads
+          that changed and the ids of deleted vehicles
+* `kpis`  `{"summary": {...}, "topRoi": [...]}` – the summary payload and
+          the TOP_ROI best vehicles, re-derived from the in-memory rows plus
+          two small open-trip and driver statements, sent when they changed
+
+Each event is serialized once and the same bytes are queued for every
+subscriber. A new stream starts with the current `kpis`. A reconnecting
+EventSource sends Last-Event-ID and gets the events it missed from the
+last REPLAY_EVENTS, or `reset` when they are gone, after which the client
+should reload its full data. Subscribers that fall LIVE_QUEUE_EVENTS events
+behind are sent `reset` and disconnected. Deletes leave no high-water mark,
+so every LIVE_RESYNC_SECONDS the whole fleet is re-read and diffed.
+"""
+import asyncio
+import datetime
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import func, select, union
+from starlette.concurrency import run_in_threadpool
+
+from aggregates import vehicle_totals_query, roi_row, open_trip_counts_query, driver_scalars_query
+from database import SessionLocal
+from metrics import register_collector
+from models import Vehicle, Driver, Trip, Expense, MaintenanceLog, RollupDirty
+from responses import dumps
+from snapshot import summary_from_vehicles, top_roi
+import rollups
+
+logger = logging.getLogger("fleetflow.analytics")
+
+POLL_SECONDS = float(os.getenv("LIVE_POLL_SECONDS", "2"))
+HEARTBEAT_SECONDS = float(os.getenv("LIVE_HEARTBEAT_SECONDS", "15"))
+RESYNC_SECONDS = float(os.getenv("LIVE_RESYNC_SECONDS", "300"))
+QUEUE_EVENTS = int(os.getenv("LIVE_QUEUE_EVENTS", "64"))
+REPLAY_EVENTS = 256
+TOP_ROI = 5
+RETRY_MS = 5000  # EventSource reconnect delay
+
+ID_CHUNK = 1000
+
+
+def marks_query():
+    return select(
+        select(func.max(Trip.updatedAt)).scalar_subquery().label("tripUpdatedAt"),
+        select(func.max(Vehicle.updatedAt)).scalar_subquery().label("vehicleUpdatedAt"),
+        select(func.max(Driver.updatedAt)).scalar_subquery().label("driverUpdatedAt"),
+        select(func.max(Expense.id)).scalar_subquery().label("expenseId"),
+        select(func.max(MaintenanceLog.id)).scalar_subquery().label("maintenanceLogId"),
+        select(func.max(RollupDirty.id)).scalar_subquery().label("dirtyId"),
+    )
+
+
+def changed_vehicles_query(marks: dict):
+    """Ids of vehicles with trips, expenses, maintenance, own or reported changes since `marks`."""
+    def since(stmt, column, mark, inclusive=True):
+        # updatedAt uses >= so rows written in the mark's millisecond are seen again
+        if mark is None:
+            return stmt
+        return stmt.where(column >= mark if inclusive else column > mark)
+
+    return union(
+        since(select(Trip.vehicleId), Trip.updatedAt, marks["tripUpdatedAt"]),
+        since(select(Vehicle.id), Vehicle.updatedAt, marks["vehicleUpdatedAt"]),
+        since(select(Expense.vehicleId), Expense.id, marks["expenseId"], inclusive=False),
+        since(select(MaintenanceLog.vehicleId), MaintenanceLog.id, marks["maintenanceLogId"], inclusive=False),
+        since(select(RollupDirty.vehicleId).where(RollupDirty.vehicleId.is_not(None)),
+              RollupDirty.id, marks["dirtyId"], inclusive=False),
+    )
+
+
+def _frame(event_id: int, event: str, data) -> bytes:
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (event_id, event.encode(), dumps(data))
+
+
+class _Subscriber:
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=QUEUE_EVENTS)
+        self.dropped = False
+
+
+class Broadcaster:
+    """Shared change processing and fan-out for every stream of this process."""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._pending = set()  # vehicle ids from notifications, guarded by _pending_lock
+        self._pending_lock = threading.Lock()
+        self._loop = None
+        self._task = None
+        self._wake = None
+        self._ready = None
+        self._vehicles = {}  # vehicle id -> vehicle_totals_query() row (dict)
+        self._marks = None
+        self._kpis = None
+        self._seq = 0
+        self._epoch = 0  # last event id issued before the current run started
+        self._history = deque(maxlen=REPLAY_EVENTS)  # (id, frame)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    # ── Change input ─────────────────────────────────────────────────────────
+    def notify(self, vehicle_ids=()):
+        """Thread-safe: queue `vehicle_ids` for the next update and wake the broadcaster."""
+        loop = self._loop
+        if loop is None:
+            return  # nobody is subscribed; the next subscriber starts from a full read
+        with self._pending_lock:
+            self._pending.update(vehicle_ids)
+        try:
+            loop.call_soon_threadsafe(self._wake.set)
+        except RuntimeError:
+            pass  # the loop closed; the next poll or full read covers these ids
+
+    # ── Processing (one task per process, alive while anyone subscribes) ───
+    def _start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._ready = asyncio.Event()
+        # Changes made while nobody was subscribed were not tracked, so only
+        # clients that saw an event from this run can catch up by replay.
+        self._epoch = self._seq
+        self._history.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        try:
+            next_resync = 0.0
+            while self._subscribers:
+                full = time.monotonic() >= next_resync
+                if full:
+                    next_resync = time.monotonic() + RESYNC_SECONDS
+                try:
+                    for event, data in await run_in_threadpool(self._update, full):
+                        self._publish(event, data)
+                except Exception:
+                    logger.exception("live update failed")
+                self._ready.set()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+        finally:
+            self._loop = self._task = None
+            self._vehicles, self._marks, self._kpis = {}, None, None
+
+    def _update(self, full: bool) -> list:
+        """Runs in the threadpool: bring the in-memory rows up to date; returns events to publish."""
+        with self._pending_lock:
+            vehicle_ids, self._pending = self._pending, set()
+        with SessionLocal() as db:
+            marks = dict(db.execute(marks_query()).mappings().one())
+            if not full and self._marks is not None and marks != self._marks:
+                vehicle_ids |= set(db.execute(changed_vehicles_query(self._marks)).scalars())
+        moved = marks != self._marks
+        self._marks = marks
+        if not full and not vehicle_ids and not moved:
+            return []
+
+        rollups.refresh_now(vehicle_ids)
+        with SessionLocal() as db:
+            if full:
+                rows = {r["vehicleId"]: dict(r) for r in db.execute(vehicle_totals_query()).mappings()}
+                vehicle_ids = set(rows) | set(self._vehicles)
+            else:
+                rows = {}
+                ids = sorted(vehicle_ids)
+                for i in range(0, len(ids), ID_CHUNK):
+                    stmt = vehicle_totals_query().where(Vehicle.id.in_(ids[i:i + ID_CHUNK]))
+                    rows.update((r["vehicleId"], dict(r)) for r in db.execute(stmt).mappings())
+            trip_rows = db.execute(open_trip_counts_query()).mappings().all()
+            drivers = db.execute(driver_scalars_query()).mappings().one()
+
+        initial = not self._vehicles
+        changed, removed = [], []
+        for vehicle_id in sorted(vehicle_ids):
+            old, new = self._vehicles.get(vehicle_id), rows.get(vehicle_id)
+            if new is None:
+                if old is not None:
+                    del self._vehicles[vehicle_id]
+                    removed.append(vehicle_id)
+                continue
+            self._vehicles[vehicle_id] = new
+            row = roi_row(new)
+            if old is None or roi_row(old) != row:
+                changed.append(row)
+
+        events = []
+        if not initial and (changed or removed):
+            events.append(("roi", {"rows": changed, "removed": removed}))
+        vehicles = list(self._vehicles.values())
+        kpis = {
+            "summary": summary_from_vehicles(vehicles, trip_rows, drivers, datetime.datetime.now()),
+            "topRoi": top_roi(vehicles, TOP_ROI),
+        }
+        if kpis != self._kpis:
+            self._kpis = kpis
+            events.append(("kpis", kpis))
+        return events
+
+    # ── Fan-out ──────────────────────────────────────────────────────────────
+    def _publish(self, event: str, data):
+        self._seq += 1
+        frame = _frame(self._seq, event, data)
+        self._history.append((self._seq, frame))
+        for sub in list(self._subscribers):
+            try:
+                sub.queue.put_nowait((self._seq, frame))
+            except asyncio.QueueFull:
+                sub.dropped = True
+                self._subscribers.discard(sub)
+
+    def _backlog(self, last_event_id):
+        """Frames a client that saw `last_event_id` needs first, and the id they bring it to."""
+        tracked = last_event_id is not None and self._epoch < last_event_id <= self._seq
+        if tracked and (not self._history or self._history[0][0] <= last_event_id + 1):
+            return [frame for i, frame in self._history if i > last_event_id], self._seq
+        frames = [] if last_event_id is None else [_frame(self._seq, "reset", {})]
+        if self._kpis is not None:
+            frames.append(_frame(self._seq, "kpis", self._kpis))
+        return frames, self._seq
+
+    async def stream(self, last_event_id: int = None):
+        """The SSE byte stream of one subscriber."""
+        sub = _Subscriber()
+        self._subscribers.add(sub)
+        if self._task is None:
+            self._start()
+        try:
+            await self._ready.wait()
+            frames, seen = self._backlog(last_event_id)
+            yield b"retry: %d\n\n" % RETRY_MS + b"".join(frames)
+            while True:
+                try:
+                    event_id, frame = await asyncio.wait_for(sub.queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if sub.dropped:
+                        yield _frame(self._seq, "reset", {})
+                        return
+                    yield b": keepalive\n\n"
+                    continue
+                if event_id is None:
+                    return  # shutting down
+                if event_id > seen:
+                    yield frame
+                if sub.dropped and sub.queue.empty():
+                    yield _frame(self._seq, "reset", {})
+                    return
+        finally:
+            self._subscribers.discard(sub)
+            if not self._subscribers and self._wake is not None:
+                self._wake.set()  # let _run notice and stop
+
+    async def close(self):
+        """End every stream and stop processing (app shutdown)."""
+        for sub in list(self._subscribers):
+            try:
+                sub.queue.put_nowait((None, b""))
+            except asyncio.QueueFull:
+                sub.dropped = True
+        self._subscribers.clear()
+        task = self._task
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+broadcaster = Broadcaster()
+
+
+def live_metrics() -> list:
+    return [
+        "# HELP fleetflow_analytics_live_subscribers Open /analytics/stream connections.",
+        "# TYPE fleetflow_analytics_live_subscribers gauge",
+        f"fleetflow_analytics_live_subscribers {broadcaster.subscribers}",
+    ]
+
+
+register_collector(live_metrics)
@@ -1,16 +1,60 @@
+import logging
 import os
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 
-from routers import analytics
+from routers import analytics, reports
+import database
+import live
+import rollups
+import report_jobs
+from compression import CompressionMiddleware
+from metrics import MetricsMiddleware, render_prometheus
+from responses import FastJSONResponse
 
 load_dotenv()
 
+logger = logging.getLogger("fleetflow.analytics")
+
+WARMUP = os.getenv("ANALYTICS_WARMUP", "1") != "0"
+
+
+async def warm_up():
+    """Open pooled connections, refresh the rollups and cache the summary before serving."""
+    await run_in_threadpool(database.warm_up)
+    if database.ASYNC_MODE:
+        await database.warm_up_async()
+    await run_in_threadpool(rollups.ensure_fresh)
+    await analytics.prime_caches()
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    started = time.perf_counter()
+    await run_in_threadpool(rollups.create_tables)
+    if WARMUP:
+        try:
+            await warm_up()
+        except Exception:
+            # The first requests pay for it instead; startup must not fail here.
+            logger.exception("warm-up failed")
+    logger.info("startup took %.0f ms", (time.perf_counter() - started) * 1000)
+    yield
+    await live.broadcaster.close()
+    report_jobs.shutdown()
+
+
 app = FastAPI(
     title="FleetFlow Analytics API",
     description="ROI calculations, fuel efficiency, and fleet reporting",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 # ── CORS ──────────────────────────────────────────────────────────────────────
@@ -20,10 +64,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# ── Compression (gzip, or br with `brotli` installed) ─────────────────────────
+app.add_middleware(CompressionMiddleware)
+
+# Outermost, so its timings include CORS handling and compression.
+app.add_middleware(MetricsMiddleware)
+
 # ── Routers ───────────────────────────────────────────────────────────────────
 app.include_router(analytics.router)
+app.include_router(reports.router)
 
 
 # ── Health Check ──────────────────────────────────────────────────────────────
@@ -32,6 +84,13 @@ def health():
     return {"status": "ok", "service": "FleetFlow Analytics API", "port": 8000}
 
 
+# ── Metrics ───────────────────────────────────────────────────────────────────
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus text exposition of this process's request metrics."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 # ── Run ───────────────────────────────────────────────────────────────────────
 if __name__ == "__main__":
     import uvicorn
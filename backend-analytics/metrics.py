@@ -0,0 +1,245 @@
+"""
+Per-request instrumentation for the analytics API.
+
+`MetricsMiddleware` opens a `RequestStats` for every HTTP request and keeps
+it in a context variable. The cursor-execute hooks in database.py report
+each SQL statement into it, and `serialization_timer` wraps JSON encoding.
+From that the middleware:
+
+* adds a `Server-Timing` header (db time and statement count, serialization,
+  total). Streaming responses send headers before their body is read, so
+  for the CSV exports the header only covers the work done up to that point.
+* feeds per-route Prometheus histograms, rendered by `render_prometheus()`
+  for GET /metrics (per process; scrape every worker), followed by what
+  other modules add through `register_collector` (database.py's pools).
+* logs requests slower than ANALYTICS_SLOW_REQUEST_MS with their slowest
+  statements, fingerprinted so similar queries group together.
+"""
+import contextvars
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger("fleetflow.analytics.slow")
+
+SLOW_REQUEST_MS = float(os.getenv("ANALYTICS_SLOW_REQUEST_MS", "500"))  # 0 disables the log
+SLOWEST_KEPT    = 3
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS   = (1, 2, 5, 10, 25, 50, 100, 250)
+
+_current = contextvars.ContextVar("fleetflow_request_stats", default=None)
+
+
+# ── Query fingerprints ───────────────────────────────────────────────────────
+_LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),                              # string literals
+    (re.compile(r"%\(\w+\)s|%s|(?<!:):\w+|\$\d+"), "?"),               # bound parameters
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),                           # numbers
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(?+)"),               # IN lists of any length
+    (re.compile(r"\s+"), " "),
+]
+
+
+def fingerprint(statement: str) -> str:
+    """`statement` with literals and parameters replaced, so similar queries compare equal."""
+    for pattern, repl in _LITERALS:
+        statement = pattern.sub(repl, statement)
+    return statement.strip()
+
+
+def fingerprint_id(fp: str) -> str:
+    return hashlib.sha1(fp.encode()).hexdigest()[:12]
+
+
+# ── Per-request stats ────────────────────────────────────────────────────────
+class RequestStats:
+    """What one request cost; shared by every task and thread serving it."""
+
+    def __init__(self):
+        self.started     = time.perf_counter()
+        self.statements  = 0
+        self.db_seconds  = 0.0
+        self.serialize_seconds = 0.0
+        self.slowest     = []  # (seconds, statement), longest first
+        self._lock = threading.Lock()
+
+    def add_statement(self, statement: str, seconds: float):
+        with self._lock:
+            self.statements += 1
+            self.db_seconds += seconds
+            if len(self.slowest) < SLOWEST_KEPT or seconds > self.slowest[-1][0]:
+                self.slowest.append((seconds, statement))
+                self.slowest.sort(key=lambda s: s[0], reverse=True)
+                del self.slowest[SLOWEST_KEPT:]
+
+    def server_timing(self) -> str:
+        total = time.perf_counter() - self.started
+        return (
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.statements} queries", '
+            f"serialize;dur={self.serialize_seconds * 1000:.1f}, "
+            f"total;dur={total * 1000:.1f}"
+        )
+
+
+def record_statement(statement: str, seconds: float):
+    """Called by the engine hooks for every executed statement."""
+    stats = _current.get()
+    if stats is not None:
+        stats.add_statement(statement, seconds)
+
+
+@contextmanager
+def serialization_timer():
+    """Attribute the enclosed block to the current request's serialization time."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _current.get()
+        if stats is not None:
+            stats.serialize_seconds += time.perf_counter() - started
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse whose rendering counts as serialization time."""
+
+    def render(self, content) -> bytes:
+        with serialization_timer():
+            return super().render(content)
+
+
+# ── Prometheus registry ──────────────────────────────────────────────────────
+class _Histogram:
+    def __init__(self, name: str, help_text: str, buckets):
+        self.name, self.help, self.buckets = name, help_text, buckets
+        self.series = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, labels: tuple, value: float):
+        series = self.series.setdefault(labels, [0] * len(self.buckets) + [0.0, 0])
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self, label_names) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.series.items()):
+            base = ",".join(f'{k}="{v}"' for k, v in zip(label_names, labels))
+            for bound, n in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {n}')
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-2]}")
+            lines.append(f"{self.name}_count{{{base}}} {series[-1]}")
+        return lines
+
+
+class _Registry:
+    LABELS = ("method", "route")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = _Histogram(
+            "fleetflow_analytics_request_duration_seconds", "Request latency by route.", LATENCY_BUCKETS)
+        self.db_time = _Histogram(
+            "fleetflow_analytics_request_db_seconds", "SQL time spent per request by route.", LATENCY_BUCKETS)
+        self.statements = _Histogram(
+            "fleetflow_analytics_request_db_statements", "SQL statements issued per request by route.",
+            COUNT_BUCKETS)
+        self.serialize = _Histogram(
+            "fleetflow_analytics_request_serialize_seconds", "JSON serialization time per request by route.",
+            LATENCY_BUCKETS)
+        self.responses = {}  # (method, route, status) -> count
+
+    def observe(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        labels = (method, route)
+        with self._lock:
+            self.latency.observe(labels, seconds)
+            self.db_time.observe(labels, stats.db_seconds)
+            self.statements.observe(labels, stats.statements)
+            self.serialize.observe(labels, stats.serialize_seconds)
+            key = (method, route, status)
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def render(self) -> str:
+        with self._lock:
+            lines = []
+            for histogram in (self.latency, self.db_time, self.statements, self.serialize):
+                lines += histogram.render(self.LABELS)
+            lines += ["# HELP fleetflow_analytics_responses_total Responses by route and status.",
+                      "# TYPE fleetflow_analytics_responses_total counter"]
+            for (method, route, status), n in sorted(self.responses.items()):
+                lines.append(
+                    f'fleetflow_analytics_responses_total{{method="{method}",route="{route}",status="{status}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+
+registry = _Registry()
+
+
+_collectors = []
+
+
+def register_collector(collect):
+    """Add `collect()`, returning exposition lines, to `render_prometheus()`."""
+    _collectors.append(collect)
+
+
+def render_prometheus() -> str:
+    return registry.render() + "".join(line + "\n" for collect in _collectors for line in collect())
+
+
+# ── Middleware ────────────────────────────────────────────────────────────────
+class MetricsMiddleware:
+    """Pure ASGI middleware: never buffers the body, so streaming exports stay streamed."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message).append("Server-Timing", stats.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            self._finish(scope, status, stats)
+
+    @staticmethod
+    def _finish(scope, status: int, stats: RequestStats):
+        seconds = time.perf_counter() - stats.started
+        route = scope.get("route")
+        route = getattr(route, "path", None) or "unmatched"
+        registry.observe(scope["method"], route, status, seconds, stats)
+
+        if SLOW_REQUEST_MS and seconds * 1000 >= SLOW_REQUEST_MS:
+            slowest = "; ".join(
+                f"{s * 1000:.1f}ms [{fingerprint_id(fp)}] {fp}"
+                for s, fp in ((s, fingerprint(stmt)) for s, stmt in stats.slowest)
+            )
+            logger.warning(
+                "slow request %s %s %d: %.1fms, %d statements, db %.1fms, serialize %.1fms | %s",
+                scope["method"], scope["path"], status, seconds * 1000, stats.statements,
+                stats.db_seconds * 1000, stats.serialize_seconds * 1000, slowest or "no SQL",
+            )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey, BigInteger
+from sqlalchemy import Column, Integer, String, Float, DateTime, Date, Enum, ForeignKey, BigInteger, Boolean, Index
 from sqlalchemy.orm import relationship
 from database import Base
 import enum
@@ -28,11 +28,18 @@ class Vehicle(Base):
     odometer        = Column(Float, default=0)
     status          = Column(Enum(VehicleStatus), default=VehicleStatus.AVAILABLE)
     acquisitionCost = Column(Float)
+    lastCompletedTripAt = Column(DateTime, nullable=True)  # maintained by backend-core on trip completion
+    updatedAt       = Column(DateTime)
 
     trips           = relationship("Trip",           back_populates="vehicle")
     maintenance_logs= relationship("MaintenanceLog", back_populates="vehicle")
     expenses        = relationship("Expense",        back_populates="vehicle")
 
+    __table_args__ = (
+        Index("vehicles_updatedAt_idx", "updatedAt"),
+        Index("vehicles_status_lastCompletedTripAt_idx", "status", "lastCompletedTripAt"),
+    )
+
 
 class Driver(Base):
     __tablename__ = "drivers"
@@ -42,9 +49,14 @@ class Driver(Base):
     licenseExpiryDate = Column(DateTime)
     status            = Column(String(50))
     safetyScore       = Column(Integer, default=100)
+    updatedAt         = Column(DateTime)
 
     trips             = relationship("Trip", back_populates="driver")
 
+    __table_args__ = (
+        Index("drivers_updatedAt_idx", "updatedAt"),
+    )
+
 
 class Trip(Base):
     __tablename__ = "trips"
@@ -57,11 +69,24 @@ class Trip(Base):
     revenue     = Column(Float, default=0)
     startDate   = Column(DateTime)
     endDate     = Column(DateTime, nullable=True)
+    startOdometer = Column(Float, nullable=True)
+    endOdometer   = Column(Float, nullable=True)
+    distanceKm    = Column(Float, nullable=True)  # endOdometer - startOdometer, when both were recorded
+    updatedAt   = Column(DateTime)
 
     vehicle     = relationship("Vehicle", back_populates="trips")
     driver      = relationship("Driver",  back_populates="trips")
     expenses    = relationship("Expense", back_populates="trip")
 
+    # Mirrors the @@index list in backend-core/prisma/schema.prisma.
+    __table_args__ = (
+        Index("trips_vehicleId_status_endDate_revenue_driverId_idx",
+              "vehicleId", "status", "endDate", "revenue", "driverId"),
+        Index("trips_driverId_status_revenue_idx", "driverId", "status", "revenue"),
+        Index("trips_status_endDate_vehicleId_revenue_idx", "status", "endDate", "vehicleId", "revenue"),
+        Index("trips_updatedAt_vehicleId_driverId_idx", "updatedAt", "vehicleId", "driverId"),
+    )
+
 
 class MaintenanceLog(Base):
     __tablename__ = "maintenance_logs"
@@ -74,6 +99,10 @@ class MaintenanceLog(Base):
 
     vehicle     = relationship("Vehicle", back_populates="maintenance_logs")
 
+    __table_args__ = (
+        Index("maintenance_logs_vehicleId_date_cost_idx", "vehicleId", "date", "cost"),
+    )
+
 
 class Expense(Base):
     __tablename__ = "expenses"
@@ -87,3 +116,158 @@ class Expense(Base):
 
     trip       = relationship("Trip",    back_populates="expenses")
     vehicle    = relationship("Vehicle", back_populates="expenses")
+
+    __table_args__ = (
+        Index("expenses_vehicleId_date_fuelCost_fuelLiters_idx", "vehicleId", "date", "fuelCost", "fuelLiters"),
+        Index("expenses_tripId_fkey", "tripId"),  # MySQL creates it for the foreign key
+    )
+
+
+# ── Analytics-owned rollups ───────────────────────────────────────────────────
+# Maintained by rollups.py; never written by backend-core.
+
+class VehicleRollup(Base):
+    __tablename__ = "vehicle_rollups"
+
+    vehicleId            = Column(Integer, primary_key=True)
+    totalRevenue         = Column(Float, default=0)
+    completedTrips       = Column(Integer, default=0)
+    avgDriverScore       = Column(Float, nullable=True)
+    totalFuelCost        = Column(Float, default=0)
+    totalFuelLiters      = Column(Float, default=0)
+    totalMaintenanceCost = Column(Float, default=0)
+    lastTripEnd          = Column(DateTime, nullable=True)
+
+
+class DriverRollup(Base):
+    __tablename__ = "driver_rollups"
+
+    driverId       = Column(Integer, primary_key=True)
+    totalTrips     = Column(Integer, default=0)
+    completedTrips = Column(Integer, default=0)
+    totalRevenue   = Column(Float, default=0)
+
+
+class VehicleDailyRollup(Base):
+    __tablename__ = "vehicle_daily_rollups"
+
+    vehicleId       = Column(Integer, primary_key=True)
+    day             = Column(Date, primary_key=True)
+    revenue         = Column(Float, default=0)
+    completedTrips  = Column(Integer, default=0)
+    fuelCost        = Column(Float, default=0)
+    fuelLiters      = Column(Float, default=0)
+    maintenanceCost = Column(Float, default=0)
+
+    # Date-windowed reads scan one range of days across every vehicle.
+    __table_args__ = (
+        Index("vehicle_daily_rollups_day_idx",
+              "day", "vehicleId", "revenue", "completedTrips", "fuelCost", "fuelLiters", "maintenanceCost"),
+    )
+
+
+# Per-trip fuel efficiency, maintained by efficiency.py. One row per completed
+# trip with a recorded distance and fuel logged against it (expenses.tripId).
+# window* sum this trip and up to WINDOW_TRIPS - 1 before it (the vehicle's
+# rolling efficiency after this trip); the baseline is the window of the
+# trip before.
+class TripEfficiency(Base):
+    __tablename__ = "trip_efficiency"
+
+    tripId             = Column(Integer, primary_key=True, autoincrement=False)
+    vehicleId          = Column(Integer, nullable=False)
+    endDate            = Column(DateTime, nullable=False)
+    distanceKm         = Column(Float, nullable=False)
+    fuelLiters         = Column(Float, nullable=False)
+    kmPerLiter         = Column(Float, nullable=False)
+    windowTrips        = Column(Integer, nullable=False)
+    windowDistanceKm   = Column(Float, nullable=False)
+    windowFuelLiters   = Column(Float, nullable=False)
+    baselineKmPerLiter = Column(Float, nullable=True)
+    deviationPercent   = Column(Float, nullable=True)
+    anomaly            = Column(Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        Index("trip_efficiency_vehicleId_endDate_idx", "vehicleId", "endDate", "tripId"),
+        Index("trip_efficiency_endDate_idx", "endDate", "vehicleId", "distanceKm", "fuelLiters"),
+        Index("trip_efficiency_anomaly_endDate_idx", "anomaly", "endDate"),
+    )
+
+
+# Per-vehicle efficiency: measured totals over every trip_efficiency row and
+# the rolling window of the latest one.
+class VehicleEfficiency(Base):
+    __tablename__ = "vehicle_efficiency"
+
+    vehicleId        = Column(Integer, primary_key=True, autoincrement=False)
+    measuredTrips    = Column(Integer, default=0)
+    distanceKm       = Column(Float, default=0)
+    fuelLiters       = Column(Float, default=0)
+    recentTrips      = Column(Integer, default=0)
+    recentDistanceKm = Column(Float, default=0)
+    recentFuelLiters = Column(Float, default=0)
+    anomalies        = Column(Integer, default=0)
+
+
+# The default dashboard summary (no date window, default idleDays), one row
+# recomputed by every refresh so reading it does not grow with the fleet.
+class FleetRollup(Base):
+    __tablename__ = "fleet_rollup"
+
+    name                 = Column(String(50), primary_key=True)
+    availableVehicles    = Column(Integer, default=0)
+    onTripVehicles       = Column(Integer, default=0)
+    inShopVehicles       = Column(Integer, default=0)
+    retiredVehicles      = Column(Integer, default=0)
+    dispatchedTrips      = Column(Integer, default=0)
+    draftTrips           = Column(Integer, default=0)
+    totalDrivers         = Column(Integer, default=0)
+    onDutyDrivers        = Column(Integer, default=0)
+    avgSafety            = Column(Float, nullable=True)
+    totalRevenue         = Column(Float, default=0)
+    completedTrips       = Column(Integer, default=0)
+    totalFuelCost        = Column(Float, default=0)
+    totalMaintenanceCost = Column(Float, default=0)
+    deadStockCount       = Column(Integer, default=0)
+    refreshedAt          = Column(DateTime, nullable=True)
+
+
+class RollupState(Base):
+    __tablename__ = "rollup_state"
+
+    name             = Column(String(50), primary_key=True)
+    tripUpdatedAt    = Column(DateTime, nullable=True)
+    driverUpdatedAt  = Column(DateTime, nullable=True)
+    expenseId        = Column(Integer, default=0)
+    maintenanceLogId = Column(Integer, default=0)
+    refreshedAt      = Column(DateTime, nullable=True)
+
+
+# One row per refresh that changed daily rollups before today. Readers caching
+# closed date buckets drop those ending on or after changedFrom (NULL = all,
+# written by full rebuilds).
+class RollupRevision(Base):
+    __tablename__ = "rollup_revisions"
+
+    id          = Column(Integer, primary_key=True, autoincrement=True)
+    changedFrom = Column(Date, nullable=True)
+    createdAt   = Column(DateTime)
+
+
+# Ids backend-core reported as changed (POST /analytics/cache/invalidate),
+# one of vehicleId / driverId / tripId per row, for the next refresh on any
+# worker. The refresh that recomputes them sets refreshedAt in its own
+# transaction; settled rows are kept a while for the live broadcasters.
+class RollupDirty(Base):
+    __tablename__ = "rollup_dirty"
+
+    id          = Column(Integer, primary_key=True, autoincrement=True)
+    vehicleId   = Column(Integer, nullable=True)
+    driverId    = Column(Integer, nullable=True)
+    tripId      = Column(Integer, nullable=True)
+    createdAt   = Column(DateTime)
+    refreshedAt = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("rollup_dirty_refreshedAt_idx", "refreshedAt"),
+    )
@@ -0,0 +1,192 @@
+"""
+Keyset pagination, sorting, filtering and field projection for the
+per-vehicle list endpoints (all-roi, fuel-efficiency, dead-stock).
+
+All of it is applied to the SQL statement: filters become WHERE clauses, the
+sort key is an expression from `aggregates.VEHICLE_SORT_KEYS` over the
+statement's own columns (so windowed totals sort by the window) and a page is
+`ORDER BY key, id LIMIT n+1` resumed from the last (key, id) seen, so the
+database never hands over more rows than one page.
+
+Without `limit` / `after` the endpoints keep returning a plain JSON array.
+With them the body becomes `{"items": [...], "nextCursor": "..."}`, where
+`nextCursor` is null on the last page. Cursors are opaque to clients and
+only valid for the sort they were issued for.
+
+`format=columns` sends the list (or `items`) as one array per field,
+`{"vehicleId": [...], "nameModel": [...], ...}`, instead of an object per
+vehicle, so field names are not repeated on every row. An empty result is
+`{}`.
+"""
+import base64
+import binascii
+import datetime
+import json
+from typing import Literal, Optional
+
+from fastapi import HTTPException, Query
+from sqlalchemy import and_, or_
+
+from aggregates import VEHICLE_SORT_KEYS
+from cache import JSONBody
+from models import Vehicle, VehicleStatus
+from responses import dumps
+import columnar
+
+MAX_PAGE_SIZE = 1000
+SORT_KEY_COLUMN = "_sortKey"
+
+
+def encode_cursor(sort: str, value, vehicle_id: int) -> str:
+    if isinstance(value, datetime.datetime):
+        value = {"dt": value.isoformat()}
+    raw = json.dumps([sort, value, vehicle_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    """(sort value, vehicle id) from a cursor issued for `sort`; 400 if it is not one."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, value, vehicle_id = json.loads(raw)
+        if isinstance(value, dict):
+            value = datetime.datetime.fromisoformat(value["dt"])
+        if not isinstance(vehicle_id, int):
+            raise ValueError(vehicle_id)
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort:
+        raise HTTPException(status_code=400, detail=f"Cursor was issued for sort={cursor_sort}")
+    return value, vehicle_id
+
+
+def csv_param(value: Optional[str]) -> list:
+    """The parts of a comma-separated query parameter."""
+    return [part.strip() for part in value.split(",") if part.strip()] if value else []
+
+
+def columns_of(items: list) -> dict:
+    """Payload objects as one list per field (`format=columns`); `{}` for no items."""
+    return {f: [item[f] for item in items] for f in (items[0] if items else ())}
+
+
+class VehicleListParams:
+    """Query parameters shared by the vehicle list endpoints (a FastAPI dependency)."""
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="page size; enables paging"),
+        after: Optional[str] = Query(None, description="nextCursor of the previous page"),
+        sort: Optional[Literal["id", "roi", "kmPerLiter", "idleDays"]] = Query(None),
+        order: Optional[Literal["asc", "desc"]] = Query(None, description="default: desc, except for id"),
+        status: Optional[str] = Query(None, description="comma-separated vehicle statuses"),
+        ids: Optional[str] = Query(None, description="comma-separated vehicle ids"),
+        fields: Optional[str] = Query(None, description="comma-separated payload fields to return"),
+        format: Literal["rows", "columns"] = Query("rows", description="columns: one array per field"),
+    ):
+        self.limit, self.after, self.sort, self.order = limit, after, sort, order
+        self.format = format
+        try:
+            self.statuses = [VehicleStatus(s) for s in csv_param(status)]
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=f"Unknown status: {exc}")
+        try:
+            self.ids = [int(i) for i in csv_param(ids)]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+        self.fields = csv_param(fields)
+
+    @property
+    def paged(self) -> bool:
+        return self.limit is not None or self.after is not None
+
+    def apply(self, stmt, default_sort: str = "id", payload_fields=()):
+        """
+        `stmt` (a vehicle list select) filtered, ordered and limited to one
+        page. The requested `fields` must be among `payload_fields`, the
+        keys of the endpoint's payload, whether or not the page has rows.
+        """
+        unknown = set(self.fields) - set(payload_fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        self.sort = self.sort or default_sort
+        key_factory, inverted = VEHICLE_SORT_KEYS[self.sort]
+        try:
+            key = key_factory(stmt.selected_columns)
+        except AttributeError:
+            raise HTTPException(status_code=400, detail=f"sort={self.sort} is not available here")
+        descending = (self.order or ("asc" if self.sort == "id" else "desc")) == "desc"
+        if inverted:
+            descending = not descending
+
+        if self.statuses:
+            stmt = stmt.where(Vehicle.status.in_(self.statuses))
+        if self.ids:
+            stmt = stmt.where(Vehicle.id.in_(self.ids))
+
+        if self.sort == "id":
+            order_by = [Vehicle.id.desc() if descending else Vehicle.id]
+        else:
+            # Ties are broken by id ascending whatever the direction, so the
+            # (key, id) position of the last row identifies the next page.
+            order_by = [key.desc() if descending else key, Vehicle.id]
+            stmt = stmt.add_columns(key.label(SORT_KEY_COLUMN))
+        stmt = stmt.order_by(None).order_by(*order_by)
+
+        if self.after is not None:
+            value, last_id = decode_cursor(self.after, self.sort)
+            if self.sort == "id":
+                stmt = stmt.where(Vehicle.id < last_id if descending else Vehicle.id > last_id)
+            else:
+                beyond = key < value if descending else key > value
+                stmt = stmt.where(or_(beyond, and_(key == value, Vehicle.id > last_id)))
+        if self.limit is not None:
+            stmt = stmt.limit(self.limit + 1)
+        return stmt
+
+    def page(self, rows: list, to_item):
+        """
+        Build the response body from the rows of an `apply()`-ed statement:
+        a list, or a page envelope when paging was requested.
+        """
+        next_cursor = None
+        if self.limit is not None and len(rows) > self.limit:
+            rows = rows[:self.limit]
+            last = rows[-1]
+            value = last["vehicleId"] if self.sort == "id" else last[SORT_KEY_COLUMN]
+            next_cursor = encode_cursor(self.sort, value, last["vehicleId"])
+
+        items = [to_item(r) for r in rows]
+        if self.fields:
+            items = [{f: item[f] for f in self.fields} for item in items]
+        if self.format == "columns":
+            items = columns_of(items)
+
+        if not self.paged:
+            return items
+        return {"items": items, "nextCursor": next_cursor}
+
+    def page_columns(self, columns: dict, to_columns) -> JSONBody:
+        """
+        `page()` for the columnar path: `columns` come from
+        `database.fetch_columns` and `to_columns` is a `columnar` builder.
+        Returns the serialized body.
+        """
+        next_cursor = None
+        if self.limit is not None and len(columns["vehicleId"]) > self.limit:
+            columns = {name: values[:self.limit] for name, values in columns.items()}
+            last_id = columns["vehicleId"][-1]
+            value = last_id if self.sort == "id" else columns[SORT_KEY_COLUMN][-1]
+            next_cursor = encode_cursor(self.sort, value, last_id)
+
+        payload = to_columns(columns)
+        if self.fields:
+            payload = {f: payload[f] for f in self.fields}
+
+        if self.format == "columns":
+            items = dumps(payload if len(columns["vehicleId"]) else {})
+        else:
+            items = columnar.dumps(payload)
+        if not self.paged:
+            return JSONBody(items)
+        return JSONBody(b'{"items":' + items + b',"nextCursor":' + dumps(next_cursor) + b"}")
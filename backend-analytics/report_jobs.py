@@ -0,0 +1,229 @@
+"""
+Background report jobs.
+
+`submit` queues a render of one of `reports.REPORT_KINDS` on a process pool,
+so ReportLab and CSV formatting never occupy a request thread or the event
+loop. Each job writes its artifact into REPORTS_DIR next to a small JSON
+status file; status lookups read that file, so any API process sharing the
+directory can answer for any job.
+
+Jobs are deduplicated per data window: the job id is derived from the kind,
+the day and `rollups.data_window()`, so identical requests share one render
+until the data behind the rollups changes. Finished artifacts older than
+REPORT_MAX_AGE_SECONDS are evicted, and the oldest go first once the
+directory holds more than REPORT_MAX_BYTES.
+"""
+import asyncio
+import datetime
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from sqlalchemy.orm import Session
+
+import reports
+from rollups import data_window
+
+REPORTS_DIR            = os.getenv("REPORTS_DIR") or os.path.join(tempfile.gettempdir(), "fleetflow-reports")
+REPORT_WORKERS         = int(os.getenv("REPORT_WORKERS", "2"))
+REPORT_MAX_AGE_SECONDS = float(os.getenv("REPORT_MAX_AGE_SECONDS", "86400"))
+REPORT_MAX_BYTES       = int(os.getenv("REPORT_MAX_BYTES", str(512 * 1024 * 1024)))
+# A queued or running job whose status has not moved for this long is presumed
+# lost (its API process restarted) and is submitted again.
+REPORT_STALE_SECONDS   = float(os.getenv("REPORT_STALE_SECONDS", "900"))
+
+FINISHED = ("done", "failed")
+_JOB_ID = re.compile(r"[0-9a-f]{20}")
+
+_pool = None
+_lock = threading.Lock()
+_futures = {}  # job id -> Future, for jobs submitted by this process
+
+
+def _meta_path(job_id: str) -> str:
+    return os.path.join(REPORTS_DIR, job_id + ".json")
+
+
+def artifact_path(meta: dict) -> str:
+    return os.path.join(REPORTS_DIR, meta["file"])
+
+
+def read_meta(job_id: str):
+    """Status record of `job_id`, or None if it is unknown or evicted."""
+    if not _JOB_ID.fullmatch(job_id):
+        return None
+    try:
+        with open(_meta_path(job_id), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_meta(meta: dict, **changes):
+    meta.update(changes, updatedAt=time.time())
+    tmp = _meta_path(meta["id"]) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, _meta_path(meta["id"]))
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    # Spawned (not forked) workers: the parent holds pooled DB connections,
+    # threads and a running event loop, none of which survive a fork safely.
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _submit(meta: dict):
+    """
+    Hand `meta` to a worker. A worker that died (OOM, a crash while
+    rendering) leaves the pool broken for good, so it is replaced and the
+    job retried once on the fresh pool.
+    """
+    try:
+        return _get_pool().submit(_run, dict(meta))
+    except BrokenProcessPool:
+        shutdown()
+        return _get_pool().submit(_run, dict(meta))
+
+
+def _run(meta: dict) -> int:
+    """Worker-process side of a job."""
+    _write_meta(meta, status="running")
+    return reports.render(meta["kind"], artifact_path(meta))
+
+
+def _finish(meta: dict, future):
+    _futures.pop(meta["id"], None)
+    if future.cancelled():
+        return
+    exc = future.exception()
+    if exc is None:
+        _write_meta(meta, status="done", size=future.result(), finishedAt=time.time())
+        return
+    partial_file = artifact_path(meta) + ".part"
+    if os.path.exists(partial_file):
+        os.remove(partial_file)
+    _write_meta(meta, status="failed", error=str(exc) or type(exc).__name__, finishedAt=time.time())
+
+
+def _reusable(meta) -> bool:
+    if meta is None:
+        return False
+    if meta["status"] == "done":
+        return os.path.exists(artifact_path(meta))
+    if meta["status"] == "failed":
+        return False
+    return meta["id"] in _futures or time.time() - meta["updatedAt"] < REPORT_STALE_SECONDS
+
+
+def submit(db: Session, kind: str) -> dict:
+    """
+    Queue a `kind` report for the current data window and return its status
+    record. An existing job for the same window is returned instead of
+    rendering again.
+    """
+    if kind not in reports.REPORT_KINDS:
+        raise ValueError(f"unknown report kind: {kind}")
+    window = f"{kind}|{datetime.date.today()}|{data_window(db)}"
+    job_id = hashlib.sha1(window.encode()).hexdigest()[:20]
+
+    with _lock:
+        os.makedirs(REPORTS_DIR, exist_ok=True)
+        evict()
+        meta = read_meta(job_id)
+        if _reusable(meta):
+            return meta
+
+        ext = reports.REPORT_KINDS[kind][2]
+        meta = {
+            "id": job_id, "kind": kind, "file": f"{job_id}.{ext}",
+            "createdAt": time.time(), "finishedAt": None, "size": None, "error": None,
+        }
+        _write_meta(meta, status="queued")
+        try:
+            future = _submit(meta)
+        except BrokenProcessPool as exc:
+            shutdown()
+            _write_meta(meta, status="failed", error=str(exc) or "report workers unavailable",
+                        finishedAt=time.time())
+            return meta
+        _futures[job_id] = future
+        future.add_done_callback(partial(_finish, meta))
+        return meta
+
+
+async def wait(job_id: str, poll_seconds: float = 0.5):
+    """Wait until `job_id` is done or failed and return its final status record."""
+    future = _futures.get(job_id)
+    if future is not None:
+        await asyncio.wait([asyncio.wrap_future(future)])
+    while True:
+        meta = read_meta(job_id)
+        if meta is None or meta["status"] in FINISHED:
+            return meta
+        await asyncio.sleep(poll_seconds)
+
+
+def evict():
+    """Drop finished jobs past REPORT_MAX_AGE_SECONDS, then the oldest beyond REPORT_MAX_BYTES."""
+    now = time.time()
+    finished = []
+    for name in os.listdir(REPORTS_DIR):
+        if not name.endswith(".json"):
+            continue
+        meta = read_meta(name[:-5])
+        if meta is None or meta["status"] not in FINISHED:
+            continue
+        if now - meta["finishedAt"] > REPORT_MAX_AGE_SECONDS:
+            _remove(meta)
+        else:
+            finished.append(meta)
+
+    total = sum(m["size"] or 0 for m in finished)
+    for meta in sorted(finished, key=lambda m: m["finishedAt"]):
+        if total <= REPORT_MAX_BYTES:
+            break
+        total -= meta["size"] or 0
+        _remove(meta)
+
+
+def _remove(meta: dict):
+    for path in (artifact_path(meta), _meta_path(meta["id"])):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def describe(meta: dict) -> dict:
+    """Public view of a status record."""
+    def iso(ts):
+        return datetime.datetime.fromtimestamp(ts).isoformat() if ts else None
+
+    return {
+        "id":          meta["id"],
+        "kind":        meta["kind"],
+        "status":      meta["status"],
+        "createdAt":   iso(meta["createdAt"]),
+        "finishedAt":  iso(meta["finishedAt"]),
+        "size":        meta["size"],
+        "error":       meta["error"],
+        "downloadUrl": f"/analytics/reports/{meta['id']}/file" if meta["status"] == "done" else None,
+    }
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
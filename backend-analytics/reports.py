@@ -0,0 +1,296 @@
+"""
+Report rendering: the fleet audit (CSV and PDF) and the driver payroll CSV.
+
+Everything here is synchronous and opens its own sessions, so the same code
+serves the streaming download routes and the report-job worker processes
+(report_jobs.py), which call `render(kind, path)`.
+
+ReportLab and pypdf are imported inside the PDF functions: PDFs are rendered
+in the report-job workers, so the API processes never load them.
+"""
+import csv
+import datetime
+import io
+import math
+import multiprocessing
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import func, select
+
+from database import ReadSession
+from models import Vehicle
+from aggregates import (
+    vehicle_totals_query, fetch_vehicle_totals, driver_totals_query, fleet_totals_query, roi_row,
+)
+
+CSV_BATCH_ROWS = 500
+
+# kind -> (media type, download filename prefix, file extension)
+REPORT_KINDS = {
+    "audit-pdf":   ("application/pdf", "fleetflow_audit",   "pdf"),
+    "audit-csv":   ("text/csv",        "fleetflow_audit",   "csv"),
+    "payroll-csv": ("text/csv",        "fleetflow_payroll", "csv"),
+}
+
+
+def stream_csv(header: list, stmt, to_row):
+    """
+    Yield CSV text in batches of CSV_BATCH_ROWS rows as `stmt` is read.
+
+    Uses its own session with `yield_per`, which makes PyMySQL use an
+    unbuffered server-side cursor (SSCursor): neither the driver nor this
+    generator ever holds more than one batch in memory.
+    """
+    buf    = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    yield buf.getvalue()
+
+    with ReadSession() as db:
+        result = db.execute(stmt.execution_options(yield_per=CSV_BATCH_ROWS))
+        for batch in result.mappings().partitions():
+            buf.seek(0)
+            buf.truncate()
+            writer.writerows(to_row(r) for r in batch)
+            yield buf.getvalue()
+
+
+# ── Fleet audit (CSV) ────────────────────────────────────────────────────────
+AUDIT_HEADER = [
+    "Vehicle ID", "Model", "License Plate", "Status", "Odometer (km)",
+    "Acquisition Cost (₹)", "Total Revenue (₹)", "Maintenance Cost (₹)",
+    "Fuel Cost (₹)", "Net Profit (₹)", "ROI (%)",
+    "Total Trips", "Avg Safety Score (Drivers)",
+]
+
+
+def audit_csv_row(t) -> list:
+    data = roi_row(t)
+    avg_score = round(float(t["avgDriverScore"]), 1) if t["avgDriverScore"] is not None else "N/A"
+    return [
+        t["vehicleId"], t["nameModel"], t["licensePlate"], t["status"], t["odometer"],
+        t["acquisitionCost"], data["totalRevenue"], data["totalMaintenanceCost"],
+        data["totalFuelCost"], data["netProfit"], data["roiPercent"],
+        t["completedTrips"], avg_score,
+    ]
+
+
+def audit_csv():
+    return stream_csv(AUDIT_HEADER, vehicle_totals_query(), audit_csv_row)
+
+
+# ── Driver payroll (CSV) ─────────────────────────────────────────────────────
+PAYROLL_HEADER = [
+    "Driver ID", "Driver Name", "Status",
+    "Total Trips", "Completed Trips", "Completion Rate (%)",
+    "Revenue Generated (₹)", "Avg Safety Score",
+    "License Expiry Date", "License Status",
+]
+
+
+def payroll_csv_row(d, now: datetime.datetime) -> list:
+    total_trips     = d["totalTrips"]
+    completed_trips = d["completedTrips"]
+    completion_rate = round((completed_trips / total_trips) * 100, 1) if total_trips > 0 else 0
+
+    expiry         = d["licenseExpiryDate"]
+    license_status = "EXPIRED" if expiry and expiry < now else "VALID"
+    expiry_str     = expiry.strftime("%d-%m-%Y") if expiry else "N/A"
+
+    return [
+        d["driverId"], d["name"], d["status"],
+        total_trips, completed_trips, f"{completion_rate}%",
+        round(float(d["totalRevenue"]), 2), d["safetyScore"],
+        expiry_str, license_status,
+    ]
+
+
+def payroll_csv(start: datetime.date = None, end: datetime.date = None):
+    """Lifetime payroll rows, or the trips of [start, end] when either is given."""
+    now = datetime.datetime.now()
+    return stream_csv(PAYROLL_HEADER, driver_totals_query(start, end), lambda d: payroll_csv_row(d, now))
+
+
+# ── Fleet audit (PDF) ────────────────────────────────────────────────────────
+# Fleets with at least AUDIT_PDF_LARGE_ROWS vehicles are rendered in chunks of
+# AUDIT_PDF_CHUNK_ROWS rows on AUDIT_PDF_WORKERS processes and concatenated.
+AUDIT_PDF_LARGE_ROWS = int(os.getenv("AUDIT_PDF_LARGE_ROWS", "2000"))
+AUDIT_PDF_CHUNK_ROWS = int(os.getenv("AUDIT_PDF_CHUNK_ROWS", "1000"))
+AUDIT_PDF_WORKERS    = int(os.getenv("AUDIT_PDF_WORKERS", "0")) or os.cpu_count()
+
+cm = 72 / 2.54  # points per centimetre, as reportlab.lib.units.cm
+
+AUDIT_PDF_HEADER = ["Vehicle", "Plate", "Status", "Odo (km)", "Acq. Cost (₹)",
+                    "Revenue (₹)", "Maint. (₹)", "Fuel (₹)", "Net Profit (₹)", "ROI %"]
+AUDIT_PDF_COL_WIDTHS = [4.5*cm, 2.8*cm, 2.2*cm, 2.2*cm, 3.0*cm, 3.0*cm, 2.8*cm, 2.8*cm, 3.0*cm, 2.0*cm]
+
+
+def _audit_pdf_doc(out) -> "SimpleDocTemplate":
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.platypus import SimpleDocTemplate
+
+    return SimpleDocTemplate(
+        out,
+        pagesize=landscape(A4),
+        rightMargin=1.5*cm, leftMargin=1.5*cm,
+        topMargin=1.5*cm, bottomMargin=1.5*cm,
+    )
+
+
+def _audit_title() -> list:
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import Paragraph, Spacer
+
+    title_style = ParagraphStyle('title', fontSize=16, fontName='Helvetica-Bold',
+                                 alignment=TA_CENTER, spaceAfter=6)
+    sub_style   = ParagraphStyle('sub', fontSize=9, fontName='Helvetica',
+                                 alignment=TA_CENTER, textColor=colors.grey, spaceAfter=12)
+    return [
+        Paragraph("FleetFlow — Fleet Audit Report", title_style),
+        Paragraph(f"Generated on {datetime.date.today().strftime('%d %B %Y')}", sub_style),
+        Spacer(1, 0.3*cm),
+    ]
+
+
+def _audit_pdf_row(t) -> list:
+    d = roi_row(t)
+    return [
+        t["nameModel"], t["licensePlate"], t["status"],
+        f"{t['odometer']:,.0f}",
+        f"{t['acquisitionCost']:,.0f}",
+        f"{d['totalRevenue']:,.0f}",
+        f"{d['totalMaintenanceCost']:,.0f}",
+        f"{d['totalFuelCost']:,.0f}",
+        f"{d['netProfit']:,.0f}",
+        f"{d['roiPercent']:.2f}%",
+    ]
+
+
+def _audit_totals_row(totals) -> list:
+    revenue = float(totals["totalRevenue"])
+    maint   = float(totals["totalMaintenanceCost"])
+    fuel    = float(totals["totalFuelCost"])
+    return [
+        "TOTALS", "", "", "", "",
+        f"{revenue:,.0f}",
+        f"{maint:,.0f}",
+        f"{fuel:,.0f}",
+        f"{revenue - maint - fuel:,.0f}", "",
+    ]
+
+
+def _audit_table(rows, totals=None) -> "Table":
+    """The audit table for `rows`, closed by a totals row when `totals` is given."""
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle
+
+    table_data = [AUDIT_PDF_HEADER] + [_audit_pdf_row(t) for t in rows]
+    if totals is not None:
+        table_data.append(_audit_totals_row(totals))
+    body_end = -2 if totals is not None else -1
+
+    t = Table(table_data, colWidths=AUDIT_PDF_COL_WIDTHS, repeatRows=1)
+    style = [
+        # Header
+        ('BACKGROUND',   (0, 0), (-1, 0), colors.HexColor('#161b22')),
+        ('TEXTCOLOR',    (0, 0), (-1, 0), colors.HexColor('#58a6ff')),
+        ('FONTNAME',     (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE',     (0, 0), (-1, 0), 8),
+        ('ALIGN',        (0, 0), (-1, 0), 'CENTER'),
+        # Body
+        ('FONTSIZE',     (0, 1), (-1, body_end), 8),
+        ('ALIGN',        (3, 1), (-1, body_end), 'RIGHT'),
+        ('TEXTCOLOR',    (0, 1), (-1, body_end), colors.HexColor('#e6edf3')),
+        ('BACKGROUND',   (0, 1), (-1, body_end), colors.HexColor('#0d1117')),
+        ('ROWBACKGROUNDS',(0, 1), (-1, body_end), [colors.HexColor('#0d1117'), colors.HexColor('#1c2333')]),
+        ('GRID',         (0, 0), (-1, -1), 0.25, colors.HexColor('#30363d')),
+    ]
+    if totals is not None:
+        style += [
+            # Totals row
+            ('BACKGROUND',   (0, -1), (-1, -1), colors.HexColor('#21262d')),
+            ('FONTNAME',     (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('TEXTCOLOR',    (0, -1), (-1, -1), colors.HexColor('#e3b341')),
+            ('FONTSIZE',     (0, -1), (-1, -1), 8),
+            ('ALIGN',        (3, -1), (-1, -1), 'RIGHT'),
+        ]
+    t.setStyle(TableStyle(style))
+    return t
+
+
+def write_audit_pdf(out, rows, totals):
+    """Render the audit of vehicle total `rows` and fleet `totals` as one PDF into `out`."""
+    _audit_pdf_doc(out).build(_audit_title() + [_audit_table(rows, totals)])
+
+
+def _render_audit_chunk(path: str, rows: list, title: bool, totals) -> str:
+    """Worker: render the vehicle total `rows` to their own PDF at `path`."""
+    with open(path, "wb") as out:
+        _audit_pdf_doc(out).build((_audit_title() if title else []) + [_audit_table(rows, totals)])
+    return path
+
+
+def build_audit_pdf(out, large: bool = None):
+    """
+    Render the full fleet audit into the file object `out`. Totals come from
+    `fleet_totals_query()`. Large fleets (or `large=True`) are split into
+    AUDIT_PDF_CHUNK_ROWS-row chunks rendered in parallel and concatenated;
+    each chunk starts on a new page, so a chunk's last page may be short.
+
+    Totals and rows are read in one consistent snapshot and the workers get
+    their rows from here, so every chunk shows the data the totals sum up.
+    Rows are read as the workers take them, two chunks per worker ahead.
+    """
+    with ReadSession(snapshot=True) as db:
+        totals = dict(db.execute(fleet_totals_query()).mappings().one())
+        count = db.execute(select(func.count()).select_from(Vehicle)).scalar()
+        if large is None:
+            large = count >= AUDIT_PDF_LARGE_ROWS
+        if not large or not count:
+            write_audit_pdf(out, fetch_vehicle_totals(db), totals)
+            return
+
+        from pypdf import PdfWriter
+
+        chunks = math.ceil(count / AUDIT_PDF_CHUNK_ROWS)
+        workers = min(AUDIT_PDF_WORKERS, chunks)
+        result = db.execute(vehicle_totals_query().execution_options(yield_per=AUDIT_PDF_CHUNK_ROWS))
+        with tempfile.TemporaryDirectory(prefix="fleetflow-pdf-") as tmp, ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+        ) as pool:
+            writer = PdfWriter()
+            pending = deque()
+            for n, rows in enumerate(result.mappings().partitions()):
+                if len(pending) >= 2 * workers:
+                    writer.append(pending.popleft().result())
+                pending.append(pool.submit(
+                    _render_audit_chunk, os.path.join(tmp, f"{n:05d}.pdf"), [dict(r) for r in rows],
+                    n == 0, totals if n == chunks - 1 else None,
+                ))
+            while pending:
+                writer.append(pending.popleft().result())
+            writer.write(out)
+
+
+# ── Worker entry point ───────────────────────────────────────────────────────
+def render(kind: str, path: str) -> int:
+    """
+    Render report `kind` (see REPORT_KINDS) to `path` and return its size in
+    bytes. Output goes to a temporary sibling first, so `path` only ever holds
+    a complete report.
+    """
+    partial = path + ".part"
+    if kind == "audit-pdf":
+        with open(partial, "wb") as out:
+            build_audit_pdf(out)
+    else:
+        chunks = {"audit-csv": audit_csv, "payroll-csv": payroll_csv}[kind]()
+        with open(partial, "w", encoding="utf-8", newline="") as out:
+            out.writelines(chunks)
+    os.replace(partial, path)
+    return os.path.getsize(path)
@@ -0,0 +1,36 @@
+"""
+JSON encoding for analytics responses.
+
+Bodies are written by orjson straight from the payload. Starlette's
+JSONResponse needs FastAPI's `jsonable_encoder` to first copy the payload
+into plain dicts and lists, and that copy was most of the serialization time
+for the list endpoints. orjson handles what the routes return natively
+(dict, list, str, int, float, bool, None, datetime, date, Enum), so
+`dumps` only calls the encoder, through orjson's `default` hook, for values
+it cannot (Decimal, pydantic models).
+
+The response cache (`cache.cached_json`, behind every analytics read) uses
+`dumps` directly. Routes that return a plain payload still go through
+FastAPI's own encoder pass before `FastJSONResponse` renders it.
+
+The output matches JSONResponse's: compact separators, UTF-8 without
+escaping, datetimes in ISO 8601.
+"""
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from metrics import TimedJSONResponse, serialization_timer
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=jsonable_encoder, option=_OPTIONS)
+
+
+class FastJSONResponse(TimedJSONResponse):
+    """TimedJSONResponse rendered with `dumps`; the default response class."""
+
+    def render(self, content) -> bytes:
+        with serialization_timer():
+            return dumps(content)
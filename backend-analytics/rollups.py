@@ -0,0 +1,412 @@
+"""
+Materialized per-vehicle / per-driver / daily rollups.
+
+The analytics read path (aggregates.py) never scans raw history. It joins the
+rollup tables maintained here:
+
+    vehicle_rollups        lifetime totals per vehicle
+    driver_rollups         lifetime trip totals per driver
+    vehicle_daily_rollups  per-vehicle calendar-day buckets
+    fleet_rollup           the default dashboard summary
+    rollup_state           high-water marks of the last refresh
+    rollup_revisions       earliest day each refresh changed, for closed-bucket caches
+    rollup_dirty           ids queued by `mark_dirty` for the next refresh
+    trip_efficiency        per-trip km/L and anomalies (efficiency.py)
+    vehicle_efficiency     per-vehicle measured and rolling km/L (efficiency.py)
+
+An incremental refresh looks for rows past the stored high-water marks
+(`trips.updatedAt`, `drivers.updatedAt`, `expenses.id`, `maintenance_logs.id`)
+and recomputes only the vehicles and drivers they touch, and rescores the
+trips among them. Deleted expense and maintenance rows are invisible to the
+marks; backend-core reports the ids it touched through `mark_dirty`, which
+queues them in `rollup_dirty` for whichever worker refreshes next. A refresh
+takes the queued ids in its own transaction, so they stay queued if it
+fails. A full rebuild is kept for repair:
+
+    python rollups.py rebuild     # truncate and recompute everything
+    python rollups.py refresh     # incremental catch-up
+"""
+import argparse
+import datetime
+import math
+import os
+import threading
+import time
+
+from fastapi import Depends
+from sqlalchemy import select, func, delete, insert, union, update
+from sqlalchemy.orm import Session
+
+from database import Base, SessionLocal, engines, get_db, read_your_writes
+from models import (
+    Vehicle, Driver, Trip, Expense, MaintenanceLog,
+    VehicleRollup, DriverRollup, VehicleDailyRollup, RollupState, RollupRevision, RollupDirty,
+    TripEfficiency, VehicleEfficiency, FleetRollup,
+)
+from aggregates import (
+    live_vehicle_totals_select, live_driver_totals_select, live_daily_totals_select,
+    summary_aggregate_statements, fleet_rollup_values,
+)
+import efficiency
+
+# Readers accept rollups up to this many seconds old before refreshing inline.
+MAX_STALENESS_SECONDS = float(os.getenv("ROLLUP_MAX_STALENESS_SECONDS", "30"))
+
+STATE_KEY = "default"
+ID_CHUNK  = 1000
+# Settled rollup_dirty rows are deleted after this long (live.py reads them by id).
+DIRTY_RETENTION = datetime.timedelta(hours=1)
+# Rows stamped this close before a refresh may have committed after it read the marks.
+MARK_GRACE = datetime.timedelta(seconds=1)
+
+ROLLUP_TABLES = [
+    VehicleRollup.__table__,
+    DriverRollup.__table__,
+    VehicleDailyRollup.__table__,
+    FleetRollup.__table__,
+    RollupState.__table__,
+    RollupRevision.__table__,
+    RollupDirty.__table__,
+    TripEfficiency.__table__,
+    VehicleEfficiency.__table__,
+]
+
+_refresh_lock = threading.Lock()
+_last_refresh = float("-inf")  # time.monotonic() of this process's last successful refresh
+
+
+def create_tables():
+    """Create the analytics-owned rollup tables, and indexes added since, if they do not exist yet."""
+    engine = engines()["engine"]
+    Base.metadata.create_all(engine, tables=ROLLUP_TABLES)
+    for table in ROLLUP_TABLES:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
+def _chunks(ids):
+    ids = sorted(ids)
+    for i in range(0, len(ids), ID_CHUNK):
+        yield ids[i:i + ID_CHUNK]
+
+
+def _current_marks(db: Session) -> dict:
+    return db.execute(select(
+        select(func.max(Trip.updatedAt)).scalar_subquery().label("tripUpdatedAt"),
+        select(func.max(Driver.updatedAt)).scalar_subquery().label("driverUpdatedAt"),
+        select(func.max(Expense.id)).scalar_subquery().label("expenseId"),
+        select(func.max(MaintenanceLog.id)).scalar_subquery().label("maintenanceLogId"),
+    )).mappings().one()
+
+
+def _daily_rows(db: Session, vehicle_ids) -> set:
+    d = VehicleDailyRollup
+    return {
+        (v, day, round(revenue or 0, 6), trips or 0, round(fuel or 0, 6), round(liters or 0, 6), round(maint or 0, 6))
+        for v, day, revenue, trips, fuel, liters, maint in db.execute(
+            select(d.vehicleId, d.day, d.revenue, d.completedTrips, d.fuelCost, d.fuelLiters, d.maintenanceCost)
+            .where(d.vehicleId.in_(vehicle_ids)))
+    }
+
+
+def _write_vehicles(db: Session, vehicle_ids=None):
+    """
+    Replace vehicle and daily rollups for `vehicle_ids` (all vehicles when
+    None). Returns the earliest day whose daily rollup changed, None if no
+    day did, or `datetime.date.min` after a full rewrite.
+    """
+    if vehicle_ids is None:
+        db.execute(delete(VehicleRollup))
+        db.execute(delete(VehicleDailyRollup))
+        db.execute(insert(VehicleRollup).from_select(
+            [c.name for c in VehicleRollup.__table__.columns], live_vehicle_totals_select()))
+        db.execute(insert(VehicleDailyRollup).from_select(
+            [c.name for c in VehicleDailyRollup.__table__.columns], live_daily_totals_select()))
+        return datetime.date.min
+    changed_from = None
+    for chunk in _chunks(vehicle_ids):
+        before = _daily_rows(db, chunk)
+        db.execute(delete(VehicleRollup).where(VehicleRollup.vehicleId.in_(chunk)))
+        db.execute(delete(VehicleDailyRollup).where(VehicleDailyRollup.vehicleId.in_(chunk)))
+        db.execute(insert(VehicleRollup).from_select(
+            [c.name for c in VehicleRollup.__table__.columns], live_vehicle_totals_select(chunk)))
+        db.execute(insert(VehicleDailyRollup).from_select(
+            [c.name for c in VehicleDailyRollup.__table__.columns], live_daily_totals_select(chunk)))
+        days = {row[1] for row in before ^ _daily_rows(db, chunk)}
+        if days:
+            earliest = min(days)
+            changed_from = earliest if changed_from is None else min(changed_from, earliest)
+    return changed_from
+
+
+def _write_drivers(db: Session, driver_ids=None):
+    """Replace driver rollups for `driver_ids` (all drivers when None)."""
+    columns = [c.name for c in DriverRollup.__table__.columns]
+    if driver_ids is None:
+        db.execute(delete(DriverRollup))
+        db.execute(insert(DriverRollup).from_select(columns, live_driver_totals_select()))
+        return
+    for chunk in _chunks(driver_ids):
+        db.execute(delete(DriverRollup).where(DriverRollup.driverId.in_(chunk)))
+        db.execute(insert(DriverRollup).from_select(columns, live_driver_totals_select(chunk)))
+
+
+def _fleet_values(db: Session) -> dict:
+    return fleet_rollup_values([db.execute(s).mappings().all() for s in summary_aggregate_statements()])
+
+
+def _fleet_changed(db: Session, values: dict) -> bool:
+    """True when the stored fleet_rollup row is missing or differs from `values`."""
+    fleet = db.get(FleetRollup, STATE_KEY)
+    return fleet is None or any(
+        not math.isclose(getattr(fleet, name) or 0, value or 0, rel_tol=1e-9) for name, value in values.items())
+
+
+def _write_fleet(db: Session, values: dict):
+    """Upsert the fleet_rollup row with `values`."""
+    fleet = db.get(FleetRollup, STATE_KEY) or FleetRollup(name=STATE_KEY)
+    for name, value in values.items():
+        setattr(fleet, name, value)
+    fleet.refreshedAt = datetime.datetime.now()
+    db.add(fleet)
+
+
+def _nothing_new(state: RollupState, marks: dict, queued: list) -> bool:
+    """
+    True when no mark moved since the last refresh and nothing is queued.
+    Rows stamped at exactly a trip or driver mark were seen by that refresh,
+    unless it ran within MARK_GRACE of the mark.
+    """
+    if queued:
+        return False
+    if (marks["expenseId"] or 0, marks["maintenanceLogId"] or 0) != (state.expenseId, state.maintenanceLogId):
+        return False
+    for name in ("tripUpdatedAt", "driverUpdatedAt"):
+        mark = getattr(state, name)
+        if marks[name] != mark or (mark is not None and state.refreshedAt - mark < MARK_GRACE):
+            return False
+    return True
+
+
+def _save_state(db: Session, state: RollupState, marks: dict):
+    state.tripUpdatedAt    = marks["tripUpdatedAt"]
+    state.driverUpdatedAt  = marks["driverUpdatedAt"]
+    state.expenseId        = marks["expenseId"] or 0
+    state.maintenanceLogId = marks["maintenanceLogId"] or 0
+    state.refreshedAt      = datetime.datetime.now()
+
+
+def _record_revision(db: Session, changed_from):
+    """
+    Note that daily rollups changed from `changed_from` on. Changes to today
+    only touch open buckets, which nobody caches, so they are not recorded.
+    A full rewrite records NULL and drops the rows it supersedes.
+    """
+    if changed_from is None or changed_from >= datetime.date.today():
+        return
+    if changed_from == datetime.date.min:
+        latest = RollupRevision(changedFrom=None, createdAt=datetime.datetime.now())
+        db.add(latest)
+        db.flush()
+        db.execute(delete(RollupRevision).where(RollupRevision.id < latest.id))
+    else:
+        db.add(RollupRevision(changedFrom=changed_from, createdAt=datetime.datetime.now()))
+
+
+def _queued(db: Session) -> list:
+    """The rollup_dirty rows no refresh has settled yet."""
+    d = RollupDirty
+    return db.execute(
+        select(d.id, d.vehicleId, d.driverId, d.tripId).where(d.refreshedAt.is_(None))
+    ).all()
+
+
+def _settle(db: Session, queued: list):
+    """Mark `queued` rows recomputed (committed with the refresh) and drop old settled rows."""
+    now = datetime.datetime.now()
+    for chunk in _chunks(row.id for row in queued):
+        db.execute(update(RollupDirty).where(RollupDirty.id.in_(chunk)).values(refreshedAt=now))
+    db.execute(delete(RollupDirty).where(RollupDirty.refreshedAt < now - DIRTY_RETENTION))
+
+
+def rebuild(db: Session):
+    """Recompute every rollup from raw tables in one transaction."""
+    marks = _current_marks(db)
+    queued = _queued(db)
+    _record_revision(db, _write_vehicles(db))
+    _write_drivers(db)
+    efficiency.rebuild(db)
+    _write_fleet(db, _fleet_values(db))
+    _settle(db, queued)
+    state = db.get(RollupState, STATE_KEY) or RollupState(name=STATE_KEY)
+    _save_state(db, state, marks)
+    db.add(state)
+    db.commit()
+
+
+def refresh(db: Session, vehicle_ids=()) -> dict:
+    """
+    Recompute rollups for vehicles and drivers touched since the last
+    refresh, queued by `mark_dirty` or given in `vehicle_ids`, and rescore
+    changed trips. Falls back to `rebuild` when no state has been recorded
+    yet. When nothing changed it writes nothing, not even the state row.
+    Returns the number of vehicles and drivers recomputed and trips scored.
+    """
+    state = db.get(RollupState, STATE_KEY)
+    if state is None or state.refreshedAt is None:
+        rebuild(db)
+        return {"vehicles": None, "drivers": None, "trips": None}
+
+    # Marks are read before the scan; updatedAt uses >= so rows written in
+    # the same millisecond as the previous mark are picked up again.
+    marks = _current_marks(db)
+
+    changed_trips = select(Trip.vehicleId, Trip.driverId, Trip.id)
+    if state.tripUpdatedAt is not None:
+        changed_trips = changed_trips.where(Trip.updatedAt >= state.tripUpdatedAt)
+    changed_drivers = select(Driver.id)
+    if state.driverUpdatedAt is not None:
+        changed_drivers = changed_drivers.where(Driver.updatedAt >= state.driverUpdatedAt)
+
+    queued = _queued(db)
+    if not vehicle_ids and _nothing_new(state, marks, queued) and not _fleet_changed(db, _fleet_values(db)):
+        db.rollback()  # no writes, so concurrent workers do not contend on the state rows
+        return {"vehicles": 0, "drivers": 0, "trips": 0}
+
+    vehicle_ids = set(vehicle_ids) | {row.vehicleId for row in queued if row.vehicleId is not None}
+    driver_ids = {row.driverId for row in queued if row.driverId is not None}
+    trip_ids = {row.tripId for row in queued if row.tripId is not None}
+
+    trip_rows = db.execute(changed_trips).all()
+    driver_ids |= {d for _, d, _ in trip_rows} | set(db.execute(changed_drivers).scalars())
+    vehicle_ids |= {v for v, _, _ in trip_rows}
+    trip_ids |= {t for _, _, t in trip_rows}
+    # New fuel on a trip changes its km/L.
+    trip_ids |= set(db.execute(
+        select(Expense.tripId).where(Expense.id > state.expenseId, Expense.tripId.is_not(None))
+    ).scalars())
+    vehicle_ids |= set(db.execute(union(
+        select(Expense.vehicleId).where(Expense.id > state.expenseId),
+        select(MaintenanceLog.vehicleId).where(MaintenanceLog.id > state.maintenanceLogId),
+    )).scalars())
+    # A driver's safetyScore feeds avgDriverScore of every vehicle they drove.
+    for chunk in _chunks(driver_ids):
+        vehicle_ids |= set(db.execute(
+            select(Trip.vehicleId).where(Trip.driverId.in_(chunk)).distinct()
+        ).scalars())
+
+    _record_revision(db, _write_vehicles(db, vehicle_ids))
+    _write_drivers(db, driver_ids)
+    scored = efficiency.refresh_trips(db, trip_ids)
+    _write_fleet(db, _fleet_values(db))
+    _settle(db, queued)
+    _save_state(db, state, marks)
+    db.commit()
+    return {"vehicles": len(vehicle_ids), "drivers": len(driver_ids), "trips": scored}
+
+
+def ensure_fresh(max_staleness: float = MAX_STALENESS_SECONDS):
+    """
+    Refresh rollups if this process has not done so within `max_staleness`
+    seconds, on a short-lived session of its own. Concurrent callers do not
+    queue up behind a running refresh; they read the current rollups instead.
+    """
+    if time.monotonic() - _last_refresh < max_staleness:
+        return
+    if not _refresh_lock.acquire(blocking=False):
+        return
+    try:
+        if time.monotonic() - _last_refresh < max_staleness:
+            return
+        _refresh_locked()
+    finally:
+        _refresh_lock.release()
+
+
+def refresh_now(vehicle_ids=()):
+    """
+    Recompute `vehicle_ids` plus whatever else changed, waiting for a refresh
+    already running in this process instead of skipping it, so the rollups
+    include every write committed before the call.
+    """
+    with _refresh_lock:
+        _refresh_locked(vehicle_ids)
+
+
+def _refresh_locked(vehicle_ids=()):
+    global _last_refresh
+    with SessionLocal() as db:
+        touched = refresh(db, vehicle_ids)
+    if any(n != 0 for n in touched.values()):
+        read_your_writes()  # until the replicas have the new rollups
+    _last_refresh = time.monotonic()
+
+
+def mark_dirty(vehicle_ids=(), driver_ids=(), trip_ids=()):
+    """
+    Queue ids in rollup_dirty for the next refresh, in whichever process it
+    runs, and force that refresh to happen on the next `ensure_fresh` call
+    in this one. `trip_ids` are trips whose fuel changed, to rescore. Reads
+    move to the primary for a while, as the write behind the call may not
+    be on the replicas.
+    """
+    global _last_refresh
+    now = datetime.datetime.now()
+    row = {"vehicleId": None, "driverId": None, "tripId": None, "createdAt": now}
+    rows = ([{**row, "vehicleId": i} for i in set(vehicle_ids)]
+            + [{**row, "driverId": i} for i in set(driver_ids)]
+            + [{**row, "tripId": i} for i in set(trip_ids)])
+    if rows:
+        with SessionLocal() as db:
+            db.execute(insert(RollupDirty), rows)
+            db.commit()
+    _last_refresh = float("-inf")
+    read_your_writes()
+
+
+def data_window(db: Session) -> str:
+    """
+    Opaque token that changes only when the data behind the rollups does:
+    the high-water marks of the last refresh, the latest id queued by
+    `mark_dirty` and the latest vehicle edit (statuses carry no mark). A
+    refresh that finds nothing new keeps it.
+    """
+    state = db.get(RollupState, STATE_KEY)
+    if state is None or state.refreshedAt is None:
+        return "none"
+    dirty_id, vehicle_updated_at = db.execute(select(
+        select(func.max(RollupDirty.id)).scalar_subquery(),
+        select(func.max(Vehicle.updatedAt)).scalar_subquery(),
+    )).one()
+    return "|".join(str(v) for v in (
+        state.tripUpdatedAt, state.driverUpdatedAt, state.expenseId, state.maintenanceLogId,
+        dirty_id, vehicle_updated_at,
+    ))
+
+
+def fresh_rollups():
+    """FastAPI dependency: bring rollups within the staleness bound (runs in the threadpool)."""
+    ensure_fresh()
+
+
+def get_fresh_db(db: Session = Depends(get_db)) -> Session:
+    """FastAPI dependency: a session whose rollups are within the staleness bound."""
+    ensure_fresh()
+    return db
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain FleetFlow analytics rollups.")
+    parser.add_argument("command", choices=["rebuild", "refresh"])
+    args = parser.parse_args()
+
+    create_tables()
+    with SessionLocal() as session:
+        started = time.perf_counter()
+        if args.command == "rebuild":
+            rebuild(session)
+            print(f"Rollups rebuilt in {time.perf_counter() - started:.2f}s")
+        else:
+            touched = refresh(session)
+            print(f"Rollups refreshed in {time.perf_counter() - started:.2f}s: {touched}")
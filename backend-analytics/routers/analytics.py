@@ -1,416 +1,274 @@
-import csv
-import io
-from typing import List
-from fastapi import APIRouter, Depends
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import cm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.enums import TA_CENTER
+import os
 import datetime
-
-from database import get_db
-from models import Vehicle, Driver, Trip, MaintenanceLog, Expense, TripStatus
+import hmac
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from database import fetch_all, fetch_columns, fetch_rows, fetch_snapshot
+from rollups import fresh_rollups, mark_dirty
+from cache import cached_json, prime, response_cache
+from models import Vehicle
+from aggregates import (
+    DEAD_STOCK_DAYS, vehicle_totals_query, roi_row, fuel_row, dead_stock_row, dead_stock_query, idle_cutoff,
+    fleet_summary_statements, build_fleet_summary, ROI_FIELDS, FUEL_FIELDS, DEAD_STOCK_FIELDS,
+)
+from paging import MAX_PAGE_SIZE, VehicleListParams, columns_of, csv_param
+import columnar
+import efficiency
+import live
+import snapshot
+import timeseries
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
 
+class DateWindow:
+    """Optional `from` / `to` dates (inclusive) narrowing totals to that period."""
+
+    def __init__(
+        self,
+        start: Optional[datetime.date] = Query(None, alias="from", description="first day, inclusive"),
+        end: Optional[datetime.date] = Query(None, alias="to", description="last day, inclusive"),
+    ):
+        if start and end and start > end:
+            raise HTTPException(status_code=400, detail="from must not be after to")
+        self.start, self.end = start, end
+
+
+def idle_days_param(
+    idle_days: int = Query(DEAD_STOCK_DAYS, alias="idleDays", ge=0, description="days without a completed trip"),
+) -> int:
+    """The idle-vehicle threshold (dead stock) in days."""
+    return idle_days
+
+
 # ── GET /analytics/summary ───────────────────────────────────────────────────
-@router.get("/summary")
-def get_summary(db: Session = Depends(get_db)):
-    """Fleet command center summary for the dashboard."""
-    total_vehicles    = db.query(Vehicle).count()
-    active_vehicles   = db.query(Vehicle).filter(Vehicle.status == "ON_TRIP").count()
-    in_shop_vehicles  = db.query(Vehicle).filter(Vehicle.status == "IN_SHOP").count()
-    available_vehicles= db.query(Vehicle).filter(Vehicle.status == "AVAILABLE").count()
-
-    total_drivers  = db.query(Driver).count()
-    active_drivers = db.query(Driver).filter(Driver.status == "ON_DUTY").count()
-
-    total_revenue    = db.query(func.sum(Trip.revenue)).filter(Trip.status == TripStatus.COMPLETED).scalar() or 0
-    total_fuel_cost  = db.query(func.sum(Expense.fuelCost)).scalar() or 0
-    total_maint_cost = db.query(func.sum(MaintenanceLog.cost)).scalar() or 0
-
-    completed_trips  = db.query(Trip).filter(Trip.status == TripStatus.COMPLETED).count()
-    active_trips     = db.query(Trip).filter(Trip.status == TripStatus.DISPATCHED).count()
-    pending_cargo    = db.query(Trip).filter(Trip.status == TripStatus.DRAFT).count()
-
-    avg_safety = db.query(func.avg(Driver.safetyScore)).scalar() or 0
-
-    utilization_rate = round((active_vehicles / total_vehicles * 100) if total_vehicles else 0, 1)
-
-    # Dead stock count (Available + No trips in 14 days)
-    fourteen_days_ago = datetime.datetime.now() - datetime.timedelta(days=14)
-    dead_stock_query = db.query(Vehicle).filter(Vehicle.status == "AVAILABLE")
-    dead_stock_count = 0
-    for v in dead_stock_query.all():
-        last_trip = db.query(Trip).filter(Trip.vehicleId == v.id, Trip.status == TripStatus.COMPLETED).order_by(Trip.endDate.desc()).first()
-        if not last_trip or (last_trip.endDate and last_trip.endDate < fourteen_days_ago):
-            dead_stock_count += 1
-
-    return {
-        "fleet": {
-            "total": total_vehicles,
-            "active": active_vehicles,
-            "inShop": in_shop_vehicles,
-            "available": available_vehicles,
-            "utilizationRate": utilization_rate,
-            "deadStockCount": dead_stock_count,
-        },
-        "drivers": {
-            "total": total_drivers,
-            "onDuty": active_drivers,
-            "avgSafetyScore": round(float(avg_safety), 1),
-        },
-        "financials": {
-            "totalRevenue": round(float(total_revenue), 2),
-            "totalFuelCost": round(float(total_fuel_cost), 2),
-            "totalMaintenanceCost": round(float(total_maint_cost), 2),
-            "netProfit": round(float(total_revenue) - float(total_fuel_cost) - float(total_maint_cost), 2),
-        },
-        "trips": {
-            "completed": completed_trips,
-            "active": active_trips,
-            "pendingCargo": pending_cargo,
-        },
-    }
+@router.get("/summary", dependencies=[Depends(fresh_rollups)])
+async def get_summary(request: Request, window: DateWindow = Depends(), idle_days: int = Depends(idle_days_param)):
+    """
+    Fleet command center summary for the dashboard. `from` / `to` narrow the
+    financial and completed-trip figures; fleet and driver counts are current.
+    `idleDays` sets the dead-stock threshold. Without either, the summary is
+    the pre-aggregated fleet row, as of the last rollup refresh (at most
+    ROLLUP_MAX_STALENESS_SECONDS old).
+    """
+    return await cached_json(request, "summary", lambda: compute_summary(window.start, window.end, idle_days))
+
+
+async def compute_summary(start=None, end=None, idle_days: int = DEAD_STOCK_DAYS) -> dict:
+    return build_fleet_summary(await fetch_all(*fleet_summary_statements(start, end, idle_days)))
+
+
+async def prime_caches():
+    """Cache the dashboard's first request (GET /analytics/summary) ahead of time."""
+    await prime("/analytics/summary", "summary", compute_summary)
 
 
 # ── GET /analytics/fuel-efficiency ──────────────────────────────────────────
-@router.get("/fuel-efficiency")
-def get_fuel_efficiency(db: Session = Depends(get_db)):
+@router.get("/fuel-efficiency", dependencies=[Depends(fresh_rollups)])
+async def get_fuel_efficiency(
+    request: Request, params: VehicleListParams = Depends(), window: DateWindow = Depends(),
+):
+    """
+    Calculate km/L fuel efficiency per vehicle from the distance and fuel of
+    its completed trips (`from` / `to` narrow both), or, for vehicles without
+    measured trips, estimated as odometer / lifetime fuel. `recentKmPerLiter`
+    covers the last EFFICIENCY_WINDOW_TRIPS measured trips. Sorted by km/L,
+    best first, unless `sort` says otherwise.
     """
-    Calculate km/L fuel efficiency per vehicle.
-    Uses total fuel consumed and odometer readings for estimation.
+    async def compute():
+        stmt = params.apply(
+            vehicle_totals_query(window.start, window.end), default_sort="kmPerLiter", payload_fields=FUEL_FIELDS)
+        if columnar.ENABLED:
+            return params.page_columns(await fetch_columns(stmt), columnar.fuel_columns)
+        return params.page(await fetch_rows(stmt), fuel_row)
+
+    return await cached_json(request, "fuel-efficiency", compute)
+
+
+# ── GET /analytics/efficiency-anomalies ──────────────────────────────────────
+@router.get("/efficiency-anomalies", dependencies=[Depends(fresh_rollups)])
+async def get_efficiency_anomalies(
+    request: Request,
+    window: DateWindow = Depends(),
+    vehicle_id: Optional[int] = Query(None, alias="vehicleId"),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+):
     """
-    vehicles = db.query(Vehicle).all()
-    results  = []
-
-    for v in vehicles:
-        total_fuel = db.query(func.sum(Expense.fuelLiters)).filter(Expense.vehicleId == v.id).scalar() or 0
-        total_cost = db.query(func.sum(Expense.fuelCost)).filter(Expense.vehicleId == v.id).scalar() or 0
-        trips_done = db.query(Trip).filter(
-            Trip.vehicleId == v.id,
-            Trip.status == TripStatus.COMPLETED
-        ).count()
-
-        # Estimate km driven based on odometer (subtract reasonable initial offset)
-        km_driven = v.odometer  # full odometer as a proxy for total distance
-
-        efficiency = round(km_driven / total_fuel, 2) if total_fuel > 0 else None
-
-        results.append({
-            "vehicleId":    v.id,
-            "nameModel":    v.nameModel,
-            "licensePlate": v.licensePlate,
-            "status":       v.status,
-            "odometer":     v.odometer,
-            "totalFuelLiters": round(float(total_fuel), 2),
-            "totalFuelCost":   round(float(total_cost), 2),
-            "kmPerLiter":      efficiency,
-            "completedTrips":  trips_done,
-        })
-
-    results.sort(key=lambda x: x["kmPerLiter"] or 0, reverse=True)
-    return results
+    Completed trips whose km/L deviates from their vehicle's rolling baseline
+    by EFFICIENCY_ANOMALY_PERCENT or more, most recent first.
+    """
+    async def compute():
+        stmt = efficiency.anomalies_query(vehicle_id, window.start, window.end).limit(limit)
+        return [efficiency.trip_efficiency_row(r) for r in await fetch_rows(stmt)]
+
+    return await cached_json(request, "efficiency-anomalies", compute)
 
 
 # ── GET /analytics/dead-stock ────────────────────────────────────────────────
 @router.get("/dead-stock")
-def get_dead_stock(db: Session = Depends(get_db)):
+async def get_dead_stock(
+    request: Request, params: VehicleListParams = Depends(), idle_days: int = Depends(idle_days_param),
+):
     """
-    Find vehicles that are AVAILABLE but haven't been on a trip in 14+ days.
+    Find vehicles that are AVAILABLE but haven't completed a trip in
+    `idleDays` (default 14) days, most idle first unless `sort` says
+    otherwise. Reads `vehicles.lastCompletedTripAt` only, no rollups.
     """
-    fourteen_days_ago = datetime.datetime.now() - datetime.timedelta(days=14)
-    available_vehicles = db.query(Vehicle).filter(Vehicle.status == "AVAILABLE").all()
-    
-    dead_stock = []
-    for v in available_vehicles:
-        last_trip = db.query(Trip).filter(
-            Trip.vehicleId == v.id,
-            Trip.status == TripStatus.COMPLETED
-        ).order_by(Trip.endDate.desc()).first()
-        
-        is_dead = False
-        days_idle = None
-        
-        if not last_trip:
-            is_dead = True
-            days_idle = 999 # never used
-        elif last_trip.endDate and last_trip.endDate < fourteen_days_ago:
-            is_dead = True
-            days_idle = (datetime.datetime.now() - last_trip.endDate).days
-            
-        if is_dead:
-            dead_stock.append({
-                "vehicleId":    v.id,
-                "nameModel":    v.nameModel,
-                "licensePlate": v.licensePlate,
-                "daysIdle":     days_idle,
-                "lastTripEnd":  last_trip.endDate if last_trip else None,
-            })
-            
-    return dead_stock
+    async def compute():
+        now = datetime.datetime.now()
+        stmt = params.apply(
+            dead_stock_query(idle_cutoff(now, idle_days)), default_sort="idleDays", payload_fields=DEAD_STOCK_FIELDS)
+        if columnar.ENABLED:
+            return params.page_columns(
+                await fetch_columns(stmt), lambda c: columnar.dead_stock_columns(c, now))
+        return params.page(await fetch_rows(stmt), lambda r: dead_stock_row(r, now))
+
+    return await cached_json(request, "dead-stock", compute)
 
 
 # ── GET /analytics/vehicle-roi/{vehicle_id} ──────────────────────────────────
-@router.get("/vehicle-roi/{vehicle_id}")
-def get_vehicle_roi(vehicle_id: int, db: Session = Depends(get_db)):
+@router.get("/vehicle-roi/{vehicle_id}", dependencies=[Depends(fresh_rollups)])
+async def get_vehicle_roi(vehicle_id: int, request: Request, window: DateWindow = Depends()):
     """
-    Vehicle ROI = (Revenue - (Maintenance + Fuel)) / Acquisition Cost
+    Vehicle ROI = (Revenue - (Maintenance + Fuel)) / Acquisition Cost,
+    over lifetime totals or those between `from` and `to`.
     """
-    vehicle = db.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
-    if not vehicle:
-        from fastapi import HTTPException
-        raise HTTPException(status_code=404, detail="Vehicle not found")
-
-    total_revenue = db.query(func.sum(Trip.revenue)).filter(
-        Trip.vehicleId == vehicle_id,
-        Trip.status    == TripStatus.COMPLETED
-    ).scalar() or 0
-
-    total_maintenance = db.query(func.sum(MaintenanceLog.cost)).filter(
-        MaintenanceLog.vehicleId == vehicle_id
-    ).scalar() or 0
-
-    total_fuel = db.query(func.sum(Expense.fuelCost)).filter(
-        Expense.vehicleId == vehicle_id
-    ).scalar() or 0
-
-    total_costs = float(total_maintenance) + float(total_fuel)
-    net_profit  = float(total_revenue) - total_costs
-
-    roi = round(net_profit / float(vehicle.acquisitionCost) * 100, 2) if vehicle.acquisitionCost else 0
-
-    return {
-        "vehicleId":          vehicle.id,
-        "nameModel":          vehicle.nameModel,
-        "licensePlate":       vehicle.licensePlate,
-        "acquisitionCost":    vehicle.acquisitionCost,
-        "totalRevenue":       round(float(total_revenue), 2),
-        "totalMaintenanceCost": round(float(total_maintenance), 2),
-        "totalFuelCost":      round(float(total_fuel), 2),
-        "totalCosts":         round(total_costs, 2),
-        "netProfit":          round(net_profit, 2),
-        "roiPercent":         roi,
-    }
+    async def compute():
+        rows = await fetch_rows(vehicle_totals_query(window.start, window.end).where(Vehicle.id == vehicle_id))
+        if not rows:
+            raise HTTPException(status_code=404, detail="Vehicle not found")
+        return roi_row(rows[0])
+
+    return await cached_json(request, "vehicle-roi", compute)
 
 
 # ── GET /analytics/all-roi ───────────────────────────────────────────────────
-@router.get("/all-roi")
-def get_all_roi(db: Session = Depends(get_db)):
-    """ROI for every vehicle – used by the FinancialAnalytics dashboard."""
-    vehicles = db.query(Vehicle).all()
-    return [_compute_roi(v.id, v, db) for v in vehicles]
-
-def _compute_roi(vehicle_id: int, vehicle: Vehicle, db: Session) -> dict:
-    total_revenue     = db.query(func.sum(Trip.revenue)).filter(Trip.vehicleId == vehicle_id, Trip.status == TripStatus.COMPLETED).scalar() or 0
-    total_maintenance = db.query(func.sum(MaintenanceLog.cost)).filter(MaintenanceLog.vehicleId == vehicle_id).scalar() or 0
-    total_fuel        = db.query(func.sum(Expense.fuelCost)).filter(Expense.vehicleId == vehicle_id).scalar() or 0
-    total_costs       = float(total_maintenance) + float(total_fuel)
-    net_profit        = float(total_revenue) - total_costs
-    roi               = round(net_profit / float(vehicle.acquisitionCost) * 100, 2) if vehicle.acquisitionCost else 0
-    return {
-        "vehicleId": vehicle.id, "nameModel": vehicle.nameModel,
-        "licensePlate": vehicle.licensePlate, "acquisitionCost": vehicle.acquisitionCost,
-        "totalRevenue": round(float(total_revenue), 2),
-        "totalMaintenanceCost": round(float(total_maintenance), 2),
-        "totalFuelCost": round(float(total_fuel), 2),
-        "totalCosts": round(total_costs, 2),
-        "netProfit": round(net_profit, 2), "roiPercent": roi,
-    }
-
-
-# ── GET /analytics/export ────────────────────────────────────────────────────
-@router.get("/export")
-def export_fleet_audit(db: Session = Depends(get_db)):
+@router.get("/all-roi", dependencies=[Depends(fresh_rollups)])
+async def get_all_roi(request: Request, params: VehicleListParams = Depends(), window: DateWindow = Depends()):
     """
-    Generate and return a downloadable CSV of the fleet health & financial audit.
+    ROI for every vehicle – used by the FinancialAnalytics dashboard.
+    `?sort=roi&limit=20` returns the top 20 without reading the rest of the fleet;
+    `from` / `to` compute it over that period only.
     """
-    vehicles = db.query(Vehicle).all()
-    output   = io.StringIO()
-    writer   = csv.writer(output)
-
-    # Header
-    writer.writerow([
-        "Vehicle ID", "Model", "License Plate", "Status", "Odometer (km)",
-        "Acquisition Cost (₹)", "Total Revenue (₹)", "Maintenance Cost (₹)",
-        "Fuel Cost (₹)", "Net Profit (₹)", "ROI (%)",
-        "Total Trips", "Avg Safety Score (Drivers)",
-    ])
-
-    for v in vehicles:
-        data = _compute_roi(v.id, v, db)
-        trips_count = db.query(Trip).filter(Trip.vehicleId == v.id, Trip.status == TripStatus.COMPLETED).count()
-        driver_scores = [
-            t.driver.safetyScore for t in
-            db.query(Trip).filter(Trip.vehicleId == v.id).all()
-            if t.driver
-        ]
-        avg_score = round(sum(driver_scores) / len(driver_scores), 1) if driver_scores else "N/A"
-
-        writer.writerow([
-            v.id, v.nameModel, v.licensePlate, v.status, v.odometer,
-            v.acquisitionCost, data["totalRevenue"], data["totalMaintenanceCost"],
-            data["totalFuelCost"], data["netProfit"], data["roiPercent"],
-            trips_count, avg_score,
-        ])
-
-
-    output.seek(0)
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=fleetflow_audit.csv"},
-    )
-
-
-# ── GET /analytics/export-pdf ─────────────────────────────────────────────────
-@router.get("/export-pdf")
-def export_fleet_pdf(db: Session = Depends(get_db)):
+    async def compute():
+        stmt = params.apply(vehicle_totals_query(window.start, window.end), payload_fields=ROI_FIELDS)
+        if columnar.ENABLED:
+            return params.page_columns(await fetch_columns(stmt), columnar.roi_columns)
+        return params.page(await fetch_rows(stmt), roi_row)
+
+    return await cached_json(request, "all-roi", compute)
+
+
+# ── GET /analytics/snapshot ──────────────────────────────────────────────────
+@router.get("/snapshot", dependencies=[Depends(fresh_rollups)])
+async def get_snapshot(
+    request: Request,
+    window: DateWindow = Depends(),
+    sections: Optional[str] = Query(None, description=f"comma-separated, any of {', '.join(snapshot.SECTIONS)}; default all"),
+    roi_limit: Optional[int] = Query(None, alias="roiLimit", ge=1, description="first N vehicles (by id) in roi"),
+    top: int = Query(5, ge=1, le=MAX_PAGE_SIZE, description="vehicles in topRoi"),
+    format: Literal["rows", "columns"] = Query("rows", description="columns: list sections as one array per field"),
+    idle_days: int = Depends(idle_days_param),
+):
     """
-    Generate and return a downloadable PDF fleet health & financial audit report.
+    The FinancialAnalytics dashboard in one request: the chosen sections,
+    all derived from one read of the per-vehicle totals in one consistent
+    snapshot (see snapshot.py). `from` / `to` narrow the totals and
+    `idleDays` sets the dead-stock threshold, as on the individual endpoints.
     """
-    vehicles = db.query(Vehicle).all()
-    buf = io.BytesIO()
-    doc = SimpleDocTemplate(
-        buf,
-        pagesize=landscape(A4),
-        rightMargin=1.5*cm, leftMargin=1.5*cm,
-        topMargin=1.5*cm, bottomMargin=1.5*cm,
-    )
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle('title', fontSize=16, fontName='Helvetica-Bold',
-                                 alignment=TA_CENTER, spaceAfter=6)
-    sub_style   = ParagraphStyle('sub', fontSize=9, fontName='Helvetica',
-                                 alignment=TA_CENTER, textColor=colors.grey, spaceAfter=12)
-
-    elements = [
-        Paragraph("FleetFlow — Fleet Audit Report", title_style),
-        Paragraph(f"Generated on {datetime.date.today().strftime('%d %B %Y')}", sub_style),
-        Spacer(1, 0.3*cm),
-    ]
-
-    # Table header
-    header = ["Vehicle", "Plate", "Status", "Odo (km)", "Acq. Cost (₹)",
-              "Revenue (₹)", "Maint. (₹)", "Fuel (₹)", "Net Profit (₹)", "ROI %"]
-    table_data = [header]
-
-    total_rev = total_maint = total_fuel = total_net = 0
-
-    for v in vehicles:
-        d = _compute_roi(v.id, v, db)
-        table_data.append([
-            v.nameModel, v.licensePlate, v.status,
-            f"{v.odometer:,.0f}",
-            f"{v.acquisitionCost:,.0f}",
-            f"{d['totalRevenue']:,.0f}",
-            f"{d['totalMaintenanceCost']:,.0f}",
-            f"{d['totalFuelCost']:,.0f}",
-            f"{d['netProfit']:,.0f}",
-            f"{d['roiPercent']:.2f}%",
-        ])
-        total_rev   += d['totalRevenue']
-        total_maint += d['totalMaintenanceCost']
-        total_fuel  += d['totalFuelCost']
-        total_net   += d['netProfit']
-
-    # Totals row
-    table_data.append([
-        "TOTALS", "", "", "", "",
-        f"{total_rev:,.0f}",
-        f"{total_maint:,.0f}",
-        f"{total_fuel:,.0f}",
-        f"{total_net:,.0f}", "",
-    ])
-
-    col_widths = [4.5*cm, 2.8*cm, 2.2*cm, 2.2*cm, 3.0*cm, 3.0*cm, 2.8*cm, 2.8*cm, 3.0*cm, 2.0*cm]
-    t = Table(table_data, colWidths=col_widths, repeatRows=1)
-
-    t.setStyle(TableStyle([
-        # Header
-        ('BACKGROUND',   (0, 0), (-1, 0), colors.HexColor('#161b22')),
-        ('TEXTCOLOR',    (0, 0), (-1, 0), colors.HexColor('#58a6ff')),
-        ('FONTNAME',     (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE',     (0, 0), (-1, 0), 8),
-        ('ALIGN',        (0, 0), (-1, 0), 'CENTER'),
-        # Body
-        ('FONTSIZE',     (0, 1), (-1, -2), 8),
-        ('ALIGN',        (3, 1), (-1, -2), 'RIGHT'),
-        ('TEXTCOLOR',    (0, 1), (-1, -2), colors.HexColor('#e6edf3')),
-        ('BACKGROUND',   (0, 1), (-1, -2), colors.HexColor('#0d1117')),
-        ('ROWBACKGROUNDS',(0, 1), (-1, -2), [colors.HexColor('#0d1117'), colors.HexColor('#1c2333')]),
-        ('GRID',         (0, 0), (-1, -1), 0.25, colors.HexColor('#30363d')),
-        # Totals row
-        ('BACKGROUND',   (0, -1), (-1, -1), colors.HexColor('#21262d')),
-        ('FONTNAME',     (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('TEXTCOLOR',    (0, -1), (-1, -1), colors.HexColor('#e3b341')),
-        ('FONTSIZE',     (0, -1), (-1, -1), 8),
-        ('ALIGN',        (3, -1), (-1, -1), 'RIGHT'),
-    ]))
-    elements.append(t)
-    doc.build(elements)
-
-    buf.seek(0)
-    return StreamingResponse(
-        buf,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=fleetflow_audit_{datetime.date.today()}.pdf"},
-    )
-
-
-# ── GET /analytics/export-payroll ─────────────────────────────────────────────
-@router.get("/export-payroll")
-def export_payroll(db: Session = Depends(get_db)):
+    chosen = set(csv_param(sections)) or set(snapshot.SECTIONS)
+    unknown = chosen - set(snapshot.SECTIONS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown sections: {', '.join(sorted(unknown))}")
+
+    async def compute():
+        now = datetime.datetime.now()
+        results = await fetch_snapshot(*snapshot.snapshot_statements(chosen, window.start, window.end, idle_days))
+        payload = snapshot.build_snapshot(results, chosen, now, roi_limit, top, idle_days)
+        if format == "columns":
+            payload = {name: columns_of(v) if isinstance(v, list) else v for name, v in payload.items()}
+        return payload
+
+    return await cached_json(request, "snapshot", compute)
+
+
+# ── GET /analytics/timeseries ────────────────────────────────────────────────
+@router.get("/timeseries", dependencies=[Depends(fresh_rollups)])
+async def get_timeseries(
+    request: Request,
+    bucket: Literal["day", "week", "month"] = "day",
+    vehicle_id: Optional[int] = Query(None, alias="vehicleId", description="default: fleet-wide"),
+    window: DateWindow = Depends(),
+):
+    """
+    Revenue, fuel cost, maintenance cost and completed trips per day, ISO
+    week or calendar month. The window is widened to whole buckets and
+    defaults to the last 30 days / 12 weeks / 12 months.
     """
-    Monthly Driver Payroll & Performance Report — CSV download.
-    Columns: Driver Name, Total Trips, Completed Trips, Completion Rate (%),
-             Revenue Generated (₹), Avg Safety Score, License Expiry, Status.
+    end = window.end or datetime.date.today()
+    start = window.start or timeseries.default_window(bucket, end)[0]
+    if start > end:
+        raise HTTPException(status_code=400, detail="from must not be after to")
+    starts = timeseries.bucket_starts(bucket, start, end)
+    if len(starts) > timeseries.MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"At most {timeseries.MAX_BUCKETS} buckets per request")
+
+    async def compute():
+        series = await timeseries.fetch_series(bucket, starts, vehicle_id)
+        return {
+            "bucket": bucket, "vehicleId": vehicle_id,
+            "from": series[0]["start"], "to": series[-1]["end"],
+            "series": series,
+        }
+
+    return await cached_json(request, "timeseries", compute)
+
+
+# ── POST /analytics/cache/invalidate ─────────────────────────────────────────
+class Invalidation(BaseModel):
+    vehicleIds: List[int] = []
+    driverIds:  List[int] = []
+    tripIds:    List[int] = []
+
+
+@router.post("/cache/invalidate")
+def invalidate_cache(
+    payload: Optional[Invalidation] = None,
+    x_analytics_token: Optional[str] = Header(default=None),
+):
+    """
+    Called by backend-core after trip / expense / maintenance writes.
+    Drops cached responses and queues the touched vehicles / drivers for
+    the next rollup refresh. Requires X-Analytics-Token to match
+    ANALYTICS_INVALIDATE_TOKEN; without a configured token every call is
+    refused unless ANALYTICS_INVALIDATE_ALLOW_ANONYMOUS=1 (local development).
+    """
+    expected = os.getenv("ANALYTICS_INVALIDATE_TOKEN")
+    if not expected:
+        if os.getenv("ANALYTICS_INVALIDATE_ALLOW_ANONYMOUS") != "1":
+            raise HTTPException(status_code=403, detail="ANALYTICS_INVALIDATE_TOKEN is not configured")
+    elif not hmac.compare_digest((x_analytics_token or "").encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="Invalid analytics token")
+    payload = payload or Invalidation()
+    response_cache.invalidate()
+    mark_dirty(payload.vehicleIds, payload.driverIds, payload.tripIds)
+    live.broadcaster.notify(payload.vehicleIds)
+    return {"status": "invalidated"}
+
+
+# ── GET /analytics/stream ────────────────────────────────────────────────────
+@router.get("/stream")
+async def stream_updates(last_event_id: Optional[int] = Header(None, alias="Last-Event-ID")):
+    """
+    Server-Sent Events: the current `kpis` (summary and top ROI), then a
+    `kpis` or `roi` event whenever trips, expenses or maintenance change
+    them. One shared computation per change serves every stream (see live.py).
     """
-    drivers = db.query(Driver).all()
-    output  = io.StringIO()
-    writer  = csv.writer(output)
-
-    writer.writerow([
-        "Driver ID", "Driver Name", "Status",
-        "Total Trips", "Completed Trips", "Completion Rate (%)",
-        "Revenue Generated (₹)", "Avg Safety Score",
-        "License Expiry Date", "License Status",
-    ])
-
-    for d in drivers:
-        total_trips     = db.query(Trip).filter(Trip.driverId == d.id).count()
-        completed_trips = db.query(Trip).filter(
-            Trip.driverId == d.id,
-            Trip.status   == TripStatus.COMPLETED,
-        ).count()
-
-        completion_rate = round((completed_trips / total_trips) * 100, 1) if total_trips > 0 else 0
-
-        revenue_generated = db.query(func.sum(Trip.revenue)).filter(
-            Trip.driverId == d.id,
-            Trip.status   == TripStatus.COMPLETED,
-        ).scalar() or 0
-
-        license_status = "EXPIRED" if d.licenseExpiryDate and d.licenseExpiryDate < datetime.datetime.now() else "VALID"
-        expiry_str     = d.licenseExpiryDate.strftime("%d-%m-%Y") if d.licenseExpiryDate else "N/A"
-
-        writer.writerow([
-            d.id, d.name, d.status,
-            total_trips, completed_trips, f"{completion_rate}%",
-            round(float(revenue_generated), 2), d.safetyScore,
-            expiry_str, license_status,
-        ])
-
-    output.seek(0)
-    filename = f"fleetflow_payroll_{datetime.date.today()}.csv"
     return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename={filename}"},
+        live.broadcaster.stream(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-
@@ -0,0 +1,108 @@
+"""
+Report downloads and report jobs: the fleet audit (CSV and PDF) and the
+driver payroll CSV. Rendering lives in reports.py; PDFs are built by the
+report-job workers (report_jobs.py), so this module never loads ReportLab.
+"""
+import datetime
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.orm import Session
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from rollups import get_fresh_db, fresh_rollups
+from reports import REPORT_KINDS, audit_csv, payroll_csv
+from routers.analytics import DateWindow
+import report_jobs
+
+router = APIRouter(prefix="/analytics", tags=["reports"])
+
+
+# ── GET /analytics/export ────────────────────────────────────────────────────
+@router.get("/export", dependencies=[Depends(fresh_rollups)])
+def export_fleet_audit():
+    """
+    Stream a downloadable CSV of the fleet health & financial audit.
+    """
+    return StreamingResponse(
+        audit_csv(),
+        media_type="text/csv",
+        headers={"Content-Disposition": "attachment; filename=fleetflow_audit.csv"},
+    )
+
+
+# ── GET /analytics/export-pdf ─────────────────────────────────────────────────
+@router.get("/export-pdf")
+async def export_fleet_pdf(db: Session = Depends(get_fresh_db)):
+    """
+    Generate and return a downloadable PDF fleet health & financial audit report.
+    Rendering runs as a report job; this waits for it (see POST /analytics/reports).
+    """
+    meta = await run_in_threadpool(report_jobs.submit, db, "audit-pdf")
+    meta = await report_jobs.wait(meta["id"])
+    if meta is None or meta["status"] != "done":
+        raise HTTPException(status_code=500, detail="PDF report failed")
+    return FileResponse(
+        report_jobs.artifact_path(meta),
+        media_type="application/pdf",
+        filename=f"fleetflow_audit_{datetime.date.today()}.pdf",
+    )
+
+
+# ── GET /analytics/export-payroll ─────────────────────────────────────────────
+@router.get("/export-payroll", dependencies=[Depends(fresh_rollups)])
+def export_payroll(window: DateWindow = Depends()):
+    """
+    Driver Payroll & Performance Report — CSV download. Lifetime trip
+    totals unless `from` / `to` select a pay period (e.g. one month).
+    Columns: Driver Name, Total Trips, Completed Trips, Completion Rate (%),
+             Revenue Generated (₹), Avg Safety Score, License Expiry, Status.
+    """
+    period = "_".join(str(d) for d in (window.start, window.end) if d) or datetime.date.today()
+    filename = f"fleetflow_payroll_{period}.csv"
+    return StreamingResponse(
+        payroll_csv(window.start, window.end),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+# ── Report jobs ───────────────────────────────────────────────────────────────
+class ReportRequest(BaseModel):
+    kind: Literal["audit-pdf", "audit-csv", "payroll-csv"]
+
+
+@router.post("/reports", status_code=202)
+def create_report(payload: ReportRequest, db: Session = Depends(get_fresh_db)):
+    """
+    Queue a report render and return its job. Identical requests within the
+    same data window get the existing job back.
+    """
+    return report_jobs.describe(report_jobs.submit(db, payload.kind))
+
+
+@router.get("/reports/{job_id}")
+def get_report(job_id: str):
+    """Status of a report job; `downloadUrl` is set once it is done."""
+    meta = report_jobs.read_meta(job_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return report_jobs.describe(meta)
+
+
+@router.get("/reports/{job_id}/file")
+def download_report(job_id: str):
+    """Stream a finished report."""
+    meta = report_jobs.read_meta(job_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    if meta["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Report is {meta['status']}")
+    media_type, prefix, ext = REPORT_KINDS[meta["kind"]]
+    created = datetime.date.fromtimestamp(meta["createdAt"])
+    return FileResponse(
+        report_jobs.artifact_path(meta),
+        media_type=media_type,
+        filename=f"{prefix}_{created}.{ext}",
+    )
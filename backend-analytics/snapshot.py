@@ -0,0 +1,113 @@
+"""
+Everything the FinancialAnalytics page shows, from one read of the fleet.
+
+GET /analytics/snapshot serves the dashboard sections that otherwise take
+four requests (summary, all-roi, fuel-efficiency, dead-stock), each
+aggregating every vehicle again. Here `vehicle_totals_query()` runs once and
+every section is derived from its rows:
+
+* summary    vehicle counts, fleet totals and the dead-stock count come from
+             the per-vehicle rows; open trips and driver figures are two
+             small extra statements
+* roi        `roi_row()` per vehicle, by id (the first `roi_limit`)
+* topRoi     the `top` vehicles by ROI, best first
+* fuel       `fuel_row()` per vehicle, best km/L first
+* deadStock  AVAILABLE vehicles idle for `idle_days` (see `dead_stock_criteria`),
+             most idle first
+
+All statements run in one consistent-snapshot transaction
+(`database.fetch_snapshot`), so the sections agree with each other even
+while backend-core is writing. A summary-only snapshot runs the summary's
+own aggregate statements instead of reading every vehicle.
+"""
+import datetime
+import heapq
+import math
+from collections import Counter
+
+from aggregates import (
+    DEAD_STOCK_DAYS, EPOCH, vehicle_totals_query, roi_row, fuel_row, dead_stock_row,
+    idle_cutoff, km_per_liter, open_trip_counts_query, driver_scalars_query, fleet_summary_statements,
+    build_fleet_summary, summary_payload,
+)
+from models import VehicleStatus
+
+SECTIONS = ("summary", "roi", "topRoi", "fuel", "deadStock")
+
+
+def snapshot_statements(
+    sections: set, start: datetime.date = None, end: datetime.date = None, idle_days: int = DEAD_STOCK_DAYS,
+) -> list:
+    if sections == {"summary"}:
+        return fleet_summary_statements(start, end, idle_days)
+    return [vehicle_totals_query(start, end), open_trip_counts_query(), driver_scalars_query()]
+
+
+def _roi_key(t) -> float:
+    """`aggregates.roi_percent_expr` in Python: unrounded ROI, 0 without an acquisition cost."""
+    if not t["acquisitionCost"]:
+        return 0
+    net = float(t["totalRevenue"]) - float(t["totalMaintenanceCost"]) - float(t["totalFuelCost"])
+    return net * 100 / float(t["acquisitionCost"])
+
+
+def _km_per_liter_key(t) -> float:
+    """`aggregates.km_per_liter_expr` in Python: unrounded km/L, 0 without fuel logged."""
+    return km_per_liter(t) or 0
+
+
+def idle_vehicles(vehicles: list, now: datetime.datetime, idle_days: int = DEAD_STOCK_DAYS) -> list:
+    """The rows of `vehicles` that `dead_stock_criteria` selects, as of `now`."""
+    cutoff = idle_cutoff(now, idle_days)
+    return [
+        t for t in vehicles
+        if t["status"] == VehicleStatus.AVAILABLE and (t["lastTripEnd"] is None or t["lastTripEnd"] < cutoff)
+    ]
+
+
+def summary_from_vehicles(
+    vehicles: list, trip_rows: list, drivers, now: datetime.datetime, idle_days: int = DEAD_STOCK_DAYS,
+) -> dict:
+    """The summary payload from `vehicle_totals_query()` rows plus the open-trip and driver results."""
+    return summary_payload(
+        vehicle_counts=Counter(t["status"] for t in vehicles),
+        open_trips={row["status"]: row["n"] for row in trip_rows},
+        drivers=drivers,
+        totals={
+            "totalRevenue":         math.fsum(float(t["totalRevenue"]) for t in vehicles),
+            "completedTrips":       sum(int(t["completedTrips"]) for t in vehicles),
+            "totalFuelCost":        math.fsum(float(t["totalFuelCost"]) for t in vehicles),
+            "totalMaintenanceCost": math.fsum(float(t["totalMaintenanceCost"]) for t in vehicles),
+        },
+        dead_stock_count=len(idle_vehicles(vehicles, now, idle_days)),
+    )
+
+
+def top_roi(vehicles, top: int) -> list:
+    """ROI payloads of the `top` vehicles by ROI, best first, ties by id."""
+    return [roi_row(t) for t in heapq.nsmallest(top, vehicles, key=lambda t: (-_roi_key(t), t["vehicleId"]))]
+
+
+def build_snapshot(
+    results: list, sections: set, now: datetime.datetime,
+    roi_limit: int = None, top: int = 5, idle_days: int = DEAD_STOCK_DAYS,
+) -> dict:
+    """The snapshot payload from the results of `snapshot_statements(sections, ...)`."""
+    if sections == {"summary"}:
+        return {"summary": build_fleet_summary(results)}
+
+    vehicles, trip_rows, (drivers,) = results
+    payload = {}
+    if "summary" in sections:
+        payload["summary"] = summary_from_vehicles(vehicles, trip_rows, drivers, now, idle_days)
+    if "roi" in sections:
+        payload["roi"] = [roi_row(t) for t in vehicles[:roi_limit]]
+    if "topRoi" in sections:
+        payload["topRoi"] = top_roi(vehicles, top)
+    if "fuel" in sections:
+        ranked = sorted(vehicles, key=lambda t: (-_km_per_liter_key(t), t["vehicleId"]))
+        payload["fuel"] = [fuel_row(t) for t in ranked]
+    if "deadStock" in sections:
+        idle = sorted(idle_vehicles(vehicles, now, idle_days), key=lambda t: (t["lastTripEnd"] or EPOCH, t["vehicleId"]))
+        payload["deadStock"] = [dead_stock_row(t, now) for t in idle]
+    return payload
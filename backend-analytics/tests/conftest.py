@@ -0,0 +1,74 @@
+"""
+Shared fixtures for the analytics tests.
+
+Tests run against temporary SQLite files seeded by benchmarks.datagen, the
+stand-in the benchmarks use for MySQL. The response cache is off and the
+rollups are refreshed only on a test's first request, so every measured
+request does its own work. `use_database` points the service at a seeded
+file (and optional replicas) by resetting the lazily created engines.
+"""
+import os
+
+os.environ.update(
+    DATABASE_URL="sqlite://",
+    DB_MODE="sync",
+    ANALYTICS_CACHE_URL="none",
+    ANALYTICS_WARMUP="0",
+    ANALYTICS_SLOW_REQUEST_MS="0",
+    ROLLUP_MAX_STALENESS_SECONDS="36000",
+)
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import database
+import models  # noqa: F401  (registers every table on Base.metadata)
+import rollups
+import timeseries
+from benchmarks.datagen import generate
+from cache import response_cache
+
+
+@pytest.fixture(scope="session")
+def fleet(tmp_path_factory):
+    """`fleet(vehicles, trips)`: the path of a seeded SQLite file with built rollups, one per size."""
+    seeded = {}
+
+    def seed(vehicles: int, trips: int) -> str:
+        if (vehicles, trips) not in seeded:
+            path = str(tmp_path_factory.mktemp("fleet") / f"fleet-{vehicles}-{trips}.db")
+            engine = create_engine(f"sqlite:///{path}")
+            database.Base.metadata.create_all(engine)
+            generate(engine, vehicles, trips, seed=vehicles)
+            with Session(engine) as db:
+                rollups.rebuild(db)
+            engine.dispose()
+            seeded[(vehicles, trips)] = path
+        return seeded[(vehicles, trips)]
+
+    return seed
+
+
+def _reset_engines():
+    for e in database._named_engines(dict(database._engines)).values():
+        e.dispose()
+    database._engines.clear()
+    database._pool_events.clear()
+
+
+@pytest.fixture
+def use_database(monkeypatch):
+    """`use_database(path, replicas=())`: serve from the SQLite file at `path`, reading from `replicas`."""
+
+    def use(path: str, replicas=()):
+        _reset_engines()
+        monkeypatch.setattr(database, "DATABASE_URL", f"sqlite:///{path}")
+        monkeypatch.setattr(database, "REPLICA_URLS", [f"sqlite:///{r}" for r in replicas])
+        monkeypatch.setattr(rollups, "_last_refresh", float("-inf"))
+        monkeypatch.setattr(timeseries, "closed_buckets", timeseries.ClosedBuckets())
+        response_cache.invalidate()
+
+    yield use
+    _reset_engines()
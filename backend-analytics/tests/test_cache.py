@@ -0,0 +1,83 @@
+"""Response cache invalidation and conditional requests."""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from cache import LRUCache, ResponseCache, etag_matches
+from main import app
+
+INVALIDATE = "/analytics/cache/invalidate"
+
+
+@pytest.fixture
+def client(fleet, use_database):
+    use_database(fleet(50, 250))
+    return TestClient(app)
+
+
+def test_invalidate_refused_without_a_configured_token(client, monkeypatch):
+    monkeypatch.delenv("ANALYTICS_INVALIDATE_TOKEN", raising=False)
+    monkeypatch.delenv("ANALYTICS_INVALIDATE_ALLOW_ANONYMOUS", raising=False)
+    assert client.post(INVALIDATE, json={}).status_code == 403
+    assert client.post(INVALIDATE, json={}, headers={"X-Analytics-Token": ""}).status_code == 403
+
+
+def test_invalidate_anonymous_when_allowed(client, monkeypatch):
+    monkeypatch.delenv("ANALYTICS_INVALIDATE_TOKEN", raising=False)
+    monkeypatch.setenv("ANALYTICS_INVALIDATE_ALLOW_ANONYMOUS", "1")
+    assert client.post(INVALIDATE, json={}).status_code == 200
+
+
+def test_invalidate_checks_the_token(client, monkeypatch):
+    monkeypatch.setenv("ANALYTICS_INVALIDATE_TOKEN", "s3cret")
+    monkeypatch.setenv("ANALYTICS_INVALIDATE_ALLOW_ANONYMOUS", "1")  # ignored once a token is set
+    assert client.post(INVALIDATE, json={}).status_code == 403
+    assert client.post(INVALIDATE, json={}, headers={"X-Analytics-Token": "wrong"}).status_code == 403
+    response = client.post(INVALIDATE, json={"vehicleIds": [1]}, headers={"X-Analytics-Token": "s3cret"})
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("header, matches", [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", W/"abc"', True),
+    ('"x",W/"abc" , "y"', True),
+    ("*", True),
+    ('"ab"', False),
+    ('"abcd"', False),
+    ('W/"x"', False),
+    ("", False),
+])
+def test_etag_matches(header, matches):
+    assert etag_matches('"abc"', header) is matches
+    assert etag_matches('W/"abc"', header) is matches
+
+
+def test_conditional_get(client):
+    first = client.get("/analytics/all-roi", headers={"Accept-Encoding": "gzip"})
+    etag = first.headers["etag"]
+    assert etag.startswith("W/")  # compressed
+    for header in (etag, etag.removeprefix("W/"), f'"other", {etag}', "*"):
+        assert client.get("/analytics/all-roi", headers={"If-None-Match": header}).status_code == 304
+    assert client.get("/analytics/all-roi", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_fill_started_before_an_invalidation_is_not_stored():
+    cache = ResponseCache(LRUCache())
+
+    async def run():
+        async def compute():
+            cache.invalidate()  # lands while this result is being computed
+            return {"stale": True}
+
+        await cache.get_or_compute("/analytics/summary", 15, compute)
+        assert cache.backend.get("/analytics/summary") is None
+
+        async def fresh():
+            return {"stale": False}
+
+        etag, body = await cache.get_or_compute("/analytics/summary", 15, fresh)
+        assert cache.backend.get("/analytics/summary") == (etag, body)
+
+    asyncio.run(run())
@@ -0,0 +1,29 @@
+"""Large JSON responses go out as br when the client accepts it, gzip otherwise."""
+import pytest
+from fastapi.testclient import TestClient
+
+import compression
+from main import app
+
+
+@pytest.fixture
+def client(fleet, use_database):
+    use_database(fleet(50, 250))
+    return TestClient(app)
+
+
+@pytest.mark.skipif(compression.brotli is None, reason="brotli is not installed")
+def test_brotli_when_accepted(client):
+    plain = client.get("/analytics/all-roi", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    response = client.get("/analytics/all-roi", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.json() == plain.json()
+
+
+def test_gzip_without_brotli(client, monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    plain = client.get("/analytics/all-roi", headers={"Accept-Encoding": "identity"})
+    response = client.get("/analytics/all-roi", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json() == plain.json()
@@ -0,0 +1,75 @@
+"""
+The audit and payroll CSV exports stream: peak memory while serving one
+stays under the same bound at 1k and at 20k trips.
+"""
+import asyncio
+import tracemalloc
+
+import pytest
+
+import reports
+from main import app
+
+SIZES = [(100, 1_000), (2_000, 20_000)]  # (vehicles, trips)
+BATCH_ROWS = 25  # small enough that both sizes stream several batches
+PEAK_BOUND_BYTES = 512 * 1024
+
+
+async def _stream(path: str) -> int:
+    """
+    GET `path` from the app and return the body size. Chunks are dropped as
+    they are sent; httpx's ASGITransport would collect the whole body first.
+    """
+    received = 0
+    status = None
+    requested, done = False, asyncio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal received, status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            received += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                done.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"test")], "client": ("127.0.0.1", 1), "server": ("test", 80),
+    }
+    await app(scope, receive, send)
+    assert status == 200
+    return received
+
+
+def _peak(path: str) -> tuple:
+    asyncio.run(_stream(path))  # refreshes the rollups and warms statement caches
+    tracemalloc.start()
+    try:
+        size = asyncio.run(_stream(path))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return size, peak
+
+
+@pytest.mark.parametrize("path", ["/analytics/export", "/analytics/export-payroll"])
+def test_csv_export_memory_does_not_grow_with_size(path, fleet, use_database, monkeypatch):
+    monkeypatch.setattr(reports, "CSV_BATCH_ROWS", BATCH_ROWS)
+    results = []
+    for vehicles, trips in SIZES:
+        use_database(fleet(vehicles, trips))
+        results.append(_peak(path))
+    (small_size, small_peak), (large_size, large_peak) = results
+    assert large_size > 10 * small_size
+    assert small_peak < PEAK_BOUND_BYTES
+    assert large_peak < PEAK_BOUND_BYTES, f"{path}: peak {large_peak} bytes for a {large_size}-byte CSV"
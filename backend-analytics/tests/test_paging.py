@@ -0,0 +1,42 @@
+"""`fields=` is checked against each endpoint's payload keys, with or without rows, on either path."""
+import pytest
+from fastapi.testclient import TestClient
+
+import columnar
+from aggregates import DEAD_STOCK_FIELDS, FUEL_FIELDS, ROI_FIELDS
+from main import app
+
+ENDPOINTS = {
+    "all-roi": ROI_FIELDS,
+    "fuel-efficiency": FUEL_FIELDS,
+    "dead-stock": DEAD_STOCK_FIELDS,
+}
+PATHS = [False, pytest.param(True, marks=pytest.mark.skipif(columnar.np is None, reason="numpy is not installed"))]
+
+
+@pytest.fixture
+def client(fleet, use_database):
+    use_database(fleet(50, 250))
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("columns", PATHS)
+@pytest.mark.parametrize("endpoint", ENDPOINTS)
+@pytest.mark.parametrize("ids", ["", "&ids=999999"])  # with rows, and an empty page
+def test_unknown_fields_are_rejected(client, endpoint, ids, columns, monkeypatch):
+    monkeypatch.setattr(columnar, "ENABLED", columns)
+    response = client.get(f"/analytics/{endpoint}?idleDays=0&fields=vehicleId,bogus{ids}")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown fields: bogus"
+
+
+@pytest.mark.parametrize("columns", PATHS)
+@pytest.mark.parametrize("endpoint", ENDPOINTS)
+def test_payload_fields_name_every_key(client, endpoint, columns, monkeypatch):
+    monkeypatch.setattr(columnar, "ENABLED", columns)
+    items = client.get(f"/analytics/{endpoint}?idleDays=0").json()
+    assert items
+    assert all(tuple(item) == ENDPOINTS[endpoint] for item in items)
+
+    everything = ",".join(ENDPOINTS[endpoint])
+    assert client.get(f"/analytics/{endpoint}?ids=999999&fields={everything}").json() == []
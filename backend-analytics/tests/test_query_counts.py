@@ -0,0 +1,47 @@
+"""
+The list, summary and export endpoints issue the same number of SQL
+statements whatever the fleet size: no per-vehicle or per-driver queries.
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import database
+from main import app
+
+SIZES = [(50, 250), (500, 2500)]  # (vehicles, trips)
+
+
+def _statements(endpoint: str) -> int:
+    """SQL statements one GET of `endpoint` issues, after a first GET has refreshed the rollups."""
+    client = TestClient(app)
+    client.get(endpoint).raise_for_status()
+
+    statements = 0
+
+    def count(*_):
+        nonlocal statements
+        statements += 1
+
+    engine = database.engines()["engine"]
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        response = client.get(endpoint)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    response.raise_for_status()
+    assert response.content
+    return statements
+
+
+@pytest.mark.parametrize("endpoint", [
+    "/analytics/all-roi", "/analytics/fuel-efficiency", "/analytics/summary", "/analytics/export",
+])
+def test_statement_count_does_not_grow_with_fleet(endpoint, fleet, use_database):
+    counts = []
+    for vehicles, trips in SIZES:
+        use_database(fleet(vehicles, trips))
+        counts.append(_statements(endpoint))
+    assert counts[0] > 0
+    assert counts[0] == counts[1], f"{endpoint}: {counts[0]} statements at {SIZES[0][0]} vehicles, " \
+                                   f"{counts[1]} at {SIZES[1][0]}"
@@ -0,0 +1,111 @@
+"""
+Read-replica routing on two local database instances: the seeded SQLite
+primary and byte-for-byte copies of it as replicas, each file with its own
+pool. A replica URL whose directory does not exist refuses connections.
+"""
+import datetime
+import shutil
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert
+
+import database
+import rollups
+from main import app
+from models import Expense
+
+ENDPOINTS = ["/analytics/summary", "/analytics/all-roi", "/analytics/fuel-efficiency", "/analytics/dead-stock"]
+REPEATS = 4
+
+
+def _serve(client) -> dict:
+    """Bodies of REPEATS rounds over ENDPOINTS, checking every round returns the same."""
+    bodies = {}
+    for _ in range(REPEATS):
+        for endpoint in ENDPOINTS:
+            response = client.get(endpoint)
+            response.raise_for_status()
+            assert bodies.setdefault(endpoint, response.content) == response.content
+    return bodies
+
+
+def _checkouts() -> dict:
+    return {label: n for (label, kind), n in database._pool_events.items() if kind == "checkout"}
+
+
+@pytest.fixture(autouse=True)
+def no_read_your_writes(monkeypatch):
+    """Routing scenarios read from the replicas right after their first refresh."""
+    monkeypatch.setattr(database, "READ_YOUR_WRITES_SECONDS", 0)
+
+
+@pytest.fixture
+def databases(fleet, tmp_path):
+    """(primary, replica, unreachable replica) paths; the replica is a copy of the primary."""
+    primary = tmp_path / "primary.db"
+    shutil.copyfile(fleet(200, 1000), primary)
+    replica = tmp_path / "replica.db"
+    shutil.copyfile(primary, replica)
+    return str(primary), str(replica), str(tmp_path / "missing" / "replica.db")
+
+
+def _run(use_database, primary: str, replicas=()) -> tuple:
+    """Serve every endpoint from `primary` with `replicas`; (bodies, checkouts by pool, failovers)."""
+    use_database(primary, replicas)
+    rollups.ensure_fresh()
+    database._pool_events.clear()
+    bodies = _serve(TestClient(app))
+    return bodies, _checkouts(), database.engines()["read_router"].failovers
+
+
+READS = REPEATS * len(ENDPOINTS)  # one pooled connection per request
+
+
+def test_round_robin(databases, use_database):
+    primary, replica, _ = databases
+    expected, _, _ = _run(use_database, primary)
+    bodies, checkouts, failovers = _run(use_database, primary, [replica, replica])
+    assert bodies == expected
+    assert checkouts == {"replica-1": READS // 2, "replica-2": READS // 2}
+    assert failovers == 0
+
+
+def test_one_replica_down(databases, use_database):
+    primary, replica, unreachable = databases
+    expected, _, _ = _run(use_database, primary)
+    bodies, checkouts, failovers = _run(use_database, primary, [replica, unreachable])
+    assert bodies == expected
+    assert checkouts == {"replica-1": READS}
+    assert failovers == 1  # then skipped for DB_REPLICA_RETRY_SECONDS
+
+
+def test_all_replicas_down(databases, use_database):
+    primary, _, unreachable = databases
+    expected, _, _ = _run(use_database, primary)
+    bodies, checkouts, failovers = _run(use_database, primary, [unreachable])
+    assert bodies == expected
+    assert checkouts == {"primary": READS}
+    assert failovers == 1
+
+
+def test_reads_follow_writes_to_the_primary(databases, use_database, monkeypatch):
+    primary, replica, _ = databases
+    monkeypatch.setattr(database, "READ_YOUR_WRITES_SECONDS", 60)
+    use_database(primary, [replica])
+    client = TestClient(app)
+    before = client.get("/analytics/summary").json()["financials"]["totalFuelCost"]
+
+    # Fuel logged on the primary that the replica has not replayed yet,
+    # then what POST /analytics/cache/invalidate does for it.
+    engine = create_engine(f"sqlite:///{primary}")
+    with engine.begin() as conn:
+        conn.execute(insert(Expense).values(vehicleId=1, fuelLiters=100, fuelCost=50_000,
+                                            date=datetime.datetime.now()))
+    engine.dispose()
+    rollups.mark_dirty([1])
+
+    database._pool_events.clear()
+    after = client.get("/analytics/summary").json()["financials"]["totalFuelCost"]
+    assert after == pytest.approx(before + 50_000)
+    assert "replica-1" not in _checkouts()
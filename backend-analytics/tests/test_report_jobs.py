@@ -0,0 +1,32 @@
+"""A report worker that dies does not take later jobs down with it."""
+import asyncio
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import database
+import report_jobs
+
+
+def test_jobs_run_after_a_worker_crash(fleet, tmp_path, use_database, monkeypatch):
+    path = fleet(50, 250)
+    use_database(path)
+    reports_dir = str(tmp_path / "reports")
+    # Spawned workers read both from their environment.
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{path}")
+    monkeypatch.setenv("REPORTS_DIR", reports_dir)
+    monkeypatch.setattr(report_jobs, "REPORTS_DIR", reports_dir)
+    monkeypatch.setattr(report_jobs, "REPORT_WORKERS", 1)
+    monkeypatch.setattr(report_jobs, "_pool", None)
+    try:
+        crashed = report_jobs._get_pool().submit(os._exit, 1)
+        with pytest.raises(BrokenProcessPool):
+            crashed.result(timeout=60)
+
+        with database.SessionLocal() as db:
+            meta = report_jobs.submit(db, "audit-csv")
+        assert meta["status"] == "queued"
+        assert asyncio.run(report_jobs.wait(meta["id"]))["status"] == "done"
+    finally:
+        report_jobs.shutdown()
@@ -0,0 +1,45 @@
+"""The chunked audit PDF renders one snapshot, whatever commits while it is built."""
+import io
+import shutil
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+from pypdf import PdfReader
+
+import reports
+import rollups
+
+
+def _cells(pdf: bytes) -> list:
+    """Table cells of `pdf` in order, without the title line and the header repeated on every page."""
+    header = {cell.replace("₹", "") for cell in reports.AUDIT_PDF_HEADER}
+    lines = [line for page in PdfReader(io.BytesIO(pdf)).pages for line in page.extract_text().splitlines()]
+    return [line for line in lines[1:] if line.replace("■", "") not in header]
+
+
+def test_chunked_audit_pdf_renders_one_snapshot(fleet, tmp_path, use_database, monkeypatch):
+    path = str(tmp_path / "fleet.db")
+    shutil.copyfile(fleet(50, 250), path)
+    with sqlite3.connect(path) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")  # readers keep their snapshot while others commit
+    use_database(path)
+    rollups.ensure_fresh()
+
+    single = io.BytesIO()
+    reports.build_audit_pdf(single, large=False)
+
+    class RefreshingPool(ProcessPoolExecutor):
+        """Commits new rollups each time a chunk is handed to a worker."""
+
+        def submit(self, fn, *args, **kwargs):
+            with sqlite3.connect(path) as conn:
+                conn.execute("UPDATE vehicle_rollups SET totalRevenue = totalRevenue + 1000000")
+            return super().submit(fn, *args, **kwargs)
+
+    monkeypatch.setattr(reports, "ProcessPoolExecutor", RefreshingPool)
+    monkeypatch.setattr(reports, "AUDIT_PDF_CHUNK_ROWS", 20)
+    monkeypatch.setattr(reports, "AUDIT_PDF_WORKERS", 2)
+    chunked = io.BytesIO()
+    reports.build_audit_pdf(chunked, large=True)
+
+    assert _cells(chunked.getvalue()) == _cells(single.getvalue())
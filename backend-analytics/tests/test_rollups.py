@@ -0,0 +1,163 @@
+"""
+Ids queued by `mark_dirty` (edits and deletes the high-water marks cannot
+see) are recomputed by the next refresh in any process, and stay queued when
+a refresh fails. A refresh that finds nothing new writes nothing, and one
+that does keeps the pre-aggregated fleet summary current.
+Daily buckets add up to the lifetime totals, and `data_window` only moves with
+the data.
+"""
+import datetime
+import shutil
+
+import pytest
+from sqlalchemy import create_engine, delete, event, func, select, update
+from sqlalchemy.orm import Session
+
+import database
+import efficiency
+import live
+import rollups
+from aggregates import build_fleet_summary, fleet_summary, summary_aggregate_statements
+from models import (
+    Driver, Expense, RollupDirty, Trip, TripStatus, Vehicle, VehicleDailyRollup, VehicleRollup, VehicleStatus,
+)
+
+
+@pytest.fixture
+def fleet_db(fleet, tmp_path, use_database):
+    """A private copy of a small seeded fleet, served by the app."""
+    path = str(tmp_path / "fleet.db")
+    shutil.copyfile(fleet(50, 250), path)
+    use_database(path)
+    rollups.ensure_fresh()
+    return path
+
+
+def _delete_an_expense() -> tuple:
+    """Delete one fuel expense (invisible to the marks); its vehicle id and the fuel cost removed."""
+    with database.SessionLocal() as db:
+        expense = db.execute(select(Expense).where(Expense.fuelCost > 0).limit(1)).scalar_one()
+        vehicle_id, cost = expense.vehicleId, expense.fuelCost
+        db.execute(delete(Expense).where(Expense.id == expense.id))
+        db.commit()
+    return vehicle_id, cost
+
+
+def _fuel_cost(vehicle_id: int) -> float:
+    with database.SessionLocal() as db:
+        return db.get(VehicleRollup, vehicle_id).totalFuelCost
+
+
+def test_queued_ids_survive_a_failed_refresh(fleet_db):
+    vehicle_id, cost = _delete_an_expense()
+    before = _fuel_cost(vehicle_id)
+    rollups.mark_dirty([vehicle_id])
+
+    def fail(*_args):
+        raise RuntimeError("refresh failed")
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(efficiency, "refresh_trips", fail)
+        with pytest.raises(RuntimeError):
+            rollups.refresh_now()
+    assert _fuel_cost(vehicle_id) == pytest.approx(before)
+
+    rollups.refresh_now()
+    assert _fuel_cost(vehicle_id) == pytest.approx(before - cost)
+    with database.SessionLocal() as db:
+        assert db.execute(select(RollupDirty).where(RollupDirty.refreshedAt.is_(None))).first() is None
+
+
+def test_queued_ids_reach_another_worker(fleet_db):
+    vehicle_id, cost = _delete_an_expense()
+    before = _fuel_cost(vehicle_id)
+    rollups.mark_dirty([vehicle_id])  # the invalidation reached this process...
+
+    engine = create_engine(f"sqlite:///{fleet_db}")  # ...and another one refreshes
+    with Session(engine) as db:
+        touched = rollups.refresh(db)
+    engine.dispose()
+    assert touched["vehicles"] >= 1
+    assert _fuel_cost(vehicle_id) == pytest.approx(before - cost)
+
+
+def test_live_sees_ids_queued_by_another_worker(fleet_db):
+    with database.SessionLocal() as db:
+        marks = dict(db.execute(live.marks_query()).mappings().one())
+    rollups.mark_dirty([7])
+    rollups.refresh_now()  # settled by the refresh, still visible by id
+    with database.SessionLocal() as db:
+        assert db.execute(live.marks_query()).mappings().one()["dirtyId"] != marks["dirtyId"]
+        assert 7 in set(db.execute(live.changed_vehicles_query(marks)).scalars())
+
+
+def test_fleet_rollup_matches_the_aggregate_summary(fleet_db):
+    with database.SessionLocal() as db:
+        before = fleet_summary(db)
+        db.execute(update(Vehicle).where(Vehicle.id <= 3).values(status=VehicleStatus.IN_SHOP))
+        db.commit()
+    _delete_an_expense()
+
+    rollups.refresh_now()  # status changes carry no marks; the fleet row is rewritten anyway
+    with database.SessionLocal() as db:
+        rolled_up = fleet_summary(db)
+        aggregated = build_fleet_summary([db.execute(s).mappings().all() for s in summary_aggregate_statements()])
+        in_shop = db.execute(select(Vehicle.id).where(Vehicle.status == VehicleStatus.IN_SHOP)).all()
+    assert rolled_up == aggregated
+    assert rolled_up["fleet"]["inShop"] == len(in_shop)
+    assert rolled_up["fleet"]["total"] == before["fleet"]["total"]
+
+
+def test_trips_completed_without_an_end_date_count_in_every_total(fleet_db):
+    now = datetime.datetime.now()
+    with database.SessionLocal() as db:
+        trip = db.execute(select(Trip).where(Trip.status == TripStatus.COMPLETED).limit(1)).scalar_one()
+        trip.endDate, trip.updatedAt = None, now
+        db.commit()
+    rollups.refresh_now()
+
+    with database.SessionLocal() as db:
+        lifetime = db.execute(select(func.sum(VehicleRollup.completedTrips), func.sum(VehicleRollup.totalRevenue))).one()
+        daily = db.execute(select(
+            func.sum(VehicleDailyRollup.completedTrips), func.sum(VehicleDailyRollup.revenue))).one()
+        today = fleet_summary(db, start=now.date(), end=now.date())
+    assert daily[0] == lifetime[0]
+    assert daily[1] == pytest.approx(lifetime[1])
+    assert today["trips"]["completed"] >= 1
+
+
+def test_data_window_moves_only_with_the_data(fleet_db):
+    with database.SessionLocal() as db:
+        before = rollups.data_window(db)
+    rollups.refresh_now()  # nothing changed
+    with database.SessionLocal() as db:
+        assert rollups.data_window(db) == before
+
+    vehicle_id, _ = _delete_an_expense()
+    rollups.mark_dirty([vehicle_id])
+    rollups.refresh_now()
+    with database.SessionLocal() as db:
+        assert rollups.data_window(db) != before
+
+
+def test_refresh_without_changes_writes_nothing(fleet_db):
+    with database.SessionLocal() as db:
+        # datagen stamps some trips in the future; put every mark well in the past
+        db.execute(update(Trip).values(updatedAt=datetime.datetime(2020, 1, 1)))
+        db.execute(update(Driver).values(updatedAt=datetime.datetime(2020, 1, 1)))
+        db.commit()
+    rollups.refresh_now()
+
+    statements = []
+
+    def record(conn, cursor, statement, *_):
+        statements.append(statement.split()[0].upper())
+
+    engine = database.engines()["engine"]
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        rollups.refresh_now()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert statements
+    assert not {"INSERT", "UPDATE", "DELETE"} & set(statements)
@@ -0,0 +1,49 @@
+"""
+Cold starts (see benchmarks/bench_startup.py): importing `main` stays
+light, and a fresh process with the warm-up answers /health and
+/analytics/summary within the startup budgets.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.bench_startup import EAGER_FORBIDDEN, MAX_HEALTH_MS, MAX_IMPORT_MS, MAX_SUMMARY_MS, _run
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 3
+
+
+@pytest.fixture
+def service_env(monkeypatch):
+    """Start subprocesses from backend-analytics/ with the default (in-process) response cache."""
+    monkeypatch.chdir(SERVICE_DIR)
+    monkeypatch.setenv("ANALYTICS_CACHE_URL", "")
+
+
+def test_import_main_loads_no_pdf_libraries_or_engines(service_env):
+    code = (
+        "import json, sys\n"
+        "import main, database\n"
+        "print(json.dumps({'modules': sorted(m for m in sys.modules if m.split('.')[0] in %r),\n"
+        "                  'engines': bool(database._engines)}))\n" % (EAGER_FORBIDDEN,)
+    )
+    out = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    loaded = json.loads(out)
+    assert "reportlab" not in loaded["modules"]
+    assert loaded["modules"] == []
+    assert not loaded["engines"]
+
+
+def test_cold_start_budgets(fleet, service_env):
+    url = f"sqlite:///{fleet(500, 5000)}"
+    _run(url, warmup=True)  # first start creates the rollup tables and catches the rollups up
+    runs = [_run(url, warmup=True) for _ in range(RUNS)]
+    medians = {k: statistics.median(r[k] for r in runs) for k in ("import_ms", "health_ms", "summary_ms")}
+    assert medians["import_ms"] < MAX_IMPORT_MS, medians
+    assert medians["health_ms"] < MAX_HEALTH_MS, medians
+    assert medians["summary_ms"] < MAX_SUMMARY_MS, medians
+    assert all(not r["eager_imports"] and not r["engines_at_import"] for r in runs)
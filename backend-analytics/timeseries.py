@@ -0,0 +1,214 @@
+"""
+Date-bucketed revenue, cost and trip series for GET /analytics/timeseries.
+
+Buckets are calendar days, ISO weeks (starting Monday) or calendar months,
+fleet-wide or for one vehicle. They are computed in SQL by grouping
+`vehicle_daily_rollups` on the day truncated to the bucket start, so a
+request reads one row per vehicle and active day in its window.
+
+A bucket is closed once it ended before today. Closed buckets only change
+when a refresh rewrites daily rollups for a past day (a backdated expense,
+a deleted maintenance log), and rollups.py records each such rewrite in
+`rollup_revisions`. So closed buckets are kept in a process-local store
+without expiry, and dropped only when a newer revision reaches back into
+them; a request queries just the open bucket and closed buckets it has not
+seen yet.
+"""
+import datetime
+import os
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import Date, func, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+from aggregates import day_range
+from database import fetch_rows
+from models import VehicleDailyRollup, RollupRevision
+
+BUCKETS = ("day", "week", "month")
+DEFAULT_LENGTH = {"day": 30, "week": 12, "month": 12}  # buckets in the default window
+MAX_BUCKETS = int(os.getenv("TIMESERIES_MAX_BUCKETS", "1000"))
+CLOSED_BUCKETS_KEPT = int(os.getenv("TIMESERIES_CACHE_BUCKETS", "100000"))
+
+
+# ── Date truncation in SQL ───────────────────────────────────────────────────
+class week_start(FunctionElement):
+    """Monday of the week containing a DATE."""
+    type = Date()
+    inherit_cache = True
+
+
+class month_start(FunctionElement):
+    """First day of the month containing a DATE."""
+    type = Date()
+    inherit_cache = True
+
+
+@compiles(week_start)
+def _compile_week_start(element, compiler, **kw):
+    day = compiler.process(element.clauses, **kw)
+    if compiler.dialect.name == "sqlite":
+        return f"date({day}, '-6 days', 'weekday 1')"
+    if compiler.dialect.name == "mysql":
+        return f"DATE_SUB({day}, INTERVAL WEEKDAY({day}) DAY)"
+    return f"CAST(date_trunc('week', {day}) AS DATE)"
+
+
+@compiles(month_start)
+def _compile_month_start(element, compiler, **kw):
+    day = compiler.process(element.clauses, **kw)
+    if compiler.dialect.name == "sqlite":
+        return f"date({day}, 'start of month')"
+    if compiler.dialect.name == "mysql":
+        return f"DATE_SUB({day}, INTERVAL DAYOFMONTH({day}) - 1 DAY)"
+    return f"CAST(date_trunc('month', {day}) AS DATE)"
+
+
+def series_query(bucket: str, start: datetime.date, end: datetime.date, vehicle_id: int = None):
+    """Per-bucket sums of the daily rollups of days in [start, end]."""
+    d = VehicleDailyRollup
+    key = {"day": d.day, "week": week_start(d.day), "month": month_start(d.day)}[bucket]
+    stmt = (
+        select(
+            key.label("bucket"),
+            func.sum(d.revenue).label("revenue"),
+            func.sum(d.fuelCost).label("fuelCost"),
+            func.sum(d.maintenanceCost).label("maintenanceCost"),
+            func.sum(d.completedTrips).label("completedTrips"),
+        )
+        .where(*day_range(d.day, start, end))
+        .group_by(key)
+        .order_by(key)
+    )
+    if vehicle_id is not None:
+        stmt = stmt.where(d.vehicleId == vehicle_id)
+    return stmt
+
+
+# ── Bucket arithmetic ─────────────────────────────────────────────────────────
+def bucket_floor(day: datetime.date, bucket: str) -> datetime.date:
+    if bucket == "week":
+        return day - datetime.timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start: datetime.date, bucket: str) -> datetime.date:
+    if bucket == "week":
+        return start + datetime.timedelta(days=7)
+    if bucket == "month":
+        return (start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    return start + datetime.timedelta(days=1)
+
+
+def bucket_starts(bucket: str, start: datetime.date, end: datetime.date) -> list:
+    """Starts of the whole buckets covering [start, end], at most MAX_BUCKETS + 1 of them."""
+    starts, current = [], bucket_floor(start, bucket)
+    while current <= end and len(starts) <= MAX_BUCKETS:
+        starts.append(current)
+        current = next_bucket(current, bucket)
+    return starts
+
+
+def default_window(bucket: str, end: datetime.date) -> tuple:
+    """The DEFAULT_LENGTH[bucket] buckets up to and including the one holding `end`."""
+    start = bucket_floor(end, bucket)
+    for _ in range(DEFAULT_LENGTH[bucket] - 1):
+        start = bucket_floor(start - datetime.timedelta(days=1), bucket)
+    return start, end
+
+
+# ── Closed-bucket store ───────────────────────────────────────────────────────
+class ClosedBuckets:
+    """
+    Process-local, entry-bounded store of closed bucket totals keyed by
+    (scope, bucket size, start). Entries never expire; `sync` drops those
+    that a rollup revision newer than the last one seen reaches into.
+    """
+
+    def __init__(self, max_entries: int = CLOSED_BUCKETS_KEPT):
+        self.max_entries = max_entries
+        self.revision = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def revision_query(seen: int):
+        r = RollupRevision
+        return select(
+            func.max(r.id).label("latest"),
+            func.count().label("n"),
+            func.count(r.changedFrom).label("dated"),
+            func.min(r.changedFrom).label("changedFrom"),
+        ).where(r.id > seen)
+
+    def sync(self, revisions) -> int:
+        """Apply a `revision_query(self.revision)` result; returns the revision now current."""
+        with self._lock:
+            if revisions["latest"] is None or revisions["latest"] <= self.revision:
+                return self.revision
+            if revisions["dated"] < revisions["n"]:
+                self._entries.clear()
+            else:
+                changed_from = revisions["changedFrom"]
+                for key in [k for k, (end, _) in self._entries.items() if end >= changed_from]:
+                    del self._entries[key]
+            self.revision = revisions["latest"]
+            return self.revision
+
+    def get(self, key: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, revision: int, key: tuple, end: datetime.date, totals: dict):
+        """Store `totals` computed under `revision`, unless a newer one was synced meanwhile."""
+        with self._lock:
+            if revision != self.revision:
+                return
+            self._entries[key] = (end, totals)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+closed_buckets = ClosedBuckets()
+
+
+def _totals(row) -> dict:
+    return {
+        "revenue":         round(float(row["revenue"] or 0), 2) if row else 0,
+        "fuelCost":        round(float(row["fuelCost"] or 0), 2) if row else 0,
+        "maintenanceCost": round(float(row["maintenanceCost"] or 0), 2) if row else 0,
+        "completedTrips":  int(row["completedTrips"] or 0) if row else 0,
+    }
+
+
+async def fetch_series(bucket: str, starts: list, vehicle_id: int = None) -> list:
+    """One totals entry per bucket start in `starts` (see `bucket_starts`)."""
+    today = datetime.date.today()
+    scope = "fleet" if vehicle_id is None else vehicle_id
+    revision = closed_buckets.sync((await fetch_rows(ClosedBuckets.revision_query(closed_buckets.revision)))[0])
+
+    ends = {s: next_bucket(s, bucket) - datetime.timedelta(days=1) for s in starts}
+    closed = {s for s in starts if ends[s] < today}
+    known = {s: closed_buckets.get((scope, bucket, s)) for s in closed}
+    missing = [s for s in starts if known.get(s) is None]
+
+    if missing:
+        rows = {r["bucket"]: r for r in await fetch_rows(series_query(bucket, missing[0], ends[starts[-1]], vehicle_id))}
+        for s in missing:
+            known[s] = _totals(rows.get(s))
+            if s in closed:
+                closed_buckets.put(revision, (scope, bucket, s), ends[s], known[s])
+
+    return [
+        {"start": s, "end": ends[s], "closed": s in closed, **known[s]}
+        for s in starts
+    ]
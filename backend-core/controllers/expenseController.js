@@ -1,5 +1,17 @@
 const prisma = require('../lib/prisma');
 const asyncHandler = require('../lib/asyncHandler');
+const { notifyAnalytics } = require('../lib/analytics');
+const {
+  parseBatch, validateRows, writeInChunks, batchResult, unique, integer, number, date, required,
+} = require('../lib/bulk');
+
+const EXPENSE_FIELDS = {
+  vehicleId:  [integer, required],
+  tripId:     [integer],
+  fuelLiters: [number, required],
+  fuelCost:   [number, required],
+  date:       [date],
+};
 
 // GET /api/expenses
 const getAll = asyncHandler(async (_req, res) => {
@@ -26,13 +38,55 @@ const create = asyncHandler(async (req, res) => {
     },
     include: { vehicle: true, trip: true },
   });
+  notifyAnalytics({ vehicleIds: [expense.vehicleId], tripIds: expense.tripId ? [expense.tripId] : [] });
   res.status(201).json(expense);
 });
 
+// POST /api/expenses/bulk  ─── NDJSON or CSV batch (see lib/bulk.js)
+const bulkCreate = asyncHandler(async (req, res) => {
+  const batch = parseBatch(req);
+  if (batch.error) return res.status(batch.status).json({ error: batch.error });
+  const { rows, errors } = batch;
+  const received = rows.length + errors.length;
+  let valid = validateRows(rows, EXPENSE_FIELDS, errors);
+
+  // Referenced vehicles and trips are looked up once for the whole batch
+  const [vehicles, trips] = await Promise.all([
+    prisma.vehicle.findMany({ where: { id: { in: unique(valid.map((r) => r.record.vehicleId)) } }, select: { id: true } }),
+    prisma.trip.findMany({ where: { id: { in: unique(valid.map((r) => r.record.tripId)) } }, select: { id: true, vehicleId: true } }),
+  ]);
+  const vehicleIds = new Set(vehicles.map((v) => v.id));
+  const tripVehicle = new Map(trips.map((t) => [t.id, t.vehicleId]));
+  valid = valid.filter(({ line, record }) => {
+    let error;
+    if (!vehicleIds.has(record.vehicleId)) error = `Vehicle ${record.vehicleId} not found`;
+    else if (record.tripId && !tripVehicle.has(record.tripId)) error = `Trip ${record.tripId} not found`;
+    else if (record.tripId && tripVehicle.get(record.tripId) !== record.vehicleId)
+      error = `Trip ${record.tripId} belongs to vehicle ${tripVehicle.get(record.tripId)}`;
+    if (error) errors.push({ line, error });
+    return !error;
+  });
+
+  const now = new Date();
+  const written = await writeInChunks(valid, (chunk) =>
+    prisma.expense.createMany({
+      data: chunk.map(({ record }) => ({ tripId: null, date: now, ...record })),
+    }), errors);
+
+  if (written.length) {
+    notifyAnalytics({
+      vehicleIds: unique(written.map((r) => r.record.vehicleId)),
+      tripIds:    unique(written.map((r) => r.record.tripId)),
+    });
+  }
+  res.status(written.length ? 201 : 400).json(batchResult(received, written.length, errors));
+});
+
 // DELETE /api/expenses/:id
 const remove = asyncHandler(async (req, res) => {
-  await prisma.expense.delete({ where: { id: Number(req.params.id) } });
+  const expense = await prisma.expense.delete({ where: { id: Number(req.params.id) } });
+  notifyAnalytics({ vehicleIds: [expense.vehicleId], tripIds: expense.tripId ? [expense.tripId] : [] });
   res.json({ message: 'Expense deleted' });
 });
 
-module.exports = { getAll, create, remove };
+module.exports = { getAll, create, bulkCreate, remove };
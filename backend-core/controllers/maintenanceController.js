@@ -1,5 +1,6 @@
 const prisma = require('../lib/prisma');
 const asyncHandler = require('../lib/asyncHandler');
+const { notifyAnalytics } = require('../lib/analytics');
 
 // GET /api/maintenance
 const getAll = asyncHandler(async (_req, res) => {
@@ -54,12 +55,14 @@ const create = asyncHandler(async (req, res) => {
     }),
   ]);
 
+  notifyAnalytics({ vehicleIds: [log.vehicleId] });
   res.status(201).json({ message: 'Maintenance log created, vehicle status set to IN_SHOP', log });
 });
 
 // DELETE /api/maintenance/:id
 const remove = asyncHandler(async (req, res) => {
-  await prisma.maintenanceLog.delete({ where: { id: Number(req.params.id) } });
+  const log = await prisma.maintenanceLog.delete({ where: { id: Number(req.params.id) } });
+  notifyAnalytics({ vehicleIds: [log.vehicleId] });
   res.json({ message: 'Maintenance log deleted' });
 });
 
@@ -1,5 +1,16 @@
+const { Prisma } = require('@prisma/client');
 const prisma = require('../lib/prisma');
 const asyncHandler = require('../lib/asyncHandler');
+const { notifyAnalytics } = require('../lib/analytics');
+const {
+  parseBatch, validateRows, writeInChunks, batchResult, unique, integer, number, date, required,
+} = require('../lib/bulk');
+
+const COMPLETION_FIELDS = {
+  tripId:        [integer, required],
+  finalOdometer: [number],
+  endDate:       [date],
+};
 
 // POST /api/trips  ─── create a DRAFT trip (no lock on vehicle/driver yet)
 const createDraft = asyncHandler(async (req, res) => {
@@ -29,6 +40,7 @@ const createDraft = asyncHandler(async (req, res) => {
     data: { vehicleId: Number(vehicleId), driverId: Number(driverId), cargoWeight: Number(cargoWeight), revenue: Number(revenue || 0), status: 'DRAFT' },
     include: { vehicle: true, driver: true },
   });
+  notifyAnalytics({ vehicleIds: [Number(vehicleId)], driverIds: [Number(driverId)] });
   res.status(201).json({ message: 'Draft trip created', trip });
 });
 
@@ -101,6 +113,7 @@ const dispatch = asyncHandler(async (req, res) => {
         cargoWeight: Number(cargoWeight),
         revenue: Number(revenue || 0),
         status: 'DISPATCHED',
+        startOdometer: vehicle.odometer,
       },
       include: { vehicle: true, driver: true },
     }),
@@ -108,6 +121,7 @@ const dispatch = asyncHandler(async (req, res) => {
     prisma.driver.update({  where: { id: Number(driverId)  }, data: { status: 'ON_DUTY' } }),
   ]);
 
+  notifyAnalytics({ vehicleIds: [Number(vehicleId)], driverIds: [Number(driverId)] });
   res.status(201).json({ message: 'Trip dispatched successfully', trip });
 });
 
@@ -139,13 +153,14 @@ const dispatchDraft = asyncHandler(async (req, res) => {
   const [updatedTrip] = await prisma.$transaction([
     prisma.trip.update({
       where: { id: tripId },
-      data: { status: 'DISPATCHED', startDate: new Date() },
+      data: { status: 'DISPATCHED', startDate: new Date(), startOdometer: trip.vehicle.odometer },
       include: { vehicle: true, driver: true }
     }),
     prisma.vehicle.update({ where: { id: trip.vehicleId }, data: { status: 'ON_TRIP' } }),
     prisma.driver.update({  where: { id: trip.driverId  }, data: { status: 'ON_DUTY' } }),
   ]);
 
+  notifyAnalytics({ vehicleIds: [trip.vehicleId], driverIds: [trip.driverId] });
   res.json({ message: 'Draft dispatched successfully', trip: updatedTrip });
 });
 
@@ -167,25 +182,130 @@ const complete = asyncHandler(async (req, res) => {
     return res.status(400).json({ error: 'Final odometer cannot be less than current odometer' });
   }
 
+  // The distance is only known when the final reading is given and the
+  // start reading was recorded at dispatch (trips dispatched before
+  // odometers were tracked have none).
+  const odometer = finalOdometer !== undefined
+    ? { endOdometer: Number(finalOdometer),
+        ...(trip.startOdometer !== null && { distanceKm: Number(finalOdometer) - trip.startOdometer }) }
+    : {};
+
+  // lastCompletedTripAt is written in the same transaction, so idle-vehicle
+  // queries never see a completed trip without it
+  const endDate = new Date();
   const [updatedTrip] = await prisma.$transaction([
     prisma.trip.update({
       where: { id: tripId },
-      data: { status: 'COMPLETED', endDate: new Date() },
+      data: { status: 'COMPLETED', endDate, ...odometer },
       include: { vehicle: true, driver: true },
     }),
     prisma.vehicle.update({
       where: { id: trip.vehicleId },
       data: {
         status: 'AVAILABLE',
+        lastCompletedTripAt: endDate,
         ...(finalOdometer !== undefined && { odometer: Number(finalOdometer) }),
       },
     }),
     prisma.driver.update({ where: { id: trip.driverId }, data: { status: 'AVAILABLE' } }),
   ]);
 
+  notifyAnalytics({ vehicleIds: [trip.vehicleId], driverIds: [trip.driverId] });
   res.json({ message: 'Trip completed successfully', trip: updatedTrip });
 });
 
+// `CASE id WHEN <id> THEN <value> ... ELSE <column> END` for a multi-row
+// UPDATE; rows without a pair keep their value
+const caseById = (column, pairs) => (pairs.length
+  ? Prisma.sql`CASE id ${Prisma.join(pairs.map(([id, value]) => Prisma.sql`WHEN ${id} THEN ${value}`), ' ')} ELSE ${Prisma.raw(column)} END`
+  : Prisma.raw(column));
+
+// POST /api/trips/bulk/complete  ─── NDJSON or CSV batch (see lib/bulk.js)
+// Same rules as PATCH /:id/complete; rows may carry the real endDate.
+const bulkComplete = asyncHandler(async (req, res) => {
+  const batch = parseBatch(req);
+  if (batch.error) return res.status(batch.status).json({ error: batch.error });
+  const { rows, errors } = batch;
+  const received = rows.length + errors.length;
+  let valid = validateRows(rows, COMPLETION_FIELDS, errors);
+
+  const trips = await prisma.trip.findMany({
+    where: { id: { in: unique(valid.map((r) => r.record.tripId)) } },
+    select: { id: true, status: true, vehicleId: true, driverId: true, startDate: true, startOdometer: true,
+              vehicle: { select: { odometer: true } } },
+  });
+  const tripById = new Map(trips.map((t) => [t.id, t]));
+  const now = new Date();
+  const seenTrips = new Set();
+  const seenVehicles = new Set();
+  valid = valid.filter(({ line, record }) => {
+    const trip = tripById.get(record.tripId);
+    const endDate = record.endDate || now;
+    let error;
+    if (!trip) error = `Trip ${record.tripId} not found`;
+    else if (seenTrips.has(trip.id)) error = `Trip ${trip.id} appears earlier in this batch`;
+    else if (trip.status !== 'DISPATCHED') error = `Trip ${trip.id} is ${trip.status}; only DISPATCHED trips can be completed`;
+    else if (seenVehicles.has(trip.vehicleId)) error = `Vehicle ${trip.vehicleId} has another trip earlier in this batch`;
+    else if (record.finalOdometer !== undefined && record.finalOdometer < trip.vehicle.odometer)
+      error = 'Final odometer cannot be less than current odometer';
+    else if (endDate < trip.startDate || endDate > now) error = 'endDate must be between the trip start and now';
+    if (error) {
+      errors.push({ line, error });
+      return false;
+    }
+    seenTrips.add(trip.id);
+    seenVehicles.add(trip.vehicleId);
+    record.endDate = endDate;
+    record.trip = trip;
+    return true;
+  });
+
+  // One UPDATE per table and chunk. The status guard makes a trip completed
+  // or cancelled meanwhile roll the chunk back instead of completing twice.
+  const written = await writeInChunks(valid, (chunk) => prisma.$transaction(async (tx) => {
+    const records = chunk.map((r) => r.record);
+    const odometers = records.filter((r) => r.finalOdometer !== undefined);
+    const distances = odometers.filter((r) => r.trip.startOdometer !== null);
+    const tripIds = records.map((r) => r.tripId);
+    const vehicleIds = records.map((r) => r.trip.vehicleId);
+
+    const completed = await tx.$executeRaw`
+      UPDATE trips SET
+        status = 'COMPLETED',
+        endDate = ${caseById('endDate', records.map((r) => [r.tripId, r.endDate]))},
+        endOdometer = ${caseById('endOdometer', odometers.map((r) => [r.tripId, r.finalOdometer]))},
+        distanceKm = ${caseById('distanceKm', distances.map((r) => [r.tripId, r.finalOdometer - r.trip.startOdometer]))},
+        updatedAt = ${now}
+      WHERE id IN (${Prisma.join(tripIds)}) AND status = 'DISPATCHED'`;
+    if (completed !== chunk.length) {
+      const err = new Error('Trips in this chunk changed while it was written; retry these rows');
+      err.expose = true;
+      throw err;
+    }
+    await tx.$executeRaw`
+      UPDATE vehicles SET
+        status = 'AVAILABLE',
+        lastCompletedTripAt = ${caseById('lastCompletedTripAt', records.map((r) => [
+          r.trip.vehicleId, Prisma.sql`GREATEST(COALESCE(lastCompletedTripAt, ${r.endDate}), ${r.endDate})`]))},
+        odometer = ${caseById('odometer', odometers.map((r) => [r.trip.vehicleId, r.finalOdometer]))},
+        updatedAt = ${now}
+      WHERE id IN (${Prisma.join(vehicleIds)})`;
+    await tx.driver.updateMany({
+      where: { id: { in: unique(records.map((r) => r.trip.driverId)) } },
+      data: { status: 'AVAILABLE' },
+    });
+  }), errors);
+
+  if (written.length) {
+    notifyAnalytics({
+      vehicleIds: unique(written.map((r) => r.record.trip.vehicleId)),
+      driverIds:  unique(written.map((r) => r.record.trip.driverId)),
+      tripIds:    written.map((r) => r.record.tripId),
+    });
+  }
+  res.status(written.length ? 200 : 400).json(batchResult(received, written.length, errors));
+});
+
 // PATCH /api/trips/:id/cancel
 const cancel = asyncHandler(async (req, res) => {
   const tripId = Number(req.params.id);
@@ -204,7 +324,8 @@ const cancel = asyncHandler(async (req, res) => {
   }
 
   await prisma.$transaction(ops);
+  notifyAnalytics({ vehicleIds: [trip.vehicleId], driverIds: [trip.driverId] });
   res.json({ message: 'Trip cancelled successfully' });
 });
 
-module.exports = { getAll, getOne, createDraft, dispatch, dispatchDraft, complete, cancel };
+module.exports = { getAll, getOne, createDraft, dispatch, dispatchDraft, complete, bulkComplete, cancel };
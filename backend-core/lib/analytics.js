@@ -0,0 +1,32 @@
+/**
+ * Tells backend-analytics that trip / expense / maintenance data changed,
+ * so it drops cached responses and refreshes its rollups on the next read.
+ *
+ * Fire-and-forget: a down analytics service must never fail a write here,
+ * so errors are logged and swallowed.
+ *
+ * Pass the ids the write touched so the analytics rollups recompute them
+ * even when the change (e.g. a delete) leaves no high-water-mark trace.
+ * `tripIds` are the trips whose fuel changed (expense writes), so their
+ * per-trip efficiency is rescored.
+ *
+ * Usage:  notifyAnalytics({ vehicleIds: [1], driverIds: [4] });   // after commit
+ */
+const ANALYTICS_URL = process.env.ANALYTICS_URL || 'http://localhost:8000';
+
+const notifyAnalytics = ({ vehicleIds = [], driverIds = [], tripIds = [] } = {}) => {
+  fetch(`${ANALYTICS_URL}/analytics/cache/invalidate`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'X-Analytics-Token': process.env.ANALYTICS_INVALIDATE_TOKEN || '',
+    },
+    body: JSON.stringify({ vehicleIds, driverIds, tripIds }),
+  })
+    .then((res) => {
+      if (!res.ok) console.warn(`[Analytics] invalidate refused: HTTP ${res.status} (check ANALYTICS_INVALIDATE_TOKEN)`);
+    })
+    .catch((err) => console.warn('[Analytics] invalidate failed:', err.message));
+};
+
+module.exports = { notifyAnalytics };
@@ -0,0 +1,199 @@
+/**
+ * Batch ingestion for the bulk endpoints (POST /api/expenses/bulk,
+ * POST /api/trips/bulk/complete), fed by telematics and fuel-card exports.
+ *
+ * A batch is NDJSON (one JSON object per line, Content-Type
+ * application/x-ndjson) or CSV with a header row (text/csv). Every row is
+ * checked before anything is written; rows that fail are reported back with
+ * their line number and the rest are written in chunks of BULK_CHUNK_SIZE,
+ * one transaction per chunk. A chunk the database rejects fails as a whole
+ * and its rows are reported; earlier chunks stay committed.
+ *
+ * Usage:
+ *   router.post('/bulk', authenticate, bulkBody, bulkCreate);
+ *   const { rows, errors } = parseBatch(req);
+ *   const valid = validateRows(rows, { vehicleId: [integer, required] }, errors);
+ */
+const express = require('express');
+
+const BULK_MAX_ROWS   = Number(process.env.BULK_MAX_ROWS || 10000);
+const BULK_CHUNK_SIZE = Number(process.env.BULK_CHUNK_SIZE || 500);
+
+const NDJSON_TYPES = ['application/x-ndjson', 'application/ndjson', 'application/jsonl'];
+const CSV_TYPES    = ['text/csv'];
+
+// Raw body for the bulk routes (express.json() only handles application/json)
+const bulkBody = express.text({
+  type: [...NDJSON_TYPES, ...CSV_TYPES],
+  limit: process.env.BULK_MAX_BYTES || '10mb',
+});
+
+// ── Parsing ─────────────────────────────────────────────────────────────
+const parseNdjson = (text) => {
+  const rows = [];
+  const errors = [];
+  text.split('\n').forEach((raw, i) => {
+    const line = raw.trim();
+    if (!line) return;
+    try {
+      const data = JSON.parse(line);
+      if (data === null || typeof data !== 'object' || Array.isArray(data)) throw new Error('not an object');
+      rows.push({ line: i + 1, data });
+    } catch (err) {
+      errors.push({ line: i + 1, error: `Invalid JSON: ${err.message}` });
+    }
+  });
+  return { rows, errors };
+};
+
+// RFC 4180: quoted fields may hold commas, newlines and "" for a quote
+const parseCsv = (text) => {
+  const records = [];
+  let record = [];
+  let field = '';
+  let quoted = false;
+  let line = 1;
+  let start = 1;
+  for (let i = 0; i < text.length; i++) {
+    const c = text[i];
+    if (quoted) {
+      if (c === '"' && text[i + 1] === '"') { field += '"'; i++; }
+      else if (c === '"') quoted = false;
+      else { if (c === '\n') line++; field += c; }
+    } else if (c === '"' && field === '') {
+      quoted = true;
+    } else if (c === ',') {
+      record.push(field); field = '';
+    } else if (c === '\n' || c === '\r') {
+      if (c === '\r' && text[i + 1] === '\n') i++;
+      record.push(field); field = '';
+      records.push({ line: start, cells: record });
+      record = []; line++; start = line;
+    } else {
+      field += c;
+    }
+  }
+  if (field !== '' || record.length) {
+    record.push(field);
+    records.push({ line: start, cells: record });
+  }
+
+  const nonEmpty = records.filter((r) => r.cells.some((cell) => cell.trim() !== ''));
+  if (!nonEmpty.length) return { rows: [], errors: [] };
+  const header = nonEmpty[0].cells.map((h) => h.trim());
+  const rows = [];
+  const errors = [];
+  for (const { line: at, cells } of nonEmpty.slice(1)) {
+    if (cells.length !== header.length) {
+      errors.push({ line: at, error: `Expected ${header.length} columns, got ${cells.length}` });
+      continue;
+    }
+    const data = {};
+    header.forEach((name, j) => { if (cells[j].trim() !== '') data[name] = cells[j].trim(); });
+    rows.push({ line: at, data });
+  }
+  return { rows, errors };
+};
+
+/**
+ * Split the request body into `{ line, data }` rows plus the lines that
+ * could not be parsed. Returns `{ error, status }` instead when the body as a
+ * whole is unusable.
+ */
+const parseBatch = (req) => {
+  if (typeof req.body !== 'string')
+    return { status: 415, error: `Send the batch as NDJSON (${NDJSON_TYPES[0]}) or CSV (text/csv)` };
+  const batch = req.is(CSV_TYPES) ? parseCsv(req.body) : parseNdjson(req.body);
+  const total = batch.rows.length + batch.errors.length;
+  if (!total) return { status: 400, error: 'Batch is empty' };
+  if (total > BULK_MAX_ROWS)
+    return { status: 413, error: `Batch has ${total} rows; the limit is ${BULK_MAX_ROWS}` };
+  return batch;
+};
+
+// ── Validation ──────────────────────────────────────────────────────────
+// A field is [convert, ...checks]; convert returns undefined for bad input.
+const integer = (v) => {
+  const n = Number(v);
+  return v !== '' && v !== null && Number.isInteger(n) && n > 0 ? n : undefined;
+};
+const number = (v) => {
+  const n = Number(v);
+  return v !== '' && v !== null && typeof v !== 'boolean' && Number.isFinite(n) && n >= 0 ? n : undefined;
+};
+const date = (v) => {
+  const d = new Date(v);
+  return (typeof v === 'string' || typeof v === 'number') && !Number.isNaN(d.getTime()) ? d : undefined;
+};
+const required = 'required';
+
+const EXPECTED = new Map([
+  [integer, 'a positive integer'],
+  [number, 'a non-negative number'],
+  [date, 'a date'],
+]);
+
+/**
+ * Convert every row with `fields` ({ name: [convert, required?] }). Rows
+ * with a missing or malformed field go to `errors`; the others are returned
+ * as `{ line, record }` with only the known fields, converted.
+ */
+const validateRows = (rows, fields, errors) => {
+  const valid = [];
+  for (const { line, data } of rows) {
+    const record = {};
+    const problems = [];
+    for (const [name, [convert, ...checks]] of Object.entries(fields)) {
+      const raw = data[name];
+      if (raw === undefined || raw === null || raw === '') {
+        if (checks.includes(required)) problems.push(`${name} is required`);
+        continue;
+      }
+      const value = convert(raw);
+      if (value === undefined) problems.push(`${name} must be ${EXPECTED.get(convert)}`);
+      else record[name] = value;
+    }
+    if (problems.length) errors.push({ line, error: problems.join('; ') });
+    else valid.push({ line, record });
+  }
+  return valid;
+};
+
+// ── Writing ─────────────────────────────────────────────────────────────
+/**
+ * Run `write(chunk)` for every BULK_CHUNK_SIZE rows of `valid`. `write`
+ * should do all of its work in one transaction; when it throws, the chunk's
+ * rows are added to `errors` and the next chunk is still attempted.
+ * Returns the rows of the chunks that were written.
+ */
+const writeInChunks = async (valid, write, errors) => {
+  const written = [];
+  for (let i = 0; i < valid.length; i += BULK_CHUNK_SIZE) {
+    const chunk = valid.slice(i, i + BULK_CHUNK_SIZE);
+    try {
+      await write(chunk);
+      written.push(...chunk);
+    } catch (err) {
+      console.error('[Bulk] chunk failed:', err.message);
+      const error = err.expose ? err.message : 'Database write failed; retry these rows';
+      errors.push(...chunk.map(({ line }) => ({ line, error })));
+    }
+  }
+  return written;
+};
+
+/** The response body: counts plus the failed lines in order. */
+const batchResult = (received, written, errors) => ({
+  received,
+  written,
+  failed: errors.length,
+  errors: errors.sort((a, b) => a.line - b.line),
+});
+
+const unique = (values) => [...new Set(values.filter((v) => v !== undefined && v !== null))];
+
+module.exports = {
+  bulkBody, parseBatch, validateRows, writeInChunks, batchResult, unique,
+  integer, number, date, required,
+  BULK_CHUNK_SIZE,
+};
@@ -0,0 +1,23 @@
+-- CreateIndex
+CREATE INDEX `vehicles_status_idx` ON `vehicles`(`status`);
+
+-- CreateIndex
+CREATE INDEX `drivers_updatedAt_idx` ON `drivers`(`updatedAt`);
+
+-- CreateIndex
+CREATE INDEX `trips_vehicleId_status_endDate_revenue_driverId_idx` ON `trips`(`vehicleId`, `status`, `endDate`, `revenue`, `driverId`);
+
+-- CreateIndex
+CREATE INDEX `trips_driverId_status_revenue_idx` ON `trips`(`driverId`, `status`, `revenue`);
+
+-- CreateIndex
+CREATE INDEX `trips_status_endDate_vehicleId_revenue_idx` ON `trips`(`status`, `endDate`, `vehicleId`, `revenue`);
+
+-- CreateIndex
+CREATE INDEX `trips_updatedAt_vehicleId_driverId_idx` ON `trips`(`updatedAt`, `vehicleId`, `driverId`);
+
+-- CreateIndex
+CREATE INDEX `maintenance_logs_vehicleId_date_cost_idx` ON `maintenance_logs`(`vehicleId`, `date`, `cost`);
+
+-- CreateIndex
+CREATE INDEX `expenses_vehicleId_date_fuelCost_fuelLiters_idx` ON `expenses`(`vehicleId`, `date`, `fuelCost`, `fuelLiters`);
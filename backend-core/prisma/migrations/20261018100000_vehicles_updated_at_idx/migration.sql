@@ -0,0 +1,2 @@
+-- CreateIndex
+CREATE INDEX `vehicles_updatedAt_idx` ON `vehicles`(`updatedAt`);
@@ -0,0 +1,8 @@
+-- DropIndex
+DROP INDEX `vehicles_status_idx` ON `vehicles`;
+
+-- AlterTable
+ALTER TABLE `vehicles` ADD COLUMN `lastCompletedTripAt` DATETIME(3) NULL;
+
+-- CreateIndex
+CREATE INDEX `vehicles_status_lastCompletedTripAt_idx` ON `vehicles`(`status`, `lastCompletedTripAt`);
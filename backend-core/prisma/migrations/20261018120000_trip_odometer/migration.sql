@@ -0,0 +1,4 @@
+-- AlterTable
+ALTER TABLE `trips` ADD COLUMN `startOdometer` DOUBLE NULL,
+    ADD COLUMN `endOdometer` DOUBLE NULL,
+    ADD COLUMN `distanceKm` DOUBLE NULL;
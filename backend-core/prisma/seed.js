@@ -1,5 +1,6 @@
 const { PrismaClient } = require('@prisma/client');
 const bcrypt = require('bcryptjs');
+const { backfillLastCompletedTrip } = require('../scripts/backfillLastCompletedTrip');
 
 const prisma = new PrismaClient();
 
@@ -70,6 +71,7 @@ async function main() {
     ],
     skipDuplicates: true,
   });
+  await backfillLastCompletedTrip(prisma);
   console.log('✅ Sample trips seeded');
 
   // ── Sample Maintenance Logs ─────────────────────────────────────────
@@ -1,9 +1,11 @@
 const router = require('express').Router();
-const { getAll, create, remove } = require('../controllers/expenseController');
+const { getAll, create, bulkCreate, remove } = require('../controllers/expenseController');
 const { authenticate, authorize } = require('../middleware/auth');
+const { bulkBody } = require('../lib/bulk');
 
 router.get('/',       authenticate, getAll);
 router.post('/',      authenticate, authorize('MANAGER', 'DISPATCHER', 'FINANCE'), create);
+router.post('/bulk',  authenticate, authorize('MANAGER', 'DISPATCHER', 'FINANCE'), bulkBody, bulkCreate);
 router.delete('/:id', authenticate, authorize('MANAGER', 'FINANCE'), remove);
 
 module.exports = router;
@@ -0,0 +1,46 @@
+/**
+ * Backfills vehicles.lastCompletedTripAt (end of the latest COMPLETED trip).
+ *
+ * tripController.complete keeps the column current; this job fills it in for
+ * trips completed before the column existed, and repairs it after trips are
+ * edited or imported outside the API. It is idempotent: every vehicle is set
+ * to what its trips say, in id ranges of BATCH_SIZE so no statement locks the
+ * whole fleet.
+ *
+ * Usage:  npm run backfill:last-trip        (after `prisma migrate deploy`)
+ */
+const prisma = require('../lib/prisma');
+const { notifyAnalytics } = require('../lib/analytics');
+
+const BATCH_SIZE = Number(process.env.BACKFILL_BATCH_SIZE || 1000);
+
+const backfillLastCompletedTrip = async (client = prisma) => {
+  const { _max } = await client.vehicle.aggregate({ _max: { id: true } });
+  const maxId = _max.id || 0;
+  let updated = 0;
+  for (let from = 0; from < maxId; from += BATCH_SIZE) {
+    updated += await client.$executeRaw`
+      UPDATE vehicles v
+      SET v.lastCompletedTripAt = (
+        SELECT MAX(t.endDate) FROM trips t
+        WHERE t.vehicleId = v.id AND t.status = 'COMPLETED'
+      )
+      WHERE v.id > ${from} AND v.id <= ${from + BATCH_SIZE}`;
+  }
+  return updated;
+};
+
+if (require.main === module) {
+  backfillLastCompletedTrip()
+    .then((updated) => {
+      console.log(`✅ lastCompletedTripAt backfilled (${updated} vehicles changed)`);
+      notifyAnalytics();
+    })
+    .catch((err) => {
+      console.error('❌ Backfill failed:', err);
+      process.exitCode = 1;
+    })
+    .finally(() => prisma.$disconnect());
+}
+
+module.exports = { backfillLastCompletedTrip };
@@ -12,6 +12,27 @@ export const analyticsApi = axios.create({
   headers: { 'Content-Type': 'application/json' },
 });
 
+// ── Columnar Responses ────────────────────────────────────────────────────
+// Vehicle list endpoints with `format: 'columns'` send one array per field
+// ({ vehicleId: [...], nameModel: [...] }); this turns that back into rows.
+export const fromColumns = (columns) => {
+  const fields = Object.keys(columns);
+  const length = fields.length ? columns[fields[0]].length : 0;
+  return Array.from({ length }, (_, i) =>
+    Object.fromEntries(fields.map((field) => [field, columns[field][i]])));
+};
+
+// ── Live Updates ──────────────────────────────────────────────────────────
+// GET /analytics/stream pushes `kpis` ({ summary, topRoi }), `roi`
+// ({ rows, removed }) and `reset` (reload everything) events. EventSource
+// reconnects on its own and resumes from the last event it saw.
+export const subscribeAnalytics = (handlers) => {
+  const source = new EventSource(`${analyticsApi.defaults.baseURL}/analytics/stream`);
+  Object.entries(handlers).forEach(([event, handler]) =>
+    source.addEventListener(event, (e) => handler(JSON.parse(e.data))));
+  return () => source.close();
+};
+
 // ── Auth Token Injection ──────────────────────────────────────────────────
 const injectToken = (config) => {
   const token = localStorage.getItem('fleetflow_token');
@@ -4,7 +4,7 @@ import { Link } from 'react-router-dom';
 import { Truck, Users, Route, Wrench, TrendingUp, AlertTriangle, Send, Activity } from 'lucide-react';
 import StatCard from '../components/StatCard';
 import StatusBadge from '../components/StatusBadge';
-import { coreApi, analyticsApi } from '../lib/api';
+import { coreApi, analyticsApi, subscribeAnalytics } from '../lib/api';
 
 const fmt = (n) => new Intl.NumberFormat('en-IN', { style: 'currency', currency: 'INR', maximumFractionDigits: 0 }).format(n);
 
@@ -30,6 +30,8 @@ export default function Dashboard() {
       finally { setLoading(false); }
     };
     load();
+    // Live KPIs: the summary is pushed again whenever it changes
+    return subscribeAnalytics({ kpis: (data) => setSummary(data.summary) });
   }, []);
 
   const fleet = summary?.fleet || {};
@@ -9,13 +9,14 @@ import {
   BarChart, Bar, XAxis, YAxis, CartesianGrid,
   Tooltip, ResponsiveContainer, Cell
 } from 'recharts';
-import { analyticsApi } from '../lib/api';
+import { analyticsApi, fromColumns, subscribeAnalytics } from '../lib/api';
 
 const fmt = (n) => new Intl.NumberFormat('en-IN', { style: 'currency', currency: 'INR', maximumFractionDigits: 0 }).format(n ?? 0);
 const pct = (n) => `${n != null ? n.toFixed(2) : '—'}%`;
 
 export default function FinancialAnalytics() {
   const [roiData, setRoiData] = useState([]);
+  const [topRoi, setTopRoi] = useState([]);
   const [fuelData, setFuelData] = useState([]);
   const [deadStock, setDeadStock] = useState([]);
   const [summary, setSummary] = useState(null);
@@ -29,22 +30,34 @@ export default function FinancialAnalytics() {
   const load = async () => {
     setLoading(true); setError('');
     try {
-      const [roiRes, fuelRes, deadRes, sumRes] = await Promise.all([
-        analyticsApi.get('/analytics/all-roi'),
-        analyticsApi.get('/analytics/fuel-efficiency'),
-        analyticsApi.get('/analytics/dead-stock'),
-        analyticsApi.get('/analytics/summary'),
-      ]);
-      setRoiData(roiRes.data);
-      setFuelData(fuelRes.data);
-      setDeadStock(deadRes.data);
-      setSummary(sumRes.data);
+      // One snapshot: every section is derived from a single read of the fleet
+      const { data } = await analyticsApi.get('/analytics/snapshot', {
+        params: { sections: 'summary,roi,topRoi,fuel,deadStock', roiLimit: 10, top: 5, format: 'columns' },
+      });
+      setRoiData(fromColumns(data.roi));
+      setTopRoi(fromColumns(data.topRoi));
+      setFuelData(fromColumns(data.fuel));
+      setDeadStock(fromColumns(data.deadStock));
+      setSummary(data.summary);
     } catch (e) {
       setError('Analytics API unavailable. Ensure backend-analytics is running on port 8000.');
     } finally { setLoading(false); }
   };
 
-  useEffect(() => { load(); }, []);
+  useEffect(() => {
+    load();
+    // Live: changed ROI rows and the KPIs are pushed as backend-core writes
+    return subscribeAnalytics({
+      kpis: (data) => { setSummary(data.summary); setTopRoi(data.topRoi); },
+      roi: ({ rows, removed }) => setRoiData((prev) => {
+        const byId = new Map(prev.map((r) => [r.vehicleId, r]));
+        removed.forEach((id) => byId.delete(id));
+        rows.forEach((r) => byId.set(r.vehicleId, r));
+        return [...byId.values()].sort((a, b) => a.vehicleId - b.vehicleId).slice(0, 10);
+      }),
+      reset: () => load(),
+    });
+  }, []);
 
   const handleExport = async () => {
     setExporting(true);
@@ -64,7 +77,14 @@ export default function FinancialAnalytics() {
   const handleExportPdf = async () => {
     setExportingPdf(true);
     try {
-      const res = await analyticsApi.get('/analytics/export-pdf', { responseType: 'blob' });
+      // Rendered by a background report job: queue it, poll, then download.
+      let { data: job } = await analyticsApi.post('/analytics/reports', { kind: 'audit-pdf' });
+      while (job.status !== 'done') {
+        if (job.status === 'failed') throw new Error(job.error);
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        ({ data: job } = await analyticsApi.get(`/analytics/reports/${job.id}`));
+      }
+      const res = await analyticsApi.get(job.downloadUrl, { responseType: 'blob' });
       const url = window.URL.createObjectURL(new Blob([res.data], { type: 'application/pdf' }));
       const link = document.createElement('a');
       link.href = url;
@@ -92,9 +112,7 @@ export default function FinancialAnalytics() {
   };
 
   // Preparation for charts
-  const topRoiData = [...roiData]
-    .sort((a, b) => b.roiPercent - a.roiPercent)
-    .slice(0, 5)
+  const topRoiData = topRoi
     .map(d => ({ name: d.nameModel.split(' ')[0], roi: d.roiPercent, full: d.nameModel }));
 
   const topFuelData = [...fuelData]